@@ -0,0 +1,153 @@
+"""
+Codec comparison: encode the same reference clip with every recording profile and compare encode cost, file size and
+quality.
+
+The reference clip is synthetic (moving shapes over gradients and noise) unless --input names a video. For each
+profile the report gives the encode time per frame, the achievable encode FPS, the file size, the bitrate and the
+PSNR of the decoded result against the source frames. Profiles whose codec is missing from this OpenCV build are
+reported as unavailable.
+
+Run with: python -m benchmarks.codec_comparison [--input clip.avi] [--frames 150] [--resolution hd]
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from benchmarks.run_benchmarks import BENCHMARK_DIR, RESOLUTIONS, synthetic_image
+from utils.recording_profile import RECORDING_PROFILES, RecordingWriter
+
+
+def reference_frames(width: int, height: int, frame_count: int) -> np.ndarray:
+    """
+    :return: Array of frame_count BGR frames: a textured background with a few shapes moving across it.
+    """
+    background = synthetic_image(width, height)
+    frames = np.empty((frame_count, height, width, 3), dtype=np.uint8)
+    for index in range(frame_count):
+        frame = frames[index]
+        frame[:] = np.roll(background, index, axis=1)
+        for shape in range(3):
+            x = (index * (4 + 3 * shape) + shape * width // 3) % width
+            y = height // 4 + shape * height // 4
+            cv2.circle(frame, (x, y), height // 12, (40 + 80 * shape, 200 - 60 * shape, 90), -1)
+    return frames
+
+
+def load_frames(video_path: str, frame_count: int) -> np.ndarray:
+    """
+    :return: Array of the first frame_count frames of the video.
+    """
+    capture = cv2.VideoCapture(video_path)
+    frames = []
+    while len(frames) < frame_count:
+        ret, frame = capture.read()
+        if not ret:
+            break
+        frames.append(frame)
+    capture.release()
+    if not frames:
+        raise ValueError(f"Unable to read frames from {video_path}")
+    return np.stack(frames)
+
+
+def psnr(frames: np.ndarray, video_path: str, decimation: int, size: tuple) -> float:
+    """
+    :return: Mean PSNR in dB of the decoded video against the (decimated, resized) source frames.
+    """
+    capture = cv2.VideoCapture(video_path)
+    values = []
+    for source in frames[::decimation]:
+        ret, decoded = capture.read()
+        if not ret:
+            break
+        if (source.shape[1], source.shape[0]) != size:
+            source = cv2.resize(source, size, interpolation=cv2.INTER_AREA)
+        values.append(cv2.PSNR(source, decoded))
+    capture.release()
+    return float(np.mean(values)) if values else 0.0
+
+
+def compare(frames: np.ndarray, fps: float, workdir: str) -> list:
+    """
+    :return: One result dict per recording profile.
+    """
+    height, width = frames.shape[1:3]
+    results = []
+    for profile in RECORDING_PROFILES.values():
+        path_stem = os.path.join(workdir, profile.name)
+        writer = RecordingWriter(profile, path_stem + profile.container, fps, (width, height))
+        if not writer.isOpened():
+            writer.release()
+            results.append({"profile": profile.name, "fourcc": profile.fourcc, "available": False})
+            print(f"{profile.name:<8} {profile.fourcc:<5} not available in this OpenCV build")
+            continue
+
+        start = time.perf_counter()
+        for frame in frames:
+            writer.write(frame)
+        writer.release()
+        elapsed = time.perf_counter() - start
+
+        size_bytes = os.path.getsize(writer.path)
+        duration = len(frames) / fps
+        result = {"profile": profile.name, "fourcc": profile.fourcc, "container": profile.container,
+                  "available": True, "frames_in": len(frames), "frames_written": writer.frames_written,
+                  "output_size": list(writer.size), "output_fps": writer.fps,
+                  "encode_ms_per_frame": elapsed * 1000 / len(frames), "encode_fps": len(frames) / elapsed,
+                  "file_bytes": size_bytes, "bitrate_mbps": size_bytes * 8 / duration / 1e6,
+                  "psnr_db": psnr(frames, writer.path, writer.decimation, writer.size)}
+        results.append(result)
+        print(f"{profile.name:<8} {profile.fourcc:<5} {result['encode_ms_per_frame']:7.2f} ms/frame "
+              f"({result['encode_fps']:7.1f} FPS)  {size_bytes / 2 ** 20:8.2f} MB  "
+              f"{result['bitrate_mbps']:7.2f} Mbit/s  PSNR {result['psnr_db']:5.1f} dB")
+    return results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--input", help="Reference video (default: a synthetic clip)")
+    parser.add_argument("--frames", type=int, default=150, help="Number of frames to encode")
+    parser.add_argument("--resolution", choices=list(RESOLUTIONS), default="hd",
+                        help="Size of the synthetic clip (ignored with --input)")
+    parser.add_argument("--fps", type=float, default=30.0, help="Frame rate of the synthetic clip")
+    parser.add_argument("--output", help="JSON file for the results (default: output/benchmarks/codecs_<time>.json)")
+    args = parser.parse_args(argv)
+
+    if args.input:
+        frames = load_frames(args.input, args.frames)
+        capture = cv2.VideoCapture(args.input)
+        fps = capture.get(cv2.CAP_PROP_FPS) or args.fps
+        capture.release()
+    else:
+        frames = reference_frames(*RESOLUTIONS[args.resolution], args.frames)
+        fps = args.fps
+    print(f"Reference clip: {len(frames)} frames of {frames.shape[2]}x{frames.shape[1]} at {fps:.1f} FPS")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        results = compare(frames, fps, workdir)
+    report = {"meta": {"timestamp": datetime.datetime.now().isoformat(timespec='seconds'),
+                       "python": platform.python_version(), "opencv": cv2.__version__,
+                       "machine": platform.machine(), "input": args.input or f"synthetic {args.resolution}",
+                       "frames": len(frames), "fps": fps},
+              "results": results}
+
+    output_path = args.output
+    if output_path is None:
+        os.makedirs(BENCHMARK_DIR, exist_ok=True)
+        output_path = os.path.join(BENCHMARK_DIR, datetime.datetime.now().strftime("codecs_%Y%m%d-%H%M%S") + '.json')
+    with open(output_path, 'w') as output_file:
+        json.dump(report, output_file, indent=2)
+    print(f"Saved results to: {output_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
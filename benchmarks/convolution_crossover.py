@@ -0,0 +1,80 @@
+"""
+Measure separable vs FFT Gaussian-derivative filtering over a grid of image and kernel sizes, print where the FFT
+path starts to win, and suggest a value for utils.convolution.FFT_COST_FACTOR on this machine.
+
+Run with: python -m benchmarks.convolution_crossover
+"""
+import math
+import time
+
+import cv2
+import numpy as np
+
+from utils.convolution import fft_filter, gaussian_derivative_kernel, separable_filter, choose_method
+
+IMAGE_SIZES = [256, 512, 1024, 2048]
+SIGMAS = [1, 2, 5, 10, 20, 40]
+
+
+def time_call(function, *args, repeats: int = 3) -> float:
+    """
+    :return: Best wall-clock time of the call in seconds.
+    """
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(image_sizes=IMAGE_SIZES, sigmas=SIGMAS) -> list:
+    """
+    :return: List of dicts with the timings of each (size, sigma) pair.
+    """
+    rng = np.random.default_rng(0)
+    results = []
+    for size in image_sizes:
+        image = rng.integers(0, 256, (size, size), dtype=np.uint8)
+        for sigma in sigmas:
+            smooth = gaussian_derivative_kernel(sigma, order=0)
+            derivative = gaussian_derivative_kernel(sigma, order=1)
+            separable_time = time_call(separable_filter, image, derivative, smooth)
+            fft_time = time_call(fft_filter, image, derivative, smooth)
+            results.append({"size": size, "sigma": sigma, "ksize": len(derivative),
+                            "separable_ms": separable_time * 1000, "fft_ms": fft_time * 1000,
+                            "chosen": choose_method(image.shape, len(derivative))})
+    return results
+
+
+def suggest_cost_factor(results: list) -> float:
+    """
+    Solve the choose_method cost model for the factor that would make it agree with each measurement.
+    :return: Median of those factors.
+    """
+    factors = []
+    for result in results:
+        size, ksize = result["size"], result["ksize"]
+        padded = cv2.getOptimalDFTSize(size + ksize - 1) ** 2
+        ratio = result["fft_ms"] / result["separable_ms"]
+        factors.append(ratio * 2 * ksize * size * size / (padded * math.log2(padded)))
+    return float(np.median(factors))
+
+
+def main():
+    results = run()
+    print(f"{'size':>6} {'sigma':>6} {'ksize':>6} {'separable ms':>13} {'fft ms':>9}  faster     chosen")
+    for result in results:
+        faster = "fft" if result["fft_ms"] < result["separable_ms"] else "separable"
+        print(f"{result['size']:>6} {result['sigma']:>6} {result['ksize']:>6} {result['separable_ms']:>13.2f} "
+              f"{result['fft_ms']:>9.2f}  {faster:<10} {result['chosen']}")
+
+    for size in IMAGE_SIZES:
+        crossover = next((r["ksize"] for r in results if r["size"] == size and r["fft_ms"] < r["separable_ms"]), None)
+        print(f"{size}x{size}: FFT faster from ksize {crossover}" if crossover else
+              f"{size}x{size}: separable faster for every tested ksize")
+    print(f"Suggested FFT_COST_FACTOR for this machine: {suggest_cost_factor(results):.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Compare the cv2.inRange + cv2.bitwise_or loop that get_foreground_mask used to run for every hue range against a
+single cv2.LUT pass with a compiled table, for 1 to 10 ranges on a 1080p hue channel.
+
+Run with: python -m benchmarks.hue_threshold_lut
+"""
+import time
+
+import cv2
+import numpy as np
+
+from utils.hue_lut import apply_hue_lut, build_hue_lut
+
+FRAME_SHAPE = (1080, 1920)
+
+
+def in_range_loop(hue_channel, lower_thresholds, upper_thresholds):
+    background_mask = None
+    for index in range(len(lower_thresholds)):
+        mask = cv2.inRange(hue_channel, lower_thresholds[index], upper_thresholds[index])
+        background_mask = mask if index == 0 else cv2.bitwise_or(background_mask, mask)
+    return background_mask
+
+
+def time_call(function, *args, repeats: int = 50) -> float:
+    """
+    :return: Mean wall-clock time of the call in milliseconds.
+    """
+    start = time.perf_counter()
+    for _ in range(repeats):
+        function(*args)
+    return (time.perf_counter() - start) / repeats * 1000
+
+
+def run(max_ranges: int = 10) -> list:
+    """
+    :return: List of dicts with the timings for each number of ranges.
+    """
+    rng = np.random.default_rng(0)
+    hue_channel = rng.integers(0, 180, FRAME_SHAPE, dtype=np.uint8)
+    mask_buffer = np.empty(FRAME_SHAPE, dtype=np.uint8)
+    results = []
+    for count in range(1, max_ranges + 1):
+        lower_thresholds = [int(value) for value in np.linspace(0, 170, count)]
+        upper_thresholds = [low + 8 for low in lower_thresholds]
+        lut = build_hue_lut(tuple(lower_thresholds), tuple(upper_thresholds))
+        assert np.array_equal(in_range_loop(hue_channel, lower_thresholds, upper_thresholds),
+                              apply_hue_lut(hue_channel, lut, mask_buffer))
+        results.append({"ranges": count,
+                        "loop_ms": time_call(in_range_loop, hue_channel, lower_thresholds, upper_thresholds),
+                        "lut_ms": time_call(apply_hue_lut, hue_channel, lut, mask_buffer)})
+    return results
+
+
+def main():
+    print(f"{'ranges':>6} {'loop ms':>9} {'lut ms':>8} {'speed-up':>9}")
+    for result in run():
+        print(f"{result['ranges']:>6} {result['loop_ms']:>9.3f} {result['lut_ms']:>8.3f} "
+              f"{result['loop_ms'] / result['lut_ms']:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
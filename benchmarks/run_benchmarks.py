@@ -0,0 +1,228 @@
+"""
+Headless benchmark suite for the lab1, lab2 and lab3 controller operations on synthetic images and videos.
+
+Reports latency percentiles, throughput and peak Python heap memory per operation and resolution, and saves them as
+JSON. The memory figure comes from tracemalloc, so it misses native buffers such as OpenCV's and NumPy allocations
+made outside the Python allocator.
+With --baseline, the run fails (exit code 1) if any operation's median latency is slower than the baseline's by more
+than --margin.
+
+Run with: python -m benchmarks.run_benchmarks [--resolutions vga hd] [--baseline previous.json]
+"""
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+from controller import lab1_controller, lab2_controller, lab3_controller
+from utils.file_utils import output_dir
+from utils.frame_index import FrameIndex, read_frame
+from utils.output_catalog import OutputCatalog
+from utils.threshold_estimation import estimate_key_range, hue_histogram
+
+RESOLUTIONS = {
+    "vga": (640, 480),
+    "hd": (1280, 720),
+    "fhd": (1920, 1080),
+    "4k": (3840, 2160),
+}
+VIDEO_FRAMES = 30
+BENCHMARK_DIR = os.path.join(output_dir, 'benchmarks')
+
+
+def synthetic_image(width: int, height: int, seed: int = 0) -> np.ndarray:
+    """
+    :return: BGR image with gradients, shapes and noise, so filters and codecs do realistic work.
+    """
+    rng = np.random.default_rng(seed)
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    image = np.dstack([x + 0 * y, y + 0 * x, (x + y) / 2]).astype(np.uint8)
+    for _ in range(12):
+        center = (int(rng.integers(0, width)), int(rng.integers(0, height)))
+        radius = int(rng.integers(min(width, height) // 20, min(width, height) // 5))
+        color = tuple(int(value) for value in rng.integers(0, 256, 3))
+        cv2.circle(image, center, radius, color, -1)
+    noise = rng.integers(-8, 9, image.shape, dtype=np.int16)
+    return np.clip(image.astype(np.int16) + noise, 0, 255).astype(np.uint8)
+
+
+def synthetic_green_screen(width: int, height: int, seed: int = 0) -> np.ndarray:
+    """
+    :return: BGR image of a figure in front of a slightly noisy green background.
+    """
+    rng = np.random.default_rng(seed)
+    image = np.empty((height, width, 3), dtype=np.uint8)
+    image[:] = (60, 180, 50)
+    noise = rng.integers(-10, 11, image.shape, dtype=np.int16)
+    image = np.clip(image.astype(np.int16) + noise, 0, 255).astype(np.uint8)
+    cv2.ellipse(image, (width // 2, height // 2), (width // 6, height // 3), 0, 0, 360, (90, 120, 200), -1)
+    cv2.circle(image, (width // 2, height // 5), min(width, height) // 10, (60, 90, 160), -1)
+    return image
+
+
+def synthetic_video(path: str, frame: np.ndarray, frame_count: int = VIDEO_FRAMES) -> str:
+    """
+    Write a short XVID video of the frame drifting sideways.
+    :return: path.
+    """
+    height, width = frame.shape[:2]
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'XVID'), 30, (width, height))
+    for index in range(frame_count):
+        writer.write(np.roll(frame, index * 4, axis=1))
+    writer.release()
+    return path
+
+
+def build_operations(width: int, height: int, workdir: str) -> list:
+    """
+    :return: List of (name, function, units per call, unit name) for one resolution.
+    """
+    image = synthetic_image(width, height)
+    green_screen = synthetic_green_screen(width, height)
+    mask = lab3_controller.compute_foreground_mask(green_screen).copy()
+    video_path = synthetic_video(os.path.join(workdir, f'source_{width}x{height}.avi'), image)
+    green_video_path = synthetic_video(os.path.join(workdir, f'green_{width}x{height}.avi'), green_screen)
+    frames_dir = os.path.join(workdir, 'frames')
+    # the extracted frames are registered in a catalog of their own, so benchmarking leaves output/ untouched
+    frames_catalog = OutputCatalog(os.path.join(workdir, 'catalog.json'), root=workdir)
+    background_path = os.path.join(workdir, 'background.png')
+    cv2.imwrite(background_path, image)
+    index = FrameIndex.build(video_path)
+    green_hue = cv2.extractChannel(cv2.cvtColor(green_screen, cv2.COLOR_BGR2HSV), 0)
+
+    return [
+        ("lab1.capture_video_threaded",
+         lambda: lab1_controller.capture_video_threaded(video_path, display=False, output_dir=workdir),
+         VIDEO_FRAMES, "frames/s"),
+        ("lab1.frame_index_build", lambda: FrameIndex.build(video_path), 1, "videos/s"),
+        ("lab1.read_frame", lambda: read_frame(video_path, 9, index), 1, "frames/s"),
+        ("lab1.extract_frames",
+         lambda: lab1_controller.extract_frames(video_path, 0, VIDEO_FRAMES, 3, frames_dir, frames_catalog),
+         len(range(0, VIDEO_FRAMES, 3)), "frames/s"),
+        ("lab2.convert_to_gray_scale", lambda: lab2_controller.convert_to_gray_scale(image), 1, "images/s"),
+        ("lab2.apply_sobel_masks", lambda: lab2_controller.apply_sobel_masks(image), 1, "images/s"),
+        ("lab2.apply_gaussian_derivatives", lambda: lab2_controller.apply_gaussian_derivatives(image), 1, "images/s"),
+        ("lab2.compute_fourier_transform", lambda: lab2_controller.compute_fourier_transform(image), 1, "images/s"),
+        ("lab2.apply_box_blur", lambda: lab2_controller.apply_box_blur(image), 1, "images/s"),
+        ("lab3.compute_foreground_mask", lambda: lab3_controller.compute_foreground_mask(green_screen), 1, "images/s"),
+        ("lab3.estimate_key_range", lambda: estimate_key_range(hue_histogram(green_hue)), 1, "images/s"),
+        ("lab3.composite_foreground",
+         lambda: lab3_controller.composite_foreground(green_screen, image, mask), 1, "images/s"),
+        ("lab3.chroma_key_video",
+         lambda: lab3_controller.chroma_key_video(green_video_path, background_path,
+                                                  os.path.join(workdir, 'chroma_key.avi'), display=False),
+         VIDEO_FRAMES, "frames/s"),
+    ]
+
+
+def measure(function, repeats: int, warmup: int = 1) -> tuple:
+    """
+    :return: (latencies in milliseconds, peak Python heap memory in bytes of one extra traced call).
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(warmup):
+            function()
+        latencies = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            function()
+            latencies.append((time.perf_counter() - start) * 1000)
+
+        # memory is traced in a separate call so tracing overhead does not skew the timings
+        tracemalloc.start()
+        function()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return latencies, peak
+
+
+def run(resolutions: list, repeats: int, operation_filter: str = None) -> dict:
+    """
+    :return: Benchmark report with one result per (operation, resolution).
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for resolution in resolutions:
+            width, height = RESOLUTIONS[resolution]
+            operations = build_operations(width, height, workdir)
+            for name, function, units, unit_name in operations:
+                if operation_filter and operation_filter not in name:
+                    continue
+                # video operations are much slower per call, so they get fewer repeats
+                operation_repeats = max(3, repeats // 10) if units > 1 else repeats
+                latencies, peak = measure(function, operation_repeats)
+                p50, p90, p99 = np.percentile(latencies, [50, 90, 99])
+                result = {"operation": name, "resolution": resolution, "width": width, "height": height,
+                          "repeats": operation_repeats, "p50_ms": p50, "p90_ms": p90, "p99_ms": p99,
+                          "mean_ms": float(np.mean(latencies)), "throughput": units / (p50 / 1000),
+                          "throughput_unit": unit_name, "peak_python_heap_mb": peak / 2 ** 20}
+                results.append(result)
+                print(f"{name:<32} {resolution:>4}  p50 {p50:9.2f} ms  p90 {p90:9.2f} ms  p99 {p99:9.2f} ms  "
+                      f"{result['throughput']:9.1f} {unit_name:<9} heap {result['peak_python_heap_mb']:8.1f} MB")
+
+    return {"meta": {"timestamp": datetime.datetime.now().isoformat(timespec='seconds'),
+                     "python": platform.python_version(), "opencv": cv2.__version__, "numpy": np.__version__,
+                     "machine": platform.machine(), "processor": platform.processor(), "cpus": os.cpu_count()},
+            "results": results}
+
+
+def compare(report: dict, baseline: dict, margin: float) -> list:
+    """
+    :param margin: Allowed relative slowdown of the median latency, e.g. 0.1 for 10%.
+    :return: List of (operation, resolution, baseline p50, current p50) for every regression.
+    """
+    baseline_results = {(result["operation"], result["resolution"]): result for result in baseline["results"]}
+    regressions = []
+    for result in report["results"]:
+        previous = baseline_results.get((result["operation"], result["resolution"]))
+        if previous is not None and result["p50_ms"] > previous["p50_ms"] * (1 + margin):
+            regressions.append((result["operation"], result["resolution"], previous["p50_ms"], result["p50_ms"]))
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--resolutions", nargs="+", choices=list(RESOLUTIONS), default=list(RESOLUTIONS))
+    parser.add_argument("--repeats", type=int, default=20, help="Timed calls per image operation")
+    parser.add_argument("--operation", help="Only run operations whose name contains this text")
+    parser.add_argument("--output", help="JSON file for the results (default: output/benchmarks/<timestamp>.json)")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to check for regressions")
+    parser.add_argument("--margin", type=float, default=0.1, help="Allowed slowdown against the baseline")
+    args = parser.parse_args(argv)
+
+    report = run(args.resolutions, args.repeats, args.operation)
+
+    output_path = args.output
+    if output_path is None:
+        os.makedirs(BENCHMARK_DIR, exist_ok=True)
+        output_path = os.path.join(BENCHMARK_DIR, datetime.datetime.now().strftime("%Y%m%d-%H%M%S") + '.json')
+    with open(output_path, 'w') as output_file:
+        json.dump(report, output_file, indent=2)
+    print(f"Saved results to: {output_path}")
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        regressions = compare(report, baseline, args.margin)
+        for operation, resolution, previous, current in regressions:
+            print(f"REGRESSION {operation} {resolution}: {previous:.2f} ms -> {current:.2f} ms "
+                  f"(+{(current / previous - 1) * 100:.0f}%)")
+        if regressions:
+            return 1
+        print(f"No regressions beyond {args.margin * 100:.0f}% against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
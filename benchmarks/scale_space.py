@@ -0,0 +1,124 @@
+"""
+Scale-space benchmark: multi-sigma Gaussian derivatives from one pyramid cascade (utils.scale_space) against the
+current path, which filters the full-resolution image once per sigma (utils.convolution.gaussian_derivatives).
+
+For every resolution the report gives the time of both paths, with the cascade's responses either upsampled back to
+full resolution or left at their pyramid level. It also gives the relative RMS error of the upsampled responses
+against the full-resolution ones, per sigma. A border of 3 * sigma is left out of the error, because the two paths
+extend the image differently. The error depends on the image content: the synthetic image is smooth, so pass
+--image to measure on a representative photograph (resized to every resolution).
+
+Run with: python -m benchmarks.scale_space [--sigmas 5 10] [--resolutions vga hd fhd] [--image photo.jpg]
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from benchmarks.run_benchmarks import BENCHMARK_DIR, RESOLUTIONS, synthetic_image
+from utils.convolution import gaussian_derivatives
+from utils.scale_space import scale_space_derivatives
+
+
+def best_time(function, repeats: int) -> float:
+    """
+    :return: Best wall-clock time of the call in milliseconds.
+    """
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def relative_error(reference: np.ndarray, approximation: np.ndarray, border: int) -> float:
+    """
+    :return: RMS of the difference divided by the RMS of the reference, ignoring `border` pixels on every side.
+    """
+    inner = (slice(border, -border or None), slice(border, -border or None))
+    difference = reference[inner] - approximation[inner]
+    return float(np.sqrt(np.mean(difference ** 2) / np.mean(reference[inner] ** 2)))
+
+
+def run(resolutions: list, sigma_values: list, repeats: int, image: np.ndarray = None) -> list:
+    """
+    :param image: Grayscale image to measure on, resized to every resolution (default: the synthetic image).
+    :return: One result dict per resolution.
+    """
+    results = []
+    for name in resolutions:
+        width, height = RESOLUTIONS[name]
+        if image is None:
+            gray = cv2.cvtColor(synthetic_image(width, height), cv2.COLOR_BGR2GRAY)
+        else:
+            gray = cv2.resize(image, (width, height), interpolation=cv2.INTER_AREA)
+
+        full_ms = best_time(lambda: [gaussian_derivatives(gray, sigma) for sigma in sigma_values], repeats)
+        upsampled_ms = best_time(lambda: scale_space_derivatives(gray, sigma_values), repeats)
+        level_ms = best_time(lambda: scale_space_derivatives(gray, sigma_values, full_resolution=False), repeats)
+
+        errors = {}
+        cascade = scale_space_derivatives(gray, sigma_values)
+        for sigma, (derivative_x, derivative_y, _) in zip(sigma_values, cascade):
+            reference_x, reference_y = gaussian_derivatives(gray, sigma)
+            border = int(np.ceil(3 * sigma))
+            errors[str(sigma)] = max(relative_error(reference_x, derivative_x, border),
+                                     relative_error(reference_y, derivative_y, border))
+
+        result = {"resolution": name, "width": width, "height": height, "full_resolution_ms": full_ms,
+                  "pyramid_upsampled_ms": upsampled_ms, "pyramid_level_ms": level_ms,
+                  "speedup_upsampled": full_ms / upsampled_ms, "speedup_level": full_ms / level_ms,
+                  "relative_error": errors}
+        results.append(result)
+        error_text = "  ".join(f"σ={sigma}: {error * 100:.1f}%" for sigma, error in errors.items())
+        print(f"{name:<5} {width}x{height}: full {full_ms:8.2f} ms  pyramid {upsampled_ms:8.2f} ms "
+              f"({result['speedup_upsampled']:4.1f}x), at level size {level_ms:8.2f} ms "
+              f"({result['speedup_level']:4.1f}x)  error {error_text}")
+    return results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sigmas", type=float, nargs="+", default=[5, 10], help="Standard deviations to compute")
+    parser.add_argument("--resolutions", nargs="+", choices=list(RESOLUTIONS), default=["vga", "hd", "fhd"],
+                        help="Image sizes to measure")
+    parser.add_argument("--image", help="Measure on this image instead of the synthetic one")
+    parser.add_argument("--repeats", type=int, default=5, help="Runs per measurement (the best one is kept)")
+    parser.add_argument("--output",
+                        help="JSON file for the results (default: output/benchmarks/scale_space_<time>.json)")
+    args = parser.parse_args(argv)
+
+    sigma_values = [int(sigma) if float(sigma).is_integer() else sigma for sigma in args.sigmas]
+    image = None
+    if args.image:
+        image = cv2.imread(args.image, cv2.IMREAD_GRAYSCALE)
+        if image is None:
+            print(f"Error: Unable to load image at {args.image}")
+            return 1
+    results = run(args.resolutions, sigma_values, args.repeats, image)
+    report = {"meta": {"timestamp": datetime.datetime.now().isoformat(timespec='seconds'),
+                       "python": platform.python_version(), "opencv": cv2.__version__,
+                       "machine": platform.machine(), "cpu_count": os.cpu_count(), "sigmas": sigma_values,
+                       "image": args.image or "synthetic"},
+              "results": results}
+
+    output_path = args.output
+    if output_path is None:
+        os.makedirs(BENCHMARK_DIR, exist_ok=True)
+        output_path = os.path.join(BENCHMARK_DIR,
+                                   datetime.datetime.now().strftime("scale_space_%Y%m%d-%H%M%S") + '.json')
+    with open(output_path, 'w') as output_file:
+        json.dump(report, output_file, indent=2)
+    print(f"Saved results to: {output_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
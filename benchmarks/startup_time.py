@@ -0,0 +1,110 @@
+"""
+Startup-time report: how long it takes to import the menu, the CLI and each controller in a fresh interpreter.
+
+Each target is imported in a new `python -X importtime` process. The report lists the import time of the target
+(median over --repeats runs, interpreter start-up excluded) and the slowest modules it pulled in, and saves the
+results as JSON. With --baseline, the run fails (exit code 1) if any target got slower than the baseline by more than
+--margin.
+
+Run with: python -m benchmarks.startup_time [--top 10] [--baseline previous.json]
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+
+from utils.file_utils import output_dir
+
+TARGETS = ["view.main_menu", "view.cli", "controller.lab1_controller", "controller.lab2_controller",
+           "controller.lab3_controller"]
+STARTUP_DIR = os.path.join(output_dir, 'benchmarks')
+REPO_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def import_times(module: str) -> list:
+    """
+    Import a module in a fresh interpreter with -X importtime.
+    :return: List of (module name, self microseconds, cumulative microseconds, nesting level), in import order.
+    """
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=REPO_DIR,
+                               capture_output=True, text=True, env=dict(os.environ, MPLBACKEND="Agg"))
+    if completed.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{completed.stderr}")
+
+    entries = []
+    for line in completed.stderr.splitlines():
+        # import time:       self [us] |   cumulative | imported package
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        level = (len(name) - len(name.lstrip())) // 2
+        entries.append((name.strip(), int(self_us), int(cumulative_us), level))
+    return entries
+
+
+def measure(module: str, repeats: int, top: int) -> dict:
+    """
+    :return: Median import time of the module in milliseconds and the slowest modules of the median run.
+    """
+    runs = [import_times(module) for _ in range(repeats)]
+    totals = [next(cumulative for name, _, cumulative, _ in entries if name == module) for entries in runs]
+    median_run = runs[totals.index(sorted(totals)[len(totals) // 2])]
+    slowest = sorted(median_run, key=lambda entry: entry[1], reverse=True)[:top]
+    return {"target": module, "repeats": repeats, "median_ms": statistics.median(totals) / 1000,
+            "min_ms": min(totals) / 1000, "modules_imported": len(median_run),
+            "slowest_modules": [{"module": name, "self_ms": self_us / 1000, "cumulative_ms": cumulative_us / 1000}
+                                for name, self_us, cumulative_us, _ in slowest],
+            "heavy_modules": sorted({name for name, _, _, _ in median_run
+                                     if name in ("cv2", "numpy", "matplotlib", "matplotlib.pyplot")})}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--targets", nargs="+", default=TARGETS, help="Modules to import")
+    parser.add_argument("--repeats", type=int, default=5, help="Fresh interpreters per target")
+    parser.add_argument("--top", type=int, default=5, help="Slowest modules listed per target")
+    parser.add_argument("--output", help="JSON file for the results (default: output/benchmarks/startup_<time>.json)")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to check for regressions")
+    parser.add_argument("--margin", type=float, default=0.2, help="Allowed slowdown against the baseline")
+    args = parser.parse_args(argv)
+
+    results = []
+    for module in args.targets:
+        result = measure(module, args.repeats, args.top)
+        results.append(result)
+        heavy = ", ".join(result["heavy_modules"]) or "none"
+        print(f"{module:<28} {result['median_ms']:8.1f} ms  ({result['modules_imported']} modules, heavy: {heavy})")
+        for slow in result["slowest_modules"]:
+            print(f"    {slow['module']:<40} self {slow['self_ms']:7.1f} ms  cumulative {slow['cumulative_ms']:7.1f} ms")
+    report = {"meta": {"timestamp": datetime.datetime.now().isoformat(timespec='seconds'),
+                       "python": platform.python_version(), "machine": platform.machine()},
+              "results": results}
+
+    output_path = args.output
+    if output_path is None:
+        os.makedirs(STARTUP_DIR, exist_ok=True)
+        output_path = os.path.join(STARTUP_DIR, datetime.datetime.now().strftime("startup_%Y%m%d-%H%M%S") + '.json')
+    with open(output_path, 'w') as output_file:
+        json.dump(report, output_file, indent=2)
+    print(f"Saved results to: {output_path}")
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = {result["target"]: result for result in json.load(baseline_file)["results"]}
+        regressions = [(result["target"], baseline[result["target"]]["median_ms"], result["median_ms"])
+                       for result in results if result["target"] in baseline
+                       and result["median_ms"] > baseline[result["target"]]["median_ms"] * (1 + args.margin)]
+        for target, previous, current in regressions:
+            print(f"REGRESSION {target}: {previous:.1f} ms -> {current:.1f} ms (+{(current / previous - 1) * 100:.0f}%)")
+        if regressions:
+            return 1
+        print(f"No regressions beyond {args.margin * 100:.0f}% against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
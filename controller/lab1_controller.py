@@ -2,54 +2,99 @@ import datetime
 import os
 
 import cv2
+import numpy as np
 
+from utils.capture_pipeline import CapturePipeline
 from utils.file_utils import VIDEO_DIR, IMAGE_DIR
+from utils.frame_index import FrameIndex, read_frame, read_frames
+from utils.motion_detector import MotionDetector
+from utils.multi_source_recorder import MultiSourceRecorder
+from utils.output_catalog import get_output_catalog
+from utils.pre_roll import PreRollBuffer
+from utils.profiler import profiler
+from utils.recording_profile import DEFAULT_PROFILE, FALLBACK_FPS, VIDEO_EXTENSIONS, get_recording_profile, \
+    source_fps
+from view.image_viewer import show_images
 
 
-def setup_camera():
+def setup_camera(source=0, output_dir=VIDEO_DIR, file_name=None, profile=DEFAULT_PROFILE):
     """
-    :return: camera object, video writer object, fps
+    :param source: Camera index, or path to a video file to use in place of the camera.
+    :param output_dir: Directory where the video is saved.
+    :param file_name: Name of the video file without extension (defaults to the current datetime); the extension
+    comes from the recording profile.
+    :param profile: Name of a recording profile (see utils/recording_profile.py) or a RecordingProfile.
+    :return: camera object, video writer object (None if it could not be opened), fps
     """
-    camera = cv2.VideoCapture(0)
-    fps = camera.get(cv2.CAP_PROP_FPS)
+    camera = cv2.VideoCapture(source)
+    # many cameras report 0 FPS, which would produce a broken file, so the frame rate is measured instead
+    fps = source_fps(camera, isinstance(source, str)) if camera.isOpened() else FALLBACK_FPS
 
     width = int(camera.get(cv2.CAP_PROP_FRAME_WIDTH))
     height = int(camera.get(cv2.CAP_PROP_FRAME_HEIGHT))
 
     # use current datetime as video filename
-    curr_datetime = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
-    video_abspath = os.path.join(VIDEO_DIR, f'{curr_datetime}.avi')
-    print(f"Saving video to: {video_abspath}")
-
-    fourcc = cv2.VideoWriter_fourcc(*'XVID')
-    out = cv2.VideoWriter(video_abspath, fourcc, fps, (width, height))
+    if file_name is None:
+        file_name = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+    os.makedirs(output_dir, exist_ok=True)
+    out = get_recording_profile(profile).open_writer(os.path.join(output_dir, file_name), fps, (width, height))
+    if out is not None:
+        print(f"Saving video to: {out.path}")
     return camera, out, fps
 
 
-def capture_video():
+def capture_video(pre_roll_seconds=0, profile=DEFAULT_PROFILE):
     """
     Create a Python program that captures an image sequence from your web camera and saves it as a video to a file using OpenCV.
     Also display the video on screen while you are recording it.
+    While not recording, the last pre_roll_seconds of frames are kept in a preallocated circular buffer and written
+    out as soon as recording starts, so the moments just before SPACE was pressed are not lost.
+    With profiling on, the read/write/show/waitKey stages are timed (and optionally drawn on the preview).
+    :param pre_roll_seconds: Seconds of video kept before recording starts (0, the default, disables it; the frames
+    are preallocated: about 28 MB per second of 640x480 video at 30 FPS, capped at 256 MB).
+    :param profile: Recording profile (codec, container, resolution, frame rate).
     :return: None
     """
-    camera, out, fps = setup_camera()
+    camera, out, fps = setup_camera(profile=profile)
+    if out is None:
+        camera.release()
+        return
+    width = int(camera.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(camera.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    pre_roll = PreRollBuffer.for_duration(pre_roll_seconds, fps, (height, width, 3))
+    img = np.empty((height, width, 3), dtype=np.uint8)
     frame = 0
     recording = False
     while camera.isOpened():
-        ret, img = camera.read()
+        # while idle, frames are read into the pre-roll instead of being thrown away
+        use_pre_roll = not recording and pre_roll.capacity > 0
+        target = pre_roll.next_slot() if use_pre_roll else img
+        with profiler.stage("read"):
+            ret, _ = camera.read(target)
         if not ret:
             break
+        if use_pre_roll:
+            pre_roll.commit()
 
         if recording:
             frame += 1
-            out.write(img)
-            cv2.imshow("Camera", img)
+            with profiler.stage("write"):
+                out.write(img)
+            # the overlay is drawn after the frame was written, so it only shows on screen
+            profiler.draw_overlay(img, ("read", "write", "show", "waitKey"))
+            with profiler.stage("show"):
+                cv2.imshow("Camera", img)
 
-        key = cv2.waitKey(1)
+        with profiler.stage("waitKey"):
+            key = cv2.waitKey(1)
+        profiler.tick()
         if key % 256 == 32:  # SPACE pressed
             recording = not recording
             if recording:
-                print("Started recording...")
+                with profiler.stage("flush"):
+                    pre_rolled = pre_roll.flush(out)
+                frame += pre_rolled
+                print(f"Started recording ({pre_rolled} frames of pre-roll)...")
             else:
                 print("Stopped recording.")
         elif key % 256 == 27:  # ESC pressed
@@ -62,16 +107,184 @@ def capture_video():
     cv2.waitKey(1)  # Force OpenCV to process window events and close
 
 
+def capture_video_threaded(source=0, display=True, buffer_size=64, max_frames=None, output_dir=VIDEO_DIR,
+                           profile=DEFAULT_PROFILE):
+    """
+    Same as capture_video, but grabbing, encoding and display run on separate threads connected by a ring buffer of
+    preallocated frames, so encoder stalls no longer hold up the camera. Prints dropped-frame counters and per-stage
+    latency when recording stops.
+    :param source: Camera index, or path to a video file for headless runs.
+    :param display: Show the video and handle SPACE/ESC. Without display, every frame is recorded until the source
+    ends or max_frames is reached.
+    :param buffer_size: Number of frames the ring buffer can hold.
+    :param max_frames: Stop after this many frames (None for no limit).
+    :param output_dir: Directory where the video is saved.
+    :param profile: Recording profile (codec, container, resolution, frame rate).
+    :return: CapturePipeline with the collected statistics, or None if the video could not be written.
+    """
+    camera, out, fps = setup_camera(source, output_dir, profile=profile)
+    if out is None:
+        camera.release()
+        return None
+    is_file = isinstance(source, str)
+
+    # a file never loses frames, so let the grabber wait for the encoder instead of dropping
+    pipeline = CapturePipeline(camera, out, buffer_size=buffer_size, drop_when_full=not is_file,
+                               display=display, recording=not display, max_frames=max_frames)
+    pipeline.start()
+    try:
+        pipeline.wait()
+    except KeyboardInterrupt:
+        pipeline.stop()
+        pipeline.wait()
+
+    out.release()
+    camera.release()
+    pipeline.report()
+    return pipeline
+
+
+def capture_motion(source=0, display=True, pre_roll_seconds=2.0, max_frames=None, output_dir=VIDEO_DIR,
+                   profile=DEFAULT_PROFILE):
+    """
+    Unattended recording: only write frames while something moves. Each motion event is saved to its own
+    <datetime>_motion<n> video, starting with the pre-roll of frames from just before the motion was detected.
+    :param source: Camera index, or path to a video file to use in place of the camera.
+    :param display: Show the video with the motion state; ESC stops.
+    :param pre_roll_seconds: Seconds of video kept from before each motion event.
+    :param max_frames: Stop after this many frames (None to run until the source ends or ESC is pressed).
+    :param output_dir: Directory where the videos are saved.
+    :param profile: Recording profile (codec, container, resolution, frame rate).
+    :return: Dict with the number of frames read and written, the motion events and their video paths.
+    """
+    camera = cv2.VideoCapture(source)
+    if not camera.isOpened():
+        print(f"Error: Unable to open video source {source}")
+        return {"frames": 0, "written": 0, "events": 0, "videos": []}
+    fps = source_fps(camera, isinstance(source, str))
+    recording_profile = get_recording_profile(profile)
+    width = int(camera.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(camera.get(cv2.CAP_PROP_FRAME_HEIGHT))
+
+    os.makedirs(output_dir, exist_ok=True)
+    detector = MotionDetector((height, width, 3))
+    pre_roll = PreRollBuffer.for_duration(pre_roll_seconds, fps, (height, width, 3))
+    img = np.empty((height, width, 3), dtype=np.uint8)
+    out = None
+    videos = []
+    frames = 0
+    written = 0
+    while camera.isOpened() and (max_frames is None or frames < max_frames):
+        # while idle, frames are read into the pre-roll so each event starts a little before the motion
+        use_pre_roll = out is None and pre_roll.capacity > 0
+        target = pre_roll.next_slot() if use_pre_roll else img
+        with profiler.stage("read"):
+            ret, _ = camera.read(target)
+        if not ret:
+            break
+        frames += 1
+        if use_pre_roll:
+            pre_roll.commit()
+
+        with profiler.stage("motion"):
+            moving = detector.update(target)
+        if moving and out is None:
+            curr_datetime = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+            video_stem = os.path.join(output_dir, f'{curr_datetime}_motion{len(videos) + 1:03d}')
+            out = recording_profile.open_writer(video_stem, fps, (width, height))
+            if out is None:
+                break
+            print(f"Motion detected, saving video to: {out.path}")
+            videos.append(out.path)
+            if use_pre_roll:
+                written += pre_roll.flush(out)  # the pre-roll already holds the current frame
+            else:
+                out.write(target)
+                written += 1
+        elif moving:
+            with profiler.stage("write"):
+                out.write(target)
+            written += 1
+        elif out is not None:
+            print("Motion stopped.")
+            out.release()
+            out = None
+
+        if display:
+            status = f"MOTION {detector.ratio * 100:.1f}%" if moving else f"idle {detector.ratio * 100:.1f}%"
+            preview = cv2.putText(target.copy(), status, (10, height - 15), cv2.FONT_HERSHEY_SIMPLEX, 0.7,
+                                  (0, 0, 255) if moving else (0, 255, 0), 2, cv2.LINE_AA)
+            cv2.imshow("Motion", profiler.draw_overlay(preview, ("read", "motion", "write")))
+            if cv2.waitKey(1) % 256 == 27:  # ESC pressed
+                print("Exiting...")
+                break
+        profiler.tick()
+
+    if out is not None:
+        out.release()
+    camera.release()
+    if display:
+        cv2.destroyAllWindows()
+        cv2.waitKey(1)  # Force OpenCV to process window events and close
+
+    print(f"Read {frames} frames, wrote {written} ({written / max(frames, 1) * 100:.1f}%) "
+          f"in {len(videos)} motion events")
+    return {"frames": frames, "written": written, "events": len(videos), "videos": videos}
+
+
+def record_multiple_sources(sources, display=True, buffer_size=64, max_frames=None, output_dir=VIDEO_DIR,
+                            profile=DEFAULT_PROFILE):
+    """
+    Record several cameras or video files at the same time, each to its own <datetime>_source<n> video with its own
+    grab and encode threads. The grab time of every frame is saved next to each video for synchronisation.
+    :param sources: Camera indices and/or video file paths.
+    :param display: Show a preview per source and handle SPACE/ESC. Without display, every source is recorded until
+    it ends or max_frames is reached.
+    :param buffer_size: Number of frames each source's ring buffer can hold.
+    :param max_frames: Stop each source after this many frames (None for no limit).
+    :param output_dir: Directory where the videos are saved.
+    :param profile: Recording profile (codec, container, resolution, frame rate).
+    :return: Dict with the per-source and aggregate statistics (see MultiSourceRecorder.report).
+    """
+    curr_datetime = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+    recorder = MultiSourceRecorder(display)
+    writers = []
+    for number, source in enumerate(sources):
+        camera, out, fps = setup_camera(source, output_dir, f'{curr_datetime}_source{number}', profile)
+        if out is None:
+            camera.release()
+            continue
+        if not camera.isOpened():
+            print(f"Error: Unable to open video source {source}")
+            out.release()
+            continue
+        writers.append((camera, out))
+        recorder.add_source(source, camera, out, out.path, buffer_size, max_frames)
+    if not recorder.sources:
+        print("No video source could be opened.")
+        return {'sources': [], 'written': 0, 'dropped': 0, 'seconds': 0.0, 'frames_per_second': 0.0}
+
+    recorder.start()
+    try:
+        recorder.wait()
+    except KeyboardInterrupt:
+        recorder.stop()
+        recorder.wait()
+
+    for camera, out in writers:
+        out.release()
+        camera.release()
+    recorder.save_timestamps()
+    return recorder.report()
+
+
 def get_latest_video_path():
     """
     :return: Path to the latest video file.
     """
-    video_files = [f for f in os.listdir(VIDEO_DIR) if f.endswith('.avi')]
-    if not video_files:
+    video_path = get_output_catalog().latest(VIDEO_DIR, VIDEO_EXTENSIONS)
+    if video_path is None:
         return None
-    video_files.sort(key=lambda x: os.path.getmtime(os.path.join(VIDEO_DIR, x)), reverse=True)
-    latest_video = video_files[0]
-    video_path = os.path.join(VIDEO_DIR, latest_video)
     if not os.path.exists(video_path):
         raise FileNotFoundError("Video file not found.")
     print(f"Latest video path: {video_path}")
@@ -89,10 +302,6 @@ def get_video(video_path):
     fps = camera.get(cv2.CAP_PROP_FPS)
     frame_count = int(camera.get(cv2.CAP_PROP_FRAME_COUNT))
     print(f"FPS: {fps}, Total Frames: {frame_count}")
-
-    if frame_count < 10:
-        raise Exception(f"Video has less than 10 frames. Cannot extract the 10th frame. Frame count: {frame_count}")
-
     return camera
 
 
@@ -113,21 +322,64 @@ def generate_image():
     :return: None
     """
     latest_video_path = get_latest_video_path()
+    if latest_video_path is None:
+        print("No video files found.")
+        return
 
-    # get all frames from the latest video
-    camera = get_video(latest_video_path)
+    # Keyframe index of the video, built on first use and saved next to it
+    index = FrameIndex.load_or_build(latest_video_path)
+    if index.frame_count < 10:
+        print(f"Video has less than 10 frames. Cannot extract the 10th frame. Frame count: {index.frame_count}")
+        return
 
     # Capture the 10th frame and save it as an image with the same name as the video file but with .jpg extension
-    camera.set(cv2.CAP_PROP_POS_FRAMES, 9)  # 0-indexed frame
-    ret, img = camera.read()
-    if ret:
+    img = read_frame(latest_video_path, 9, index)  # 0-indexed frame
+    if img is not None:
         image_path = get_image_path_from_video(os.path.basename(latest_video_path))
         cv2.imwrite(image_path, img)
+        get_output_catalog().register(image_path)  # the image may have overwritten an older one
         print(f"Saved 10th frame as image: {image_path}")
     else:
         print("Failed to read the 10th frame.")
 
-    camera.release()
+
+def extract_frames(video_path, start, stop, step=1, output_dir=IMAGE_DIR, catalog=None):
+    """
+    Save every step-th frame from start up to (but not including) stop as <video name>_<frame number>.jpg, e.g. to
+    build a dataset from a recording. Only the frames from the nearest keyframe onwards are decoded.
+    :param video_path: Path to the video file.
+    :param start: First frame number (0-indexed).
+    :param stop: Frame number to stop before (clamped to the length of the video).
+    :param step: Distance between extracted frames.
+    :param output_dir: Directory where the images are written.
+    :param catalog: OutputCatalog the images are registered in (defaults to the shared one of the output directory).
+    :return: List of the written image paths.
+    """
+    index = FrameIndex.load_or_build(video_path)
+    stop = min(stop, index.frame_count)
+    video_name = os.path.splitext(os.path.basename(video_path))[0]
+    os.makedirs(output_dir, exist_ok=True)
+
+    image_paths = []
+    for frame_number, img in read_frames(video_path, range(start, stop, step), index):
+        image_path = os.path.join(output_dir, f"{video_name}_{frame_number:06d}.jpg")
+        cv2.imwrite(image_path, img)
+        image_paths.append(image_path)
+    (catalog or get_output_catalog()).register(image_paths)  # extracting the same range again overwrites the images
+    print(f"Saved {len(image_paths)} frames from {video_path} to {output_dir}")
+    return image_paths
+
+
+def extract_frames_from_latest_video(start, stop, step=1):
+    """
+    Extract a range of frames from the latest recorded video into IMAGE_DIR.
+    :return: List of the written image paths.
+    """
+    latest_video_path = get_latest_video_path()
+    if latest_video_path is None:
+        print("No video files found.")
+        return []
+    return extract_frames(latest_video_path, start, stop, step)
 
 
 def get_latest_image_path():
@@ -135,12 +387,7 @@ def get_latest_image_path():
     Get the path to the latest image file in the IMAGE_DIR.
     :return: Path to the latest image file.
     """
-    image_files = [f for f in os.listdir(IMAGE_DIR) if f.endswith('.jpg')]
-    if not image_files:
-        return None
-    image_files.sort(key=lambda x: os.path.getmtime(os.path.join(IMAGE_DIR, x)), reverse=True)
-    latest_image = image_files[0]
-    return os.path.join(IMAGE_DIR, latest_image)
+    return get_output_catalog().latest(IMAGE_DIR, '.jpg')
 
 
 def display_image(image_file):
@@ -152,10 +399,7 @@ def display_image(image_file):
     if image_file:
         print(f"Latest image file: {image_file}")
         img = cv2.imread(image_file)
-        cv2.imshow("Latest Image", img)
-        cv2.waitKey(0)
-        cv2.destroyAllWindows()
-        cv2.waitKey(1)  # Force OpenCV to process window events and close
+        show_images([(os.path.basename(image_file), img)], "Latest Image")
     else:
         print("No image files found.")
 
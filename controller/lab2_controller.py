@@ -1,6 +1,422 @@
+import os
+import time
+from functools import partial
+
 import cv2
 import numpy as np
 
+from utils.batch_runner import run_batch
+from utils.convolution import gaussian_derivatives
+from utils.edge_analysis import EdgeAnalyzer, magnitude_image, orientation_image
+from utils.filter_graph import SOURCE, FilterGraph
+from utils.frequency_filter import gaussian_lowpass, image_spectrum, lowpass_margin, magnitude_spectrum
+from utils.image_cache import get_derived, load_image
+from utils.result_cache import cached_result
+from utils.scale_space import scale_space_derivatives
+from utils.tiled_processing import load_source, tile_size_for_budget, tiled_apply
+from view.image_viewer import show_images
+
+
+# Sobel filter masks for x and y direction
+SOBEL_X = np.array([[10, 0, -10]], dtype=np.float32)
+
+SOBEL_Y = np.array([[10],
+                    [0],
+                    [-10]], dtype=np.float32)
+
+# 5x5 averaging filter kernel
+BOX_KERNEL = np.ones((5, 5), np.float32) / 25
+
+# EdgeAnalyzer per sigma (None: Sobel masks), see get_edge_analyzer
+_edge_analyzers = {}
+# (FilterGraph, output names) per filter chain and settings, see run_filter_chain
+_chain_graphs = {}
+
+
+def convert_to_gray_scale(image: np.ndarray) -> np.ndarray:
+    """
+    Headless version of gray_scale.
+    :param image: BGR image (a single-channel image is returned unchanged).
+    :return: Grayscale image.
+    """
+    if image.ndim == 2:
+        return image
+    return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+
+def apply_sobel_masks(image: np.ndarray) -> tuple:
+    """
+    Headless version of filter_image_with_mask.
+    :param image: BGR or grayscale image.
+    :return: (filtered_x, filtered_y) Sobel responses of the grayscale image.
+    """
+    gray_image = convert_to_gray_scale(image)
+
+    filtered_x = cv2.filter2D(gray_image, -1, SOBEL_X)
+    filtered_y = cv2.filter2D(gray_image, -1, SOBEL_Y)
+    return filtered_x, filtered_y
+
+
+def apply_gaussian_derivatives(image: np.ndarray, sigma_values=(5, 10), method: str = "auto") -> list:
+    """
+    Headless version of create_filter_mask.
+    :param image: BGR or grayscale image.
+    :param sigma_values: Standard deviations of the Gaussian.
+    :param method: "separable", "fft" or "auto" to filter the full-resolution image once per sigma (see
+    gaussian_derivatives), or "pyramid" to derive every sigma from one Gaussian scale-space cascade, where large
+    sigmas are computed on downsampled images (see utils.scale_space).
+    :return: List of (filtered_x, filtered_y, sigma) tuples.
+    """
+    gray_image = convert_to_gray_scale(image)
+    filtered_images = []
+
+    if method == "pyramid":
+        derivatives = scale_space_derivatives(gray_image, sigma_values)
+    else:
+        # Full-size Gaussian derivative kernels (radius 3 * sigma), applied separably or with DFTs
+        derivatives = (gaussian_derivatives(gray_image, sigma, method) + (sigma,) for sigma in sigma_values)
+
+    for derivative_x, derivative_y, sigma in derivatives:
+        filtered_images.append((_saturate(derivative_x), _saturate(derivative_y), sigma))
+
+    return filtered_images
+
+
+def compute_fourier_transform(image: np.ndarray, sigma: float = 50, dtype=np.float64) -> tuple:
+    """
+    Headless version of calculate_fourier_transform.
+    :param image: BGR or grayscale image.
+    :param sigma: Standard deviation of the Gaussian low-pass filter applied in the frequency domain.
+    :param dtype: float64, or float32 to halve memory use on large images.
+    :return: (filtered image scaled to [0, 1], log-magnitude spectrum of the image, image reconstructed from the
+    spectrum).
+    """
+    gray_image = convert_to_gray_scale(image)
+    h, w = gray_image.shape
+
+    # Calculate the real 2D Fourier Transform once and reuse it for filtering and reconstruction
+    margin = lowpass_margin(sigma, gray_image.shape)
+    ft_img, fft_shape = image_spectrum(gray_image, margin, dtype)
+
+    # The Gaussian spectrum is cached per (shape, sigma), so repeated calls on same-sized images skip it
+    result = gaussian_lowpass(gray_image, sigma, dtype, spectrum=(ft_img, fft_shape)) / 255
+
+    magnitude = magnitude_spectrum(ft_img, fft_shape[1])
+    # Reconstruct the image back to spatial domain
+    img_back = np.fft.irfft2(ft_img, fft_shape)[margin:margin + h, margin:margin + w]
+    return result, magnitude, img_back
+
+
+def apply_box_blur(image: np.ndarray) -> np.ndarray:
+    """
+    Headless version of apply_filter_2d.
+    :param image: Input image.
+    :return: Image filtered with a 5x5 averaging kernel.
+    """
+    return cv2.filter2D(image, -1, BOX_KERNEL)
+
+
+def get_edge_analyzer(sigma: float = None) -> EdgeAnalyzer:
+    """
+    :param sigma: None for the Sobel masks of filter_image_with_mask (int16 derivatives), or the standard deviation of
+    the Gaussian derivatives of create_filter_mask (float32 derivatives).
+    :return: EdgeAnalyzer shared by every call with the same sigma in this process, so its scratch buffers are
+    reused from one image to the next.
+    """
+    if sigma not in _edge_analyzers:
+        _edge_analyzers[sigma] = _new_edge_analyzer(sigma)
+    return _edge_analyzers[sigma]
+
+
+def _new_edge_analyzer(sigma: float = None) -> EdgeAnalyzer:
+    # SOBEL_X correlates to minus the x derivative, so it is negated to give the orientation of the Gaussian case
+    return EdgeAnalyzer(-SOBEL_X, -SOBEL_Y) if sigma is None else EdgeAnalyzer(sigma=sigma)
+
+
+def analyse_edges(image: np.ndarray, sigma: float = None, relative_threshold: float = 0.1) -> dict:
+    """
+    Signed derivatives, gradient magnitude and orientation, and the non-maximum-suppressed edge map of an image.
+    :param image: BGR or grayscale image.
+    :param sigma: See get_edge_analyzer.
+    :param relative_threshold: Edges weaker than this fraction of the strongest one are dropped.
+    :return: Dict with dx, dy, magnitude, orientation and edges. The arrays are the analyzer's buffers and are
+    overwritten by the next call with the same sigma.
+    """
+    return get_edge_analyzer(sigma).analyse(convert_to_gray_scale(image), relative_threshold)
+
+
+def load_gray_image(image_path: str):
+    """
+    Grayscale version of the image, decoded and converted once and then served from the image cache.
+    :param image_path: Path to the input image.
+    :return: Read-only grayscale image, or None if it cannot be loaded.
+    """
+    return get_derived(image_path, "gray", convert_to_gray_scale)
+
+
+def _saturate(response: np.ndarray, dst: np.ndarray = None) -> np.ndarray:
+    # Saturate to uint8 like cv2.filter2D with ddepth=-1
+    saturated = np.clip(np.rint(response), 0, 255)
+    if dst is None or dst.shape != response.shape:
+        # like the dst of cv2 functions, a buffer of another size (e.g. from the previous tile) is not used
+        return saturated.astype(np.uint8)
+    np.copyto(dst, saturated, casting='unsafe')
+    return dst
+
+
+def _gray_node(image, dst=None):
+    if image.ndim == 2:
+        return image
+    return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY, dst=dst)
+
+
+def _filter_node(image, kernel=None, dst=None):
+    return cv2.filter2D(image, -1, kernel, dst=dst)
+
+
+def _gaussian_node(gray, sigma=None):
+    # float32 (dx, dy); gaussian_derivatives filters separably or with DFTs, whichever is cheaper for the kernel size
+    return gaussian_derivatives(gray, sigma)
+
+
+def _saturate_node(derivatives, index=0, dst=None):
+    return _saturate(derivatives[index], dst)
+
+
+def _fourier_node(gray):
+    result, magnitude, img_back = compute_fourier_transform(gray, dtype=np.float32)
+    return {"fourier_filtered": np.clip(result * 255, 0, 255).astype(np.uint8),
+            "fourier_spectrum": cv2.normalize(magnitude, None, 0, 255, cv2.NORM_MINMAX, cv2.CV_8U),
+            "fourier_reconstructed": np.clip(np.rint(img_back), 0, 255).astype(np.uint8)}
+
+
+def _edges_node(gray, analyzer=None, relative_threshold=0.1):
+    results = analyzer.analyse(gray, relative_threshold)
+    # the edge map is an analyzer buffer: copy it, the next image would overwrite it
+    return {"edge_magnitude": magnitude_image(results["magnitude"]),
+            "edge_orientation": orientation_image(results["magnitude"], results["orientation"]),
+            "edges": results["edges"].copy()}
+
+
+def _select_node(results, key=None):
+    return results[key]
+
+
+def _add_gray_of(graph: FilterGraph, source: str, prefix: str) -> str:
+    # one grayscale node per source, shared by every operation applied to it
+    name = f"{prefix}gray"
+    if name not in graph.nodes:
+        graph.add(name, _gray_node, (source,), reuse_buffer=True)
+    return name
+
+
+def _add_selections(graph: FilterGraph, results: str, prefix: str, keys) -> list:
+    # one node per entry of a node's result dict
+    for key in keys:
+        graph.add(f"{prefix}{key}", partial(_select_node, key=key), (results,))
+    return [f"{prefix}{key}" for key in keys]
+
+
+def _add_gray(graph, source, prefix, params):
+    return [_add_gray_of(graph, source, prefix)]
+
+
+def _add_sobel(graph, source, prefix, params):
+    gray = _add_gray_of(graph, source, prefix)
+    graph.add(f"{prefix}sobel_x", partial(_filter_node, kernel=SOBEL_X), (gray,), reuse_buffer=True)
+    graph.add(f"{prefix}sobel_y", partial(_filter_node, kernel=SOBEL_Y), (gray,), reuse_buffer=True)
+    return [f"{prefix}sobel_x", f"{prefix}sobel_y"]
+
+
+def _add_gaussian(graph, source, prefix, params):
+    gray = _add_gray_of(graph, source, prefix)
+    names = []
+    for sigma in params["sigma_values"]:
+        derivatives = f"{prefix}gauss_s{sigma}"
+        graph.add(derivatives, partial(_gaussian_node, sigma=sigma), (gray,))
+        for index, axis in enumerate("xy"):
+            graph.add(f"{prefix}gauss_{axis}_s{sigma}", partial(_saturate_node, index=index), (derivatives,),
+                      reuse_buffer=True)
+            names.append(f"{prefix}gauss_{axis}_s{sigma}")
+    return names
+
+
+def _add_fourier(graph, source, prefix, params):
+    transform = f"{prefix}fourier"
+    graph.add(transform, _fourier_node, (_add_gray_of(graph, source, prefix),))
+    return _add_selections(graph, transform, prefix, ("fourier_filtered", "fourier_spectrum", "fourier_reconstructed"))
+
+
+def _add_blur(graph, source, prefix, params):
+    graph.add(f"{prefix}blur", partial(_filter_node, kernel=BOX_KERNEL), (source,), reuse_buffer=True)
+    return [f"{prefix}blur"]
+
+
+def _add_edges(graph, source, prefix, params):
+    # every edges node owns its analyzer: nodes of the same level run on parallel threads
+    analysis = f"{prefix}edge_analysis"
+    graph.add(analysis, partial(_edges_node, analyzer=_new_edge_analyzer(params["edge_sigma"]),
+                                relative_threshold=params["relative_threshold"]),
+              (_add_gray_of(graph, source, prefix),))
+    return _add_selections(graph, analysis, prefix, ("edge_magnitude", "edge_orientation", "edges"))
+
+
+# Operations usable in a batch filter chain. Each one adds its nodes to a FilterGraph, reading the given source node,
+# and returns the names of its output nodes (prefixed with the name of the source, except for the input image).
+BATCH_OPERATIONS = {
+    "gray": _add_gray,
+    "sobel": _add_sobel,
+    "gaussian": _add_gaussian,
+    "fourier": _add_fourier,
+    "blur": _add_blur,
+    "edges": _add_edges,
+}
+
+
+def _graph_params(sigma_values, edge_sigma, relative_threshold) -> dict:
+    return {"sigma_values": tuple(sigma_values), "edge_sigma": edge_sigma, "relative_threshold": relative_threshold}
+
+
+def build_filter_graph(sigma_values=(5, 10), workers: int = 4, edge_sigma: float = None,
+                       relative_threshold: float = 0.1) -> FilterGraph:
+    """
+    The lab2 filters as one FilterGraph: the grayscale image is computed once and shared by the Sobel, Gaussian
+    derivative, Fourier and edge branches, and the x/y responses of every filter run in parallel. Output names match
+    the batch outputs of BATCH_OPERATIONS.
+    Example: build_filter_graph().run(image, ["sobel_x", "sobel_y", "gauss_x_s5"])
+    :param sigma_values: Standard deviations of the Gaussian derivative filters.
+    :param workers: Threads used to run independent filters in parallel.
+    :param edge_sigma: See get_edge_analyzer.
+    :param relative_threshold: See analyse_edges.
+    :return: FilterGraph with the nodes gray, sobel_x, sobel_y, gauss_x_s<sigma>, gauss_y_s<sigma>, fourier_filtered,
+    fourier_spectrum, fourier_reconstructed, blur, edge_magnitude, edge_orientation and edges.
+    """
+    graph = FilterGraph(workers)
+    params = _graph_params(sigma_values, edge_sigma, relative_threshold)
+    for add_operation in BATCH_OPERATIONS.values():
+        add_operation(graph, SOURCE, "", params)
+    return graph
+
+
+def build_chain_graph(chain, sigma_values=(5, 10), workers: int = 1, edge_sigma: float = None,
+                      relative_threshold: float = 0.1) -> tuple:
+    """
+    A filter chain as one FilterGraph. Every operation is applied to each output of the previous one, so the output
+    names record the path through the chain (e.g. sobel then blur gives sobel_x_blur and sobel_y_blur), like
+    utils.batch_runner.apply_chain.
+    :param chain: Operation names from BATCH_OPERATIONS, applied in order.
+    :param sigma_values: Standard deviations of the Gaussian derivative filters.
+    :param workers: Threads used to run independent filters in parallel.
+    :param edge_sigma: See get_edge_analyzer.
+    :param relative_threshold: See analyse_edges.
+    :return: (graph, names of the output nodes of the last operation).
+    """
+    unknown = [name for name in chain if name not in BATCH_OPERATIONS]
+    if unknown:
+        raise ValueError(f"Unknown operations: {unknown}. Available: {list(BATCH_OPERATIONS)}")
+    graph = FilterGraph(workers)
+    params = _graph_params(sigma_values, edge_sigma, relative_threshold)
+    outputs = [SOURCE]
+    for name in chain:
+        add_operation = BATCH_OPERATIONS[name]
+        outputs = [output for source in outputs
+                   for output in add_operation(graph, source, "" if source == SOURCE else f"{source}_", params)]
+    return graph, outputs
+
+
+def run_filter_chain(image: np.ndarray, chain, sigma_values=(5, 10), edge_sigma: float = None,
+                     relative_threshold: float = 0.1, workers: int = 1) -> dict:
+    """
+    Run a filter chain on one image. The graph of each chain is built once per process and kept, so the buffers of
+    its intermediates are reused from one image to the next (in a batch, by every image a worker process handles).
+    :param image: Input image.
+    :param chain: Operation names from BATCH_OPERATIONS, applied in order.
+    :param workers: Threads used to run independent filters in parallel (a batch already uses a process per core).
+    :return: Dict of output name to image; see build_chain_graph for the other parameters.
+    """
+    key = (tuple(chain), tuple(sigma_values), edge_sigma, relative_threshold, workers)
+    if key not in _chain_graphs:
+        _chain_graphs[key] = build_chain_graph(chain, sigma_values, workers, edge_sigma, relative_threshold)
+    graph, outputs = _chain_graphs[key]
+    return graph.run(image, outputs)
+
+
+def _cached_filter_chain(image, chain=(), sigma_values=(5, 10), edge_sigma=None, relative_threshold=0.1):
+    # repeated batch runs over the same images read the results from the result cache instead of recomputing them
+    params = {"chain": list(chain), "sigma_values": list(sigma_values), "edge_sigma": edge_sigma,
+              "relative_threshold": relative_threshold}
+    return cached_result(image, "lab2.chain", params,
+                         lambda: run_filter_chain(image, chain, sigma_values, edge_sigma, relative_threshold))
+
+
+# Overlap each operation needs around a tile to give the same result as on the whole image: the radius of its
+# largest kernel (Gaussian derivatives use radius ceil(3 * sigma) for sigma up to 10). The Fourier transform is global
+# and cannot be tiled.
+TILE_HALOS = {
+    "gray": 0,
+    "sobel": 1,
+    "gaussian": 30,
+    "blur": 2,
+}
+# Rough working memory per pixel of a padded tile: the BGR input plus the float32 temporaries and uint8 outputs of the
+# heaviest operation (the Gaussian derivatives)
+TILE_BYTES_PER_PIXEL = 48
+
+
+def process_large_image(input_path: str, output_dir: str, operation: str, tile_size: int = None,
+                        max_memory_mb: int = 256) -> dict:
+    """
+    Run one lab2 filter over an image too large to process at once. The image is read tile by tile (with the
+    overlap the filter needs) and every output is written tile by tile to <stem>_<output name>.npy, so memory use
+    is bounded by the tile size instead of the image size.
+    :param input_path: Image to filter; a .npy file is memory-mapped, other formats are decoded in full first.
+    :param output_dir: Directory where the .npy outputs are written.
+    :param operation: Operation name from TILE_HALOS.
+    :param tile_size: Side length of the tiles (by default the largest that fits max_memory_mb).
+    :param max_memory_mb: Memory ceiling for one tile and its results, used when tile_size is not given.
+    :return: Dict of output name to .npy path (empty if the image could not be loaded).
+    """
+    if operation not in TILE_HALOS:
+        raise ValueError(f"Operation {operation} cannot be tiled. Available: {list(TILE_HALOS)}")
+    source = load_source(input_path)
+    if source is None:
+        print(f"Error: Unable to load image at {input_path}")
+        return {}
+
+    halo = TILE_HALOS[operation]
+    tile_size = tile_size or tile_size_for_budget(max_memory_mb * 2 ** 20, halo, TILE_BYTES_PER_PIXEL)
+    stem = os.path.splitext(os.path.basename(input_path))[0]
+    start = time.perf_counter()
+    paths = tiled_apply(source, partial(run_filter_chain, chain=(operation,), workers=4),
+                        lambda name: os.path.join(output_dir, f"{stem}_{name}.npy"), tile_size, halo)
+    elapsed = time.perf_counter() - start
+    megapixels = source.shape[0] * source.shape[1] / 1e6
+    print(f"Filtered {megapixels:.1f} MP with {operation} in {tile_size}px tiles in {elapsed:.2f}s: "
+          f"{megapixels / elapsed:.1f} MP/s")
+    return paths
+
+
+def batch_process(input_pattern: str, output_dir: str, chain: list, workers: int = None, edge_sigma: float = None,
+                  relative_threshold: float = 0.1) -> dict:
+    """
+    Run a chain of lab2 filters over every image in a directory or glob, without opening any window. Each worker
+    process runs the images through the chain's FilterGraph (see run_filter_chain).
+    :param input_pattern: Directory containing images, or a glob pattern.
+    :param output_dir: Directory where the results are written.
+    :param chain: Operation names from BATCH_OPERATIONS, applied in order.
+    :param workers: Number of worker processes (defaults to the CPU count).
+    :param edge_sigma: Derivatives of the edges operation: None for the Sobel masks, or the standard deviation of
+    Gaussian derivatives.
+    :param relative_threshold: See analyse_edges.
+    :return: Batch summary (see run_batch).
+    """
+    unknown = [name for name in chain if name not in BATCH_OPERATIONS]
+    if unknown:
+        raise ValueError(f"Unknown operations: {unknown}. Available: {list(BATCH_OPERATIONS)}")
+    return run_batch(input_pattern, output_dir,
+                     [partial(_cached_filter_chain, chain=tuple(chain), edge_sigma=edge_sigma,
+                              relative_threshold=relative_threshold)], workers)
+
 
 def gray_scale(image_path):
     """
@@ -9,28 +425,16 @@ def gray_scale(image_path):
     :return: None
     """
     # Load the original image
-    original_image = cv2.imread(image_path)
+    original_image = load_image(image_path)
     if original_image is None:
         print(f"Error: Unable to load image at {image_path}")
         return
 
     # Convert the image to grayscale
-    gray_image = cv2.cvtColor(original_image, cv2.COLOR_BGR2GRAY)
-
-    # Display the original image
-    cv2.imshow("Original Image", original_image)
-
-    # Display the grayscale image
-    cv2.imshow("Grayscale Image", gray_image)
+    gray_image = load_gray_image(image_path)
 
-    # Wait for q key press to close the windows
-    print("Press 'q' to close the image windows.")
-    while True:
-        if cv2.waitKey(1) & 0xFF == ord('q'):
-            break
-
-    cv2.destroyAllWindows()
-    cv2.waitKey(1)  # Force OpenCV to process window events and close
+    # Display the original and the grayscale image
+    show_images([("Original Image", original_image), ("Grayscale Image", gray_image)])
 
 
 def filter_image_with_mask(image_path):
@@ -40,40 +444,23 @@ def filter_image_with_mask(image_path):
     :return: None
     """
     # Load the original image
-    original_image = cv2.imread(image_path)
+    original_image = load_image(image_path)
     if original_image is None:
         print(f"Error: Unable to load image at {image_path}")
         return
 
-    # Convert the image to grayscale
-    gray_image = cv2.cvtColor(original_image, cv2.COLOR_BGR2GRAY)
-
-    # Define Sobel filter masks for x and y direction
-    sobel_x = np.array([[10, 0, -10]], dtype=np.float32)
-
-    sobel_y = np.array([[10],
-                        [0],
-                        [-10]], dtype=np.float32)
-
     # Apply the Sobel filters to the grayscale image
-    filtered_x = cv2.filter2D(gray_image, -1, sobel_x)
-    filtered_y = cv2.filter2D(gray_image, -1, sobel_y)
-
-    # Display the original image
-    cv2.imshow("Original Image", original_image)
+    filtered_x, filtered_y = apply_sobel_masks(load_gray_image(image_path))
 
-    # Display the filtered images
-    cv2.imshow("Sobel Filtered Image (X direction)", filtered_x)
-    cv2.imshow("Sobel Filtered Image (Y direction)", filtered_y)
+    # Combine the signed x and y responses into gradient magnitude, orientation and thin edges
+    edges = analyse_edges(load_gray_image(image_path))
 
-    # Wait for q key press to close the windows
-    print("Press 'q' to close the image windows.")
-    while True:
-        if cv2.waitKey(1) & 0xFF == ord('q'):
-            break
-
-    cv2.destroyAllWindows()
-    cv2.waitKey(1)  # Force OpenCV to process window events and close
+    # Display the original and the filtered images
+    show_images([("Original Image", original_image), ("Sobel Filtered Image (X direction)", filtered_x),
+                 ("Sobel Filtered Image (Y direction)", filtered_y),
+                 ("Gradient Magnitude", magnitude_image(edges["magnitude"])),
+                 ("Gradient Orientation", orientation_image(edges["magnitude"], edges["orientation"])),
+                 ("Edges (non-maximum suppressed)", edges["edges"])])
 
 
 def create_filter_mask(image_path):
@@ -83,50 +470,27 @@ def create_filter_mask(image_path):
     :return: None
     """
     # Load the original image
-    original_image = cv2.imread(image_path)
+    original_image = load_image(image_path)
     if original_image is None:
         print(f"Error: Unable to load image at {image_path}")
         return
 
-    # Convert the image to grayscale
-    gray_image = cv2.cvtColor(original_image, cv2.COLOR_BGR2GRAY)
-
-    # Define Gaussian derivative filter masks for sigma = 5 and sigma = 10
+    # Apply Gaussian derivative filters for sigma = 5 and sigma = 10 (read back from the result cache if this image
+    # was filtered before)
     sigma_values = [5, 10]
-    filtered_images = []
+    filtered = cached_result(image_path, "lab2.gaussian", {"sigma_values": sigma_values},
+                             lambda: run_filter_chain(load_gray_image(image_path), ("gaussian",), sigma_values))
 
+    # Display the original and the filtered images
+    pages = [("Original Image", original_image)]
     for sigma in sigma_values:
-        ksize = int(6 * sigma + 1)  # Kernel size
-        if ksize % 2 == 0:
-            ksize += 1  # Ensure kernel size is odd
-        ksize = min(ksize, 31)  # Limit maximum kernel size to 31
-
-        # Create Gaussian derivative filters
-        gauss_deriv_x = cv2.getDerivKernels(1, 0, ksize, normalize=True)[0]
-        gauss_deriv_y = cv2.getDerivKernels(0, 1, ksize, normalize=True)[0]
-
-        # Apply the filters to the grayscale image
-        filtered_x = cv2.filter2D(gray_image, -1, gauss_deriv_x)
-        filtered_y = cv2.filter2D(gray_image, -1, gauss_deriv_y)
-
-        filtered_images.append((filtered_x, filtered_y, sigma))
-
-    # Display the original image
-    cv2.imshow("Original Image", original_image)
-
-    # Display the filtered images
-    for filtered_x, filtered_y, sigma in filtered_images:
-        cv2.imshow(f"Gaussian Derivative Filtered Image (X direction, σ={sigma})", filtered_x)
-        cv2.imshow(f"Gaussian Derivative Filtered Image (Y direction, σ={sigma})", filtered_y)
-
-    # Wait for q key press to close the windows
-    print("Press 'q' to close the image windows.")
-    while True:
-        if cv2.waitKey(1) & 0xFF == ord('q'):
-            break
-
-    cv2.destroyAllWindows()
-    cv2.waitKey(1)  # Force OpenCV to process window events and close
+        filtered_x, filtered_y = filtered[f"gauss_x_s{sigma}"], filtered[f"gauss_y_s{sigma}"]
+        pages.append((f"Gaussian Derivative Filtered Image (X direction, σ={sigma})", filtered_x))
+        pages.append((f"Gaussian Derivative Filtered Image (Y direction, σ={sigma})", filtered_y))
+        edges = analyse_edges(load_gray_image(image_path), sigma)
+        pages.append((f"Gradient Magnitude (σ={sigma})", magnitude_image(edges["magnitude"])))
+        pages.append((f"Edges (non-maximum suppressed, σ={sigma})", edges["edges"]))
+    show_images(pages)
 
 
 def calculate_fourier_transform(image_path):
@@ -136,47 +500,24 @@ def calculate_fourier_transform(image_path):
     :param image_path: Path to the input image.
     :return: None
     """
-    # Load the original image
-    original_image = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
+    # Load the grayscale image (shared with the other lab2 actions through the image cache)
+    original_image = load_gray_image(image_path)
     if original_image is None:
         print(f"Error: Unable to load image at {image_path}")
         return
 
-    sigma = 50
-    h, w = original_image.shape
-    x, y = np.meshgrid(np.arange(0, w), np.arange(0, h))
-    kernel = np.exp(-((x - w / 2) ** 2 + (y - h / 2) ** 2) / (2 * sigma ** 2)) / (2 * np.pi * sigma ** 2)
-
-    # Calculate the 2D Fourier Transform
-    ft_img = np.fft.fft2(original_image)
-    ft_kernel = np.fft.fft2(np.fft.fftshift(kernel))
-
-    result = abs(np.fft.ifft2(ft_img * ft_kernel)) / 255
-
-    magnitude_spectrum = 20 * np.log(abs(result))
-    # Reconstruct the image back to spatial domain
-    img_back = np.fft.ifft2(ft_img).real
-
-    # result = cv2.filter2D(img, -1, kernel)
-    cv2.imshow("result", result)
-
-    # Display the original image
-    cv2.imshow("Original Image", original_image)
-
-    # Display the magnitude spectrum
-    cv2.imshow("Magnitude Spectrum", magnitude_spectrum.astype(np.uint8))
-
-    # Display the reconstructed image
-    cv2.imshow("Reconstructed Image", img_back.astype(np.uint8))
+    def compute():
+        result, magnitude, img_back = compute_fourier_transform(original_image)
+        return {"result": result, "magnitude": magnitude, "img_back": img_back}
 
-    # Wait for q key press to close the windows
-    print("Press 'q' to close the image windows.")
-    while True:
-        if cv2.waitKey(1) & 0xFF == ord('q'):
-            break
+    # Read back from the result cache if this image was transformed before
+    transformed = cached_result(image_path, "lab2.fourier_display", {"sigma": 50}, compute)
+    result, magnitude, img_back = transformed["result"], transformed["magnitude"], transformed["img_back"]
 
-    cv2.destroyAllWindows()
-    cv2.waitKey(1)  # Force OpenCV to process window events and close
+    # Display the original image, the filtered result, the magnitude spectrum and the reconstructed image
+    show_images([("Original Image", original_image), ("result", result),
+                 ("Magnitude Spectrum", cv2.normalize(magnitude, None, 0, 255, cv2.NORM_MINMAX, cv2.CV_8U)),
+                 ("Reconstructed Image", np.clip(np.rint(img_back), 0, 255).astype(np.uint8))])
 
 
 def apply_filter_2d(image_path):
@@ -186,28 +527,13 @@ def apply_filter_2d(image_path):
     :return: None
     """
     # Load the original image
-    original_image = cv2.imread(image_path)
+    original_image = load_image(image_path)
     if original_image is None:
         print(f"Error: Unable to load image at {image_path}")
         return
 
-    # Define a 5x5 averaging filter kernel
-    kernel = np.ones((5, 5), np.float32) / 25
-
-    # Apply the filter to the image
-    filtered_image = cv2.filter2D(original_image, -1, kernel)
-
-    # Display the original image
-    cv2.imshow("Original Image", original_image)
-
-    # Display the filtered image
-    cv2.imshow("Filtered Image", filtered_image)
-
-    # Wait for q key press to close the windows
-    print("Press 'q' to close the image windows.")
-    while True:
-        if cv2.waitKey(1) & 0xFF == ord('q'):
-            break
+    # Apply a 5x5 averaging filter to the image
+    filtered_image = apply_box_blur(original_image)
 
-    cv2.destroyAllWindows()
-    cv2.waitKey(1)  # Force OpenCV to process window events and close
+    # Display the original and the filtered image
+    show_images([("Original Image", original_image), ("Filtered Image", filtered_image)])
@@ -1,10 +1,22 @@
+import datetime
 import os
+import time
+from functools import partial
 
 import cv2
-import matplotlib.pyplot as plt
 import numpy as np
 
-from utils.file_utils import IMAGE_DIR
+from utils.compositing import composite
+from utils.file_utils import LAB3_MASK_DIR, VIDEO_DIR
+from utils.filter_graph import FilterGraph, read_frames
+from utils.hue_lut import apply_hue_lut, build_hue_lut
+from utils.image_cache import get_derived, load_image
+from utils.profiler import profiler
+from utils.recording_profile import DEFAULT_PROFILE, get_recording_profile, source_fps
+from utils.result_cache import cached_result
+from utils.threshold_estimation import RunningHueEstimator, estimate_key_range, hue_histogram
+from utils.tiled_processing import chunked_map, create_npy, load_source, open_npy
+from view.image_viewer import show_images
 
 # Determine thresholds for removing the green background (these values may need to be adjusted)
 lower_thresholds = [59]  # Lower bound for green hue
@@ -20,8 +32,9 @@ def task1(input_image_path: str, target_image_path: str) -> None:
     :return: None
     """
     # Load the input and target images
-    input_image = cv2.imread(input_image_path)
-    target_image = cv2.imread(target_image_path)
+    with profiler.stage("decode"):
+        input_image = load_image(input_image_path)
+        target_image = load_image(target_image_path)
 
     if input_image is None:
         print(f"Error: Unable to load input image at {input_image_path}")
@@ -31,63 +44,56 @@ def task1(input_image_path: str, target_image_path: str) -> None:
         print(f"Error: Unable to load target image at {target_image_path}")
         return
 
-    # Convert the input image to HSV color space
-    hsv_image = cv2.cvtColor(input_image, cv2.COLOR_BGR2HSV)
-
-    # Extract the Hue channel
-    hue_channel = hsv_image[:, :, 0]
+    # Convert the input image to HSV color space and extract the Hue channel (cached for the other tasks)
+    with profiler.stage("hue"):
+        hue_channel = load_hue_channel(input_image_path)
 
     # Display the input image, target image, and hue channel
-    cv2.imshow("Input Image", input_image)
-    cv2.imshow("Target Image", target_image)
-    cv2.imshow("Hue Channel", hue_channel)
-
-    # Wait for q key press to close the windows
-    print("Press 'q' to close the image windows.")
-    while True:
-        if cv2.waitKey(1) & 0xFF == ord('q'):
-            break
-
-    cv2.destroyAllWindows()
-    cv2.waitKey(1)  # Force OpenCV to process window events and close
+    show_images([("Input Image", input_image), ("Target Image", target_image), ("Hue Channel", hue_channel)])
 
-def task2(input_image_path: str, display_histogram: bool = True) -> None:
+def task2(input_image_path: str, display_histogram: bool = True, auto_threshold: bool = False) -> None:
     """
     Calculate and display the histogram of the Hue channel image to determine the thresholds for
     removing the green background. Apply the thresholds to the Hue channel image to calculate a
     binary mask of the foreground. Display the foreground mask.
     :param input_image_path: Path to the input image.
     :param display_histogram: Whether to display the histogram of the Hue channel.
+    :param auto_threshold: Estimate the thresholds from the histogram instead of using the hand-tuned ones.
     :return: None
     """
     # Load the input image
-    input_image = cv2.imread(input_image_path)
+    with profiler.stage("decode"):
+        input_image = load_image(input_image_path)
 
     if input_image is None:
         print(f"Error: Unable to load input image at {input_image_path}")
         return
 
-    # Invert the mask to get the foreground
-    foreground_mask = get_foreground_mask(input_image_path, display_histogram)
+    thresholds = None
+    if auto_threshold:
+        with profiler.stage("estimate"):
+            thresholds = estimate_thresholds(input_image)
 
-    # Display the foreground mask
-    cv2.imshow("Foreground Mask", foreground_mask)
+    if display_histogram:
+        show_hue_histogram(load_hue_channel(input_image_path))
 
-    # save the foreground mask for debugging purposes
-    generated_file_name = f"{IMAGE_DIR}/lab3/foreground_mask_{lower_thresholds}x{upper_thresholds}_{display_threshold_values}.png"
+    def compute_mask():
+        return {"mask": get_foreground_mask(input_image_path, thresholds=thresholds)}
 
-    does_file_exist = os.path.isfile(generated_file_name)
-    if not does_file_exist:
-        cv2.imwrite(generated_file_name, foreground_mask)
+    # Invert the mask to get the foreground (read back from the result cache for an image and thresholds seen before)
+    with profiler.stage("mask"):
+        foreground_mask = cached_result(input_image_path, "lab3.foreground_mask", _mask_params(thresholds),
+                                        compute_mask)["mask"]
 
-    # Wait for q key press to close the windows
-    print("Press 'q' to close the image windows.")
-    while True:
-        if cv2.waitKey(1) & 0xFF == ord('q'):
-            break
+    # save the foreground mask for debugging purposes, also when it was read from the result cache
+    lower, upper = _thresholds_or_default(thresholds)
+    generated_file_name = f"{LAB3_MASK_DIR}/foreground_mask_{lower}x{upper}_{display_threshold_values}.png"
+    if not os.path.exists(generated_file_name):
+        os.makedirs(LAB3_MASK_DIR, exist_ok=True)
+        cv2.imwrite(generated_file_name, foreground_mask)
 
-    cv2.destroyAllWindows()
-    cv2.waitKey(1)  # Force OpenCV to process window events and close
+    # Display the foreground mask
+    show_images([("Foreground Mask", foreground_mask)])
 
 def task3(input_image_path: str, target_image_path: str) -> None:
     """
@@ -99,8 +105,9 @@ def task3(input_image_path: str, target_image_path: str) -> None:
     :return: None
     """
     # Load the input and target images
-    input_image = cv2.imread(input_image_path)
-    target_image = cv2.imread(target_image_path)
+    with profiler.stage("decode"):
+        input_image = load_image(input_image_path)
+        target_image = load_image(target_image_path)
     target_expected_width = 300
     target_expected_height = 400
 
@@ -112,107 +119,399 @@ def task3(input_image_path: str, target_image_path: str) -> None:
         print(f"Error: Unable to load target image at {target_image_path}")
         return
 
-    # Create a binary mask where the green background is removed
-    foreground_mask = get_foreground_mask(input_image_path)
+    def compute_result():
+        # Create a binary mask where the green background is removed
+        with profiler.stage("mask"):
+            foreground_mask = get_foreground_mask(input_image_path)
 
-    # Invert the mask to get the foreground
-    foreground_mask = cv2.bitwise_not(foreground_mask)
+        return {"result": composite_foreground(input_image, target_image, foreground_mask,
+                                               target_expected_width, target_expected_height)}
 
-    # Cut out the foreground from the input image using the mask
-    foreground = cv2.bitwise_and(input_image, input_image, mask=foreground_mask)
+    # The result only depends on both images, the thresholds and the cut-out size, so it is read back from the result
+    # cache when this combination was composited before
+    params = dict(_mask_params(), width=target_expected_width, height=target_expected_height)
+    display_img = cached_result((input_image_path, target_image_path), "lab3.task3", params, compute_result)["result"]
 
-    # Resize the cut-out foreground and mask
-    resized_foreground = cv2.resize(foreground, (target_expected_width, target_expected_height))
-    resized_mask = cv2.resize(foreground_mask, (target_expected_width, target_expected_height), interpolation=cv2.INTER_NEAREST)
+    # Display the result
+    show_images([("Result Image (Foreground Transparent)", display_img)])
 
-    # Add alpha channel to the resized foreground
-    b, g, r = cv2.split(resized_foreground)
-    alpha = resized_mask
-    rgba = cv2.merge((b, g, r, alpha))
+def composite_foreground(input_image: np.ndarray, target_image: np.ndarray, foreground_mask: np.ndarray,
+                         width: int = 300, height: int = 400, mode: str = "binary",
+                         in_place: bool = False) -> np.ndarray:
+    """
+    Headless part of task3: cut the foreground out of the input image, resize it to width x height and blend it
+    into the bottom centre of the target image.
+    :param input_image: BGR input image.
+    :param target_image: BGR target image.
+    :param foreground_mask: Mask returned by get_foreground_mask.
+    :param width: Width of the resized cut-out.
+    :param height: Height of the resized cut-out.
+    :param mode: Blend mode of alpha_blend_inplace. The nearest-neighbour resized mask only holds 0 and 255, so
+    "binary" gives the same result as "fixed" at a fraction of the cost.
+    :param in_place: Draw into target_image instead of a copy of it.
+    :return: BGR result image.
+    """
+    with profiler.stage("cutout"):
+        # Invert the mask to get the foreground
+        foreground_mask = cv2.bitwise_not(foreground_mask)
+
+        # Cut out the foreground from the input image using the mask
+        foreground = cv2.bitwise_and(input_image, input_image, mask=foreground_mask)
+
+    # Resize the cut-out foreground and mask; the mask becomes the alpha channel of the cut-out
+    with profiler.stage("resize"):
+        resized_foreground = cv2.resize(foreground, (width, height))
+        alpha = cv2.resize(foreground_mask, (width, height), interpolation=cv2.INTER_NEAREST)
+
+    # Blend straight into the BGR target, bottom centre, without a BGRA copy of the whole image
+    with profiler.stage("blend"):
+        result = target_image if in_place else target_image.copy()
+        target_height, target_width = result.shape[:2]
+        x_offset = (target_width - width) // 2
+        y_offset = target_height - height
+        return composite(result, resized_foreground, alpha, x_offset, y_offset, mode)
+
+def _hsv_node(image, dst=None):
+    with profiler.stage("hsv"):
+        return cv2.cvtColor(image, cv2.COLOR_BGR2HSV, dst=dst)
+
+def _hue_node(hsv_image, dst=None):
+    with profiler.stage("hue"):
+        return cv2.extractChannel(hsv_image, 0, dst=dst)
+
+def _mask_node(hue_channel, dst=None):
+    return mask_from_hue_channel(hue_channel, dst)
+
+def _key_mask_node(hue_channel, thresholds=None, dst=None):
+    with profiler.stage("mask"):
+        return compute_key_mask(hue_channel, dst, thresholds)
+
+def _estimate_node(hue_channel, estimator=None):
+    with profiler.stage("estimate"):
+        return estimator.update(hue_channel)
+
+def _replace_key_node(frame, background, key_mask):
+    # Paint the background into the frame wherever the key colour was found
+    with profiler.stage("blend"):
+        return cv2.copyTo(background, key_mask, frame)
+
+def _composite_node(input_image, target_image, foreground_mask, width=300, height=400, mode="binary", dst=None):
+    if dst is None:
+        dst = target_image.copy()
+    else:
+        np.copyto(dst, target_image)
+    return composite_foreground(input_image, dst, foreground_mask, width, height, mode, in_place=True)
 
-    # Prepare the target image for overlay (convert to BGRA if needed)
-    if target_image.shape[2] == 3:
-        target_bgra = cv2.cvtColor(target_image, cv2.COLOR_BGR2BGRA)
+def build_keying_graph(width: int = 300, height: int = 400, mode: str = "binary", workers: int = 4) -> FilterGraph:
+    """
+    The lab3 steps as one FilterGraph: hsv -> hue -> mask, and composite, which pastes the foreground of "image"
+    into the "target" source. Every node writes into a reused buffer, so with run_stream a video is keyed without
+    allocating per frame.
+    Example: build_keying_graph().run({"image": input_image, "target": target_image}, ["composite"])
+    :param width: Width of the resized cut-out.
+    :param height: Height of the resized cut-out.
+    :param mode: Blend mode, see composite_foreground.
+    :param workers: Threads used to run independent nodes in parallel.
+    :return: FilterGraph with the nodes hsv, hue, mask and composite.
+    """
+    graph = FilterGraph(workers)
+    graph.add("hsv", _hsv_node, reuse_buffer=True)
+    graph.add("hue", _hue_node, ("hsv",), reuse_buffer=True)
+    graph.add("mask", _mask_node, ("hue",), reuse_buffer=True)
+    graph.add("composite", partial(_composite_node, width=width, height=height, mode=mode),
+              ("image", "target", "mask"), reuse_buffer=True)
+    return graph
+
+def build_chroma_key_graph(estimator: RunningHueEstimator = None) -> FilterGraph:
+    """
+    The chroma_key_video steps as one FilterGraph: hsv -> hue -> key_mask, and keyed, which paints the "background"
+    source into the frame wherever the key colour was found. The frame is modified in place and the other buffers
+    are reused, so with run_stream nothing is allocated per frame.
+    :param estimator: Track the key colour with this estimator instead of using the fixed thresholds.
+    :return: FilterGraph with the nodes hsv, hue, (thresholds,) key_mask and keyed.
+    """
+    graph = FilterGraph(workers=1)
+    graph.add("hsv", _hsv_node, reuse_buffer=True)
+    graph.add("hue", _hue_node, ("hsv",), reuse_buffer=True)
+    if estimator is None:
+        graph.add("key_mask", _key_mask_node, ("hue",), reuse_buffer=True)
     else:
-        target_bgra = target_image.copy()
-
-    target_height, target_width = target_bgra.shape[:2]
-    x_offset = (target_width - target_expected_width) // 2
-    y_offset = target_height - target_expected_height
-
-    # Overlay the RGBA foreground onto the target image using alpha blending
-    roi = target_bgra[y_offset:y_offset+target_expected_height, x_offset:x_offset+target_expected_width]
-    alpha_fg = rgba[:, :, 3] / 255.0
-    alpha_bg = 1.0 - alpha_fg
-    for c in range(3):
-        roi[:, :, c] = (alpha_fg * rgba[:, :, c] + alpha_bg * roi[:, :, c]).astype('uint8')
-    roi[:, :, 3] = np.maximum(roi[:, :, 3], rgba[:, :, 3])
-    target_bgra[y_offset:y_offset+target_expected_height, x_offset:x_offset+target_expected_width] = roi
-
-    # Display the result (convert to BGR for OpenCV display)
-    display_img = cv2.cvtColor(target_bgra, cv2.COLOR_BGRA2BGR)
-    cv2.imshow("Result Image (Foreground Transparent)", display_img)
-
-    # Wait for q key press to close the windows
-    print("Press 'q' to close the image windows.")
+        graph.add("thresholds", partial(_estimate_node, estimator=estimator), ("hue",))
+        graph.add("key_mask", _key_mask_node, ("hue", "thresholds"), reuse_buffer=True)
+    graph.add("keyed", _replace_key_node, ("image", "background", "key_mask"))
+    return graph
+
+def _timed_frames(frames):
+    # the graph pulls the frames from the generator, so reading is timed here
     while True:
-        if cv2.waitKey(1) & 0xFF == ord('q'):
-            break
+        with profiler.stage("read"):
+            frame = next(frames, None)
+        if frame is None:
+            return
+        yield frame
+
+def compute_large_foreground_mask(input_path: str, output_path: str, rows_per_chunk: int = 512) -> bool:
+    """
+    Foreground mask of an image too large to process at once. The mask only depends on each pixel's own hue, so the
+    image is processed in bands of rows and the mask is written band by band to a .npy file.
+    :param input_path: Input image; a .npy file is memory-mapped, other formats are decoded in full first.
+    :param output_path: Path of the .npy mask.
+    :param rows_per_chunk: Number of rows processed at once.
+    :return: Whether the mask was written.
+    """
+    source = load_source(input_path)
+    if source is None:
+        print(f"Error: Unable to load input image at {input_path}")
+        return False
+    destination = create_npy(output_path, source.shape[:2], np.uint8)
+    chunked_map(source, destination, compute_foreground_mask, rows_per_chunk)
+    print(f"Saved foreground mask to: {output_path}")
+    return True
+
+def composite_into_large_target(input_image_path: str, target_npy_path: str, width: int = 300,
+                                height: int = 400, thresholds: tuple = None) -> bool:
+    """
+    task3 for a target image too large to load: the target .npy is memory-mapped and modified in place, so only the
+    pages under the pasted foreground are read and written.
+    :param input_image_path: Path to the input image.
+    :param target_npy_path: Path to the target image stored as .npy (see utils.tiled_processing.image_to_npy).
+    :param width: Width of the resized cut-out.
+    :param height: Height of the resized cut-out.
+    :param thresholds: (lower, upper) threshold lists, e.g. from estimate_thresholds (default: the module ones).
+    :return: Whether the target was updated.
+    """
+    input_image = load_image(input_image_path)
+    if input_image is None:
+        print(f"Error: Unable to load input image at {input_image_path}")
+        return False
+    target = open_npy(target_npy_path, 'r+')
+    foreground_mask = get_foreground_mask(input_image_path, thresholds=thresholds)
+    composite_foreground(input_image, target, foreground_mask, width, height, in_place=True)
+    target.flush()
+    print(f"Pasted the foreground into: {target_npy_path}")
+    return True
+
+def _thresholds_or_default(thresholds: tuple = None) -> tuple:
+    """
+    :return: The given (lower, upper) threshold lists, or the module ones if None.
+    """
+    return thresholds if thresholds is not None else (lower_thresholds, upper_thresholds)
 
-    cv2.destroyAllWindows()
-    cv2.waitKey(1)  # Force OpenCV to process window events and close
+def _mask_params(thresholds: tuple = None) -> dict:
+    """
+    :param thresholds: (lower, upper) threshold lists (default: the module ones).
+    :return: Every setting the foreground mask depends on, as result cache parameters.
+    """
+    lower, upper = _thresholds_or_default(thresholds)
+    return {"lower": list(lower), "upper": list(upper), "inverted": display_threshold_values}
 
-def get_foreground_mask(input_image_path: str, display_histogram: bool = False) -> np.ndarray:
+def get_foreground_mask(input_image_path: str, display_histogram: bool = False, thresholds: tuple = None) -> np.ndarray:
     """
     Helper function to get the foreground mask for the input image.
+    The decoded image, its Hue channel and the mask for the given thresholds are kept in the image cache.
     :param input_image_path: Path to the input image.
     :param display_histogram: Whether to display the histogram of the Hue channel.
-    :return: Foreground mask as a binary image.
+    :param thresholds: (lower, upper) threshold lists, e.g. from estimate_thresholds (default: the module ones).
+    :return: Foreground mask as a binary image (read-only).
     """
     # Load the input image
-    input_image = cv2.imread(input_image_path)
+    input_image = load_image(input_image_path)
 
     if input_image is None:
         print(f"Error: Unable to load input image at {input_image_path}")
         # Return a zero mask of default size (1x1) to avoid NoneType issues
         return np.zeros((1, 1), dtype=np.uint8)
 
+    hue_channel = load_hue_channel(input_image_path)
+    if display_histogram:
+        show_hue_histogram(hue_channel)
+
+    lower, upper = _thresholds_or_default(thresholds)
+    mask_name = ("foreground_mask", tuple(lower), tuple(upper), display_threshold_values)
+    return get_derived(input_image_path, mask_name,
+                       lambda image: mask_from_hue_channel(hue_channel, thresholds=thresholds))
+
+def load_hsv_image(input_image_path: str):
+    """
+    :return: HSV version of the image from the image cache, or None if it cannot be loaded.
+    """
+    def to_hsv(image):
+        with profiler.stage("hsv"):
+            return cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+
+    return get_derived(input_image_path, "hsv", to_hsv)
+
+def load_hue_channel(input_image_path: str):
+    """
+    :return: Hue channel of the image from the image cache, or None if it cannot be loaded.
+    """
+    return get_derived(input_image_path, "hue", lambda image: cv2.extractChannel(load_hsv_image(input_image_path), 0))
+
+def compute_foreground_mask(input_image: np.ndarray, display_histogram: bool = False, hsv_buffer: np.ndarray = None,
+                            hue_buffer: np.ndarray = None, mask_buffer: np.ndarray = None) -> np.ndarray:
+    """
+    Same as get_foreground_mask, for an image that is already in memory. The optional buffers are reused instead of
+    allocating new arrays, which matters when this runs on every frame of a video.
+    :param input_image: BGR input image.
+    :param display_histogram: Whether to display the histogram of the Hue channel.
+    :param hsv_buffer: uint8 array of the image's shape to hold the HSV image.
+    :param hue_buffer: uint8 array of the image's height and width to hold the Hue channel.
+    :param mask_buffer: uint8 array of the image's height and width to hold the mask.
+    :return: Foreground mask as a binary image.
+    """
     # Convert the input image to HSV color space
-    hsv_image = cv2.cvtColor(input_image, cv2.COLOR_BGR2HSV)
+    hsv_image = cv2.cvtColor(input_image, cv2.COLOR_BGR2HSV, dst=hsv_buffer)
 
     # Extract the Hue channel
-    hue_channel = hsv_image[:, :, 0]
+    hue_channel = cv2.extractChannel(hsv_image, 0, dst=hue_buffer)
 
-    # Initialize the mask to zeros
-    background_mask = np.zeros_like(hue_channel, dtype=np.uint8)
+    if display_histogram:
+        show_hue_histogram(hue_channel)
 
+    return mask_from_hue_channel(hue_channel, mask_buffer)
+
+def mask_from_hue_channel(hue_channel: np.ndarray, mask_buffer: np.ndarray = None,
+                          thresholds: tuple = None) -> np.ndarray:
+    """
+    Apply the thresholds to the Hue channel.
+    :param hue_channel: Hue channel of the input image.
+    :param mask_buffer: Optional uint8 array of the same shape to hold the mask.
+    :param thresholds: (lower, upper) threshold lists (default: the module ones).
+    :return: Foreground mask as a binary image.
+    """
     # Create a binary mask where the green background is detected using arrays of thresholds
-    for index in range(len(lower_thresholds)):
-        low = lower_thresholds[index]
-        high = upper_thresholds[index]
-        mask = cv2.inRange(hue_channel, low, high)
-        background_mask = mask if index == 0 else cv2.bitwise_or(background_mask, mask)
+    background_mask = compute_key_mask(hue_channel, mask_buffer, thresholds)
 
     # Invert the background mask to get the foreground mask
     if display_threshold_values:
-        foreground_mask = cv2.bitwise_not(background_mask)
+        foreground_mask = cv2.bitwise_not(background_mask, dst=background_mask)
     else:
         foreground_mask = background_mask
+    return foreground_mask
+
+def show_hue_histogram(hue_channel: np.ndarray) -> None:
+    """
+    Calculate and display the histogram of the Hue channel.
+    :param hue_channel: Hue channel of the input image.
+    :return: None
+    """
+    # matplotlib is slow to import, so it is only loaded once a histogram is actually shown
+    import matplotlib.pyplot as plt
 
-    # Calculate the histogram of the Hue channel
     hist = cv2.calcHist([hue_channel], [0], None, [180], [0, 180])
+    plt.figure(figsize=(15, 5))  # Set the plot width to 12 inches and height to 5 inches
+    plt.plot(hist)
+    plt.title("Hue Channel Histogram")
+    plt.xlabel("Hue Value")
+    plt.ylabel("Frequency")
+    plt.xlim([0, 180])
+    # make the hue value markers to display every 5 hue values
+    plt.xticks(np.arange(0, 181, 5))
+    plt.yticks(np.arange(0, 150000, 10000))
+    plt.show()
+
+def estimate_thresholds(input_image: np.ndarray, method: str = "valley") -> tuple:
+    """
+    Estimate the key-colour thresholds from the dominant peak of the Hue histogram. The module thresholds are left
+    unchanged; pass the estimate as the thresholds argument of get_foreground_mask or compute_key_mask.
+    :param input_image: BGR input image.
+    :param method: "valley" or "otsu", see estimate_key_range.
+    :return: (lower, upper) threshold lists.
+    """
+    hue_channel = cv2.extractChannel(cv2.cvtColor(input_image, cv2.COLOR_BGR2HSV), 0)
+    lower, upper = estimate_key_range(hue_histogram(hue_channel), method)
+    print(f"Estimated thresholds: lower {lower}, upper {upper}")
+    return lower, upper
 
-    # Display the histogram of the Hue channel if requested
-    if display_histogram:
-        plt.figure(figsize=(15, 5))  # Set the plot width to 12 inches and height to 5 inches
-        plt.plot(hist)
-        plt.title("Hue Channel Histogram")
-        plt.xlabel("Hue Value")
-        plt.ylabel("Frequency")
-        plt.xlim([0, 180])
-        # make the hue value markers to display every 5 hue values
-        plt.xticks(np.arange(0, 181, 5))
-        plt.yticks(np.arange(0, 150000, 10000))
-        plt.show()
-
-    return foreground_mask
\ No newline at end of file
+def compute_key_mask(hue_channel: np.ndarray, mask_buffer: np.ndarray = None, thresholds: tuple = None) -> np.ndarray:
+    """
+    Mask of the pixels whose hue falls in any of the key-colour threshold ranges. Several ranges are compiled into one
+    lookup table (cached per set of thresholds), so the mask takes a single cv2.LUT pass however many ranges there are.
+    A single range stays on cv2.inRange, which is faster than the table lookup
+    (see benchmarks/hue_threshold_lut.py).
+    :param hue_channel: Hue channel of the image.
+    :param mask_buffer: Optional uint8 array of the same shape to write the mask into.
+    :param thresholds: (lower, upper) threshold lists to use instead of the module ones.
+    :return: Binary mask, 255 where the key colour (the green background) is.
+    """
+    lower, upper = _thresholds_or_default(thresholds)
+    if len(lower) == 1:
+        return cv2.inRange(hue_channel, lower[0], upper[0], dst=mask_buffer)
+    lut = build_hue_lut(tuple(lower), tuple(upper))
+    return apply_hue_lut(hue_channel, lut, dst=mask_buffer)
+
+def chroma_key_video(source, background_path: str, output_path: str = None, display: bool = True,
+                     max_frames: int = None, auto_threshold: bool = False, profile=DEFAULT_PROFILE) -> dict:
+    """
+    Live version of task3: replace the green background of every frame from a camera or video file with the
+    background image, write the result to a video and show it. The frames stream through build_chroma_key_graph,
+    which reuses its HSV, hue and mask buffers for every frame. With profiling on, every stage of the loop is timed
+    and can be drawn on the preview.
+    :param source: Camera index or path to a video file.
+    :param background_path: Path to the background image.
+    :param output_path: Path of the output video (defaults to a timestamped file in VIDEO_DIR); the extension comes
+    from the recording profile.
+    :param display: Whether to show the result; press 'q' to stop.
+    :param max_frames: Stop after this many frames (None to run until the source ends).
+    :param auto_threshold: Track the key colour from a running Hue histogram instead of using the fixed thresholds.
+    :param profile: Name of a recording profile (see utils/recording_profile.py) or a RecordingProfile.
+    :return: Dict with the number of frames processed, elapsed seconds and sustained FPS.
+    """
+    capture = cv2.VideoCapture(source)
+    background_image = load_image(background_path)
+    if not capture.isOpened():
+        print(f"Error: Unable to open video source {source}")
+        return {"frames": 0, "seconds": 0.0, "fps": 0.0}
+    if background_image is None:
+        print(f"Error: Unable to load background image at {background_path}")
+        capture.release()
+        return {"frames": 0, "seconds": 0.0, "fps": 0.0}
+
+    width = int(capture.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    fps = source_fps(capture, isinstance(source, str))
+
+    if output_path is None:
+        curr_datetime = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+        output_path = os.path.join(VIDEO_DIR, f'chroma_key_{curr_datetime}')
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+    out = get_recording_profile(profile).open_writer(os.path.splitext(output_path)[0], fps, (width, height))
+    if out is None:
+        capture.release()
+        return {"frames": 0, "seconds": 0.0, "fps": 0.0}
+    print(f"Saving video to: {out.path}")
+
+    background = cv2.resize(background_image, (width, height))
+    graph = build_chroma_key_graph(RunningHueEstimator() if auto_threshold else None)
+
+    frame_count = 0
+    start = time.perf_counter()
+    frames = _timed_frames(read_frames(capture, max_frames))
+    for results in graph.run_stream(frames, ["keyed"], {"background": background}):
+        frame = results["keyed"]
+        with profiler.stage("write"):
+            out.write(frame)
+        frame_count += 1
+        profiler.tick()
+
+        if display:
+            # the overlay is drawn after the frame was written, so it only shows on screen
+            stages = ("read", "hsv", "hue", "estimate", "mask", "blend", "write", "show")
+            profiler.draw_overlay(frame, stages)
+            with profiler.stage("show"):
+                cv2.imshow("Chroma Key", frame)
+                key = cv2.waitKey(1)
+            if key & 0xFF == ord('q'):
+                break
+
+    elapsed = time.perf_counter() - start
+    graph.close()
+    out.release()
+    capture.release()
+    if display:
+        cv2.destroyAllWindows()
+        cv2.waitKey(1)  # Force OpenCV to process window events and close
+
+    sustained_fps = frame_count / elapsed if elapsed > 0 else 0.0
+    print(f"Processed {frame_count} frames in {elapsed:.2f}s: {sustained_fps:.1f} FPS")
+    return {"frames": frame_count, "seconds": elapsed, "fps": sustained_fps}
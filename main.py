@@ -1,5 +1,12 @@
-# run main menu
-from view.main_menu import MainMenu
+import sys
+
 if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        # run a single operation headless, e.g. python main.py lab3 composite --input ... --target ... --out ...
+        from view.cli import main
+        sys.exit(main(sys.argv[1:]))
+
+    # run main menu
+    from view.main_menu import MainMenu
     main_menu = MainMenu()
-    main_menu.run()
\ No newline at end of file
+    main_menu.run()
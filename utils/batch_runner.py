@@ -0,0 +1,94 @@
+import glob
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import cv2
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff', '.webp')
+
+
+def iter_image_paths(input_pattern: str):
+    """
+    Lazily yield the image files of a directory or a glob pattern, in sorted order.
+    :param input_pattern: Directory path or glob pattern.
+    :return: Generator of file paths.
+    """
+    if os.path.isdir(input_pattern):
+        with os.scandir(input_pattern) as entries:
+            names = sorted(entry.name for entry in entries if entry.is_file())
+        paths = (os.path.join(input_pattern, name) for name in names)
+    else:
+        paths = iter(sorted(glob.iglob(input_pattern, recursive=True)))
+    for path in paths:
+        if path.lower().endswith(IMAGE_EXTENSIONS):
+            yield path
+
+
+def apply_chain(image, chain: list) -> dict:
+    """
+    Apply a filter chain to one image. Each operation maps an image to a dict of named outputs, and every output is
+    fed to the next operation, so the names of the final outputs record the path through the chain.
+    :param image: Input image.
+    :param chain: List of operations.
+    :return: Dict of output name to image.
+    """
+    outputs = {"": image}
+    for operation in chain:
+        next_outputs = {}
+        for prefix, current in outputs.items():
+            for name, result in operation(current).items():
+                next_outputs[f"{prefix}_{name}" if prefix else name] = result
+        outputs = next_outputs
+    return outputs
+
+
+def process_file(image_path: str, output_dir: str, chain: list) -> int:
+    """
+    Load one image, run it through the chain and write every output as <stem>_<output name>.png.
+    :return: Number of images written (0 if the input could not be loaded).
+    """
+    image = cv2.imread(image_path)
+    if image is None:
+        print(f"Error: Unable to load image at {image_path}")
+        return 0
+
+    stem = os.path.splitext(os.path.basename(image_path))[0]
+    outputs = apply_chain(image, chain)
+    for name, result in outputs.items():
+        cv2.imwrite(os.path.join(output_dir, f"{stem}_{name}.png"), result)
+    return len(outputs)
+
+
+def run_batch(input_pattern: str, output_dir: str, chain: list, workers: int = None) -> dict:
+    """
+    Stream every image matched by input_pattern through the chain on a process pool. At most a few tasks per worker
+    are in flight at a time, so the input list is never materialised up front.
+    :param input_pattern: Directory or glob pattern.
+    :param output_dir: Directory where the results are written (created if missing).
+    :param chain: List of picklable (module-level) operations.
+    :param workers: Number of worker processes (defaults to the CPU count).
+    :return: Dict with the number of input images, output images, elapsed seconds and images per second.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = workers * 4
+
+    images_in = 0
+    images_out = 0
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = set()
+        for image_path in iter_image_paths(input_pattern):
+            if len(pending) >= max_in_flight:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                images_out += sum(future.result() for future in done)
+            pending.add(executor.submit(process_file, image_path, output_dir, chain))
+            images_in += 1
+        for future in pending:
+            images_out += future.result()
+    elapsed = time.perf_counter() - start
+
+    throughput = images_in / elapsed if elapsed > 0 else 0.0
+    print(f"Processed {images_in} images ({images_out} outputs) in {elapsed:.2f}s: {throughput:.1f} images/s")
+    return {"images": images_in, "outputs": images_out, "seconds": elapsed, "images_per_second": throughput}
@@ -0,0 +1,261 @@
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from utils.profiler import profiler
+
+
+class StageStats:
+    """
+    Accumulates latency samples for one pipeline stage.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def summary(self) -> str:
+        """
+        :return: One line with the mean and max latency of this stage in milliseconds.
+        """
+        mean = self.total / self.count if self.count else 0.0
+        return f"{self.name:<8} n={self.count:<6} mean={mean * 1000:7.2f} ms  max={self.max * 1000:7.2f} ms"
+
+
+class FrameRingBuffer:
+    """
+    Bounded ring buffer of preallocated frames shared by one producer (the grabber) and one consumer (the encoder).
+    The producer reads straight into a free slot, so no frame is allocated once the buffer exists.
+    """
+
+    def __init__(self, capacity: int, frame_shape: tuple, dtype=np.uint8):
+        self.capacity = capacity
+        self.frames = np.empty((capacity,) + tuple(frame_shape), dtype=dtype)
+        self.timestamps = np.zeros(capacity, dtype=np.float64)
+        self._head = 0  # next slot to be filled by the producer
+        self._count = 0  # slots filled but not yet released by the consumer
+        self._closed = False
+        self._condition = threading.Condition()
+
+    def acquire_write_slot(self, block: bool):
+        """
+        :param block: Wait for the consumer to free a slot instead of giving up when the buffer is full.
+        :return: Index of a free slot, or None if the buffer is full (non-blocking) or closed.
+        """
+        with self._condition:
+            while self._count == self.capacity and block and not self._closed:
+                self._condition.wait()
+            if self._count == self.capacity or self._closed:
+                return None
+            return self._head
+
+    def commit_write_slot(self, timestamp: float) -> None:
+        """
+        Publish the slot returned by acquire_write_slot to the consumer.
+        :param timestamp: perf_counter time at which the frame was grabbed.
+        """
+        with self._condition:
+            self.timestamps[self._head] = timestamp
+            self._head = (self._head + 1) % self.capacity
+            self._count += 1
+            self._condition.notify_all()
+
+    def acquire_read_slot(self):
+        """
+        Block until a frame is available.
+        :return: Index of the oldest filled slot, or None once the buffer is closed and drained.
+        """
+        with self._condition:
+            while self._count == 0 and not self._closed:
+                self._condition.wait()
+            if self._count == 0:
+                return None
+            return (self._head - self._count) % self.capacity
+
+    def release_read_slot(self) -> None:
+        """
+        Hand the oldest slot back to the producer once the consumer is done with it.
+        """
+        with self._condition:
+            self._count -= 1
+            self._condition.notify_all()
+
+    def close(self) -> None:
+        """
+        Stop accepting frames; the consumer still drains whatever is buffered.
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+
+class CapturePipeline:
+    """
+    Producer/consumer recorder: a grabber thread reads frames into a FrameRingBuffer, an encoder thread writes them
+    to the VideoWriter and an optional display thread shows the most recent frame and handles the keyboard.
+    """
+
+    def __init__(self, camera, writer, buffer_size: int = 64, drop_when_full: bool = True,
+                 display: bool = True, recording: bool = False, max_frames: int = None, name: str = "Camera",
+                 record_timestamps: bool = False):
+        """
+        :param camera: Opened cv2.VideoCapture (a camera or a video file).
+        :param writer: Opened cv2.VideoWriter.
+        :param buffer_size: Number of preallocated frames in the ring buffer.
+        :param drop_when_full: Drop new frames when the encoder falls behind instead of stalling the grabber.
+        :param display: Start a display thread (SPACE toggles recording, ESC stops).
+        :param recording: Whether frames are recorded from the start.
+        :param max_frames: Stop after this many frames have been grabbed (None for no limit).
+        :param name: Name of the display window and prefix of the thread names.
+        :param record_timestamps: Keep the perf_counter grab time of every written frame in frame_timestamps.
+        """
+        self.camera = camera
+        self.writer = writer
+        self.drop_when_full = drop_when_full
+        self.display = display
+        self.recording = recording
+        self.max_frames = max_frames
+        self.name = name
+        self.frame_timestamps = [] if record_timestamps else None
+
+        width = int(camera.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(camera.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.buffer = FrameRingBuffer(buffer_size, (height, width, 3))
+        self._scratch = np.empty((height, width, 3), dtype=np.uint8)
+        self._preview = np.empty((height, width, 3), dtype=np.uint8)
+
+        self.frames_grabbed = 0
+        self.frames_written = 0
+        self.frames_dropped = 0
+        self.stats = {name: StageStats(name) for name in ("read", "queue", "encode", "display")}
+
+        self._latest_slot = None
+        self._latest_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._threads = []
+
+    def start(self) -> None:
+        targets = [self._grab_loop, self._encode_loop]
+        if self.display:
+            targets.append(self._display_loop)
+        for target in targets:
+            thread = threading.Thread(target=target, name=f"{self.name}-{target.__name__.strip('_')}", daemon=True)
+            self._threads.append(thread)
+            thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+    def is_stopped(self) -> bool:
+        """
+        :return: Whether the grabber has stopped (the encoder may still be draining the buffer).
+        """
+        return self._stop_event.is_set()
+
+    def take_latest_frame(self):
+        """
+        :return: The most recently grabbed frame that has not been taken yet, or None. The slot may be recycled by
+        the grabber at any time, so the frame is only suitable for previews.
+        """
+        with self._latest_lock:
+            slot = self._latest_slot
+            self._latest_slot = None
+        return self.buffer.frames[slot] if slot is not None else None
+
+    def wait(self) -> None:
+        """
+        Block until every stage has finished.
+        """
+        for thread in self._threads:
+            thread.join()
+
+    def _grab_loop(self) -> None:
+        try:
+            while not self._stop_event.is_set() and self.camera.isOpened():
+                if self.max_frames is not None and self.frames_grabbed >= self.max_frames:
+                    break
+                slot = None
+                if self.recording:
+                    slot = self.buffer.acquire_write_slot(block=not self.drop_when_full)
+                    if slot is None and self._stop_event.is_set():
+                        break
+                # read into the ring buffer when there is room, otherwise into scratch so the camera keeps draining
+                target = self.buffer.frames[slot] if slot is not None else self._scratch
+                start = time.perf_counter()
+                ret, _ = self.camera.read(target)
+                grabbed_at = time.perf_counter()
+                if not ret:
+                    break
+                self.stats["read"].add(grabbed_at - start)
+                profiler.record("read", start, grabbed_at)
+                self.frames_grabbed += 1
+                if slot is not None:
+                    self.buffer.commit_write_slot(grabbed_at)
+                    with self._latest_lock:
+                        self._latest_slot = slot
+                elif self.recording:
+                    self.frames_dropped += 1
+        finally:
+            self.buffer.close()
+            self._stop_event.set()
+
+    def _encode_loop(self) -> None:
+        while True:
+            slot = self.buffer.acquire_read_slot()
+            if slot is None:
+                break
+            start = time.perf_counter()
+            self.stats["queue"].add(start - self.buffer.timestamps[slot])
+            if self.frame_timestamps is not None:
+                self.frame_timestamps.append(float(self.buffer.timestamps[slot]))
+            self.writer.write(self.buffer.frames[slot])
+            end = time.perf_counter()
+            self.stats["encode"].add(end - start)
+            profiler.record("encode", start, end)
+            self.frames_written += 1
+            self.buffer.release_read_slot()
+
+    def _display_loop(self) -> None:
+        # all HighGUI calls stay on this thread; a slot may be recycled while shown, which only affects the preview
+        while not self._stop_event.is_set():
+            frame = self.take_latest_frame()
+            if frame is not None:
+                start = time.perf_counter()
+                if profiler.enabled and profiler.overlay:
+                    # draw on a copy: the slot may not have been encoded yet
+                    np.copyto(self._preview, frame)
+                    frame = profiler.draw_overlay(self._preview, ("read", "encode", "display"))
+                cv2.imshow(self.name, frame)
+                end = time.perf_counter()
+                self.stats["display"].add(end - start)
+                profiler.record("display", start, end)
+                profiler.tick()
+
+            key = cv2.waitKey(10)
+            if key % 256 == 32:  # SPACE pressed
+                self.recording = not self.recording
+                print("Started recording..." if self.recording else "Stopped recording.")
+            elif key % 256 == 27:  # ESC pressed
+                print("Exiting...")
+                self.stop()
+        cv2.destroyAllWindows()
+        cv2.waitKey(1)  # Force OpenCV to process window events and close
+
+    def report(self) -> None:
+        """
+        Print frame counters and per-stage latency.
+        """
+        print(f"Frames grabbed: {self.frames_grabbed}, written: {self.frames_written}, dropped: {self.frames_dropped}")
+        for stage in self.stats.values():
+            if stage.count:
+                print(stage.summary())
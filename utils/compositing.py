@@ -0,0 +1,112 @@
+import cv2
+import numpy as np
+
+
+def alpha_blend_inplace(target_roi: np.ndarray, foreground: np.ndarray, alpha: np.ndarray,
+                        mode: str = "fixed") -> np.ndarray:
+    """
+    Blend the foreground over target_roi in place: target = alpha * foreground + (1 - alpha) * target.
+    target_roi may be a view into a larger BGR image; nothing outside it is copied or converted.
+    :param target_roi: uint8 BGR region to draw into.
+    :param foreground: uint8 BGR image of the same size.
+    :param alpha: uint8 single-channel opacity of the same size (0 transparent, 255 opaque).
+    :param mode: "fixed" for uint8 fixed-point arithmetic, "float32" for float weights, or "binary" for masks that
+    only contain 0 and 255 (a masked copy, the cheapest of the three).
+    :return: target_roi.
+    """
+    if mode == "binary":
+        cv2.copyTo(foreground, alpha, target_roi)
+    elif mode == "fixed":
+        # alpha * fg / 255 + (255 - alpha) * bg / 255, each term rounded and saturated by OpenCV in uint8
+        alpha_3 = cv2.merge((alpha, alpha, alpha))
+        weighted_foreground = cv2.multiply(foreground, alpha_3, scale=1 / 255)
+        cv2.multiply(target_roi, cv2.bitwise_not(alpha_3, dst=alpha_3), dst=target_roi, scale=1 / 255)
+        cv2.add(target_roi, weighted_foreground, dst=target_roi)
+    elif mode == "float32":
+        weights = alpha.astype(np.float32)
+        weights *= 1 / 255
+        cv2.blendLinear(foreground, target_roi, weights, 1 - weights, dst=target_roi)
+    else:
+        raise ValueError(f"Unknown blend mode: {mode}")
+    return target_roi
+
+
+def clip_placement(target_shape: tuple, size: tuple, x: int, y: int):
+    """
+    Intersect a size=(height, width) rectangle placed at (x, y) with the target.
+    :return: (target slices, source slices), or None if the rectangle lies entirely outside the target.
+    """
+    height, width = size
+    top, left = max(y, 0), max(x, 0)
+    bottom, right = min(y + height, target_shape[0]), min(x + width, target_shape[1])
+    if top >= bottom or left >= right:
+        return None
+    target_slices = (slice(top, bottom), slice(left, right))
+    source_slices = (slice(top - y, bottom - y), slice(left - x, right - x))
+    return target_slices, source_slices
+
+
+def composite(target: np.ndarray, foreground: np.ndarray, alpha: np.ndarray, x: int, y: int,
+              mode: str = "fixed") -> np.ndarray:
+    """
+    Blend one cut-out into the target in place with its top-left corner at (x, y). Parts that fall outside the
+    target are clipped.
+    :return: target.
+    """
+    placement = clip_placement(target.shape, foreground.shape[:2], x, y)
+    if placement is not None:
+        target_slices, source_slices = placement
+        alpha_blend_inplace(target[target_slices], foreground[source_slices], alpha[source_slices], mode)
+    return target
+
+
+def composite_many(target: np.ndarray, cutouts, mode: str = "fixed") -> np.ndarray:
+    """
+    Blend several cut-outs into one target in place, in order (later cut-outs end up on top).
+    :param target: uint8 BGR image.
+    :param cutouts: Iterable of (foreground, alpha, x, y) tuples.
+    :return: target.
+    """
+    for foreground, alpha, x, y in cutouts:
+        composite(target, foreground, alpha, x, y, mode)
+    return target
+
+
+def composite_frames(frames, foreground: np.ndarray, alpha: np.ndarray, x: int, y: int,
+                     mode: str = "fixed"):
+    """
+    Blend the same cut-out into every frame of a batch in place. The alpha-dependent terms are prepared once for the
+    whole batch instead of once per frame.
+    :param frames: uint8 array of shape (n, height, width, 3), or a list of BGR frames of equal size.
+    :return: frames.
+    """
+    if len(frames) == 0:
+        return frames
+    placement = clip_placement(frames[0].shape, foreground.shape[:2], x, y)
+    if placement is None:
+        return frames
+    target_slices, source_slices = placement
+    foreground = foreground[source_slices]
+    alpha = alpha[source_slices]
+
+    if mode == "binary":
+        for frame in frames:
+            cv2.copyTo(foreground, alpha, frame[target_slices])
+    elif mode == "fixed":
+        alpha_3 = cv2.merge((alpha, alpha, alpha))
+        weighted_foreground = cv2.multiply(foreground, alpha_3, scale=1 / 255)
+        inverse_alpha_3 = cv2.bitwise_not(alpha_3)
+        for frame in frames:
+            roi = frame[target_slices]
+            cv2.multiply(roi, inverse_alpha_3, dst=roi, scale=1 / 255)
+            cv2.add(roi, weighted_foreground, dst=roi)
+    elif mode == "float32":
+        weights = alpha.astype(np.float32)
+        weights *= 1 / 255
+        inverse_weights = 1 - weights
+        for frame in frames:
+            roi = frame[target_slices]
+            cv2.blendLinear(foreground, roi, weights, inverse_weights, dst=roi)
+    else:
+        raise ValueError(f"Unknown blend mode: {mode}")
+    return frames
@@ -0,0 +1,120 @@
+import math
+
+import cv2
+import numpy as np
+
+# Relative cost of one FFT butterfly compared to one multiply-add of the separable filter. This is the median of the
+# per-measurement factors printed by `python -m benchmarks.convolution_crossover` (13.7-13.8 on the development
+# machine); rerun it on new hardware and update this value. Timings near the crossover vary by tens of percent from
+# run to run, so "auto" only reliably picks the faster method well away from it (e.g. 1024 px at sigma = 40 can go
+# either way).
+FFT_COST_FACTOR = 13.8
+
+
+def gaussian_derivative_kernel(sigma: float, order: int = 1, truncate: float = 3.0) -> np.ndarray:
+    """
+    Sampled 1-D Gaussian (order 0) or first Gaussian derivative (order 1) with radius ceil(truncate * sigma), so
+    there is no cap on the kernel size (sigma = 10 gives the full 61 taps).
+    The kernel is laid out for correlation like cv2.getDerivKernels: order 0 sums to 1, and order 1 is normalised
+    so a unit intensity ramp gives a response of 1.
+    :param sigma: Standard deviation of the Gaussian.
+    :param order: Derivative order, 0 or 1.
+    :param truncate: Kernel radius in standard deviations.
+    :return: float32 kernel of odd length.
+    """
+    if order not in (0, 1):
+        raise ValueError(f"Only derivative orders 0 and 1 are supported, got {order}")
+    radius = max(1, int(math.ceil(truncate * sigma)))
+    x = np.arange(-radius, radius + 1, dtype=np.float64)
+    gaussian = np.exp(-x ** 2 / (2 * sigma ** 2))
+    if order == 0:
+        kernel = gaussian / gaussian.sum()
+    else:
+        kernel = x * gaussian
+        kernel /= np.sum(x * kernel)
+    return kernel.astype(np.float32)
+
+
+def choose_method(image_shape: tuple, kernel_size: int) -> str:
+    """
+    Pick the cheaper way to apply a separable kernel_size x kernel_size filter, using a simple cost model:
+    separable filtering costs 2 * k multiply-adds per pixel, FFT filtering costs about log2 of the padded size per
+    pixel, scaled by FFT_COST_FACTOR. The model is approximate: close to the crossover either method may be faster.
+    :param image_shape: Shape of the image (height, width).
+    :param kernel_size: Length of the 1-D kernels.
+    :return: "separable" or "fft".
+    """
+    height, width = image_shape[:2]
+    padded = cv2.getOptimalDFTSize(height + kernel_size - 1) * cv2.getOptimalDFTSize(width + kernel_size - 1)
+    separable_cost = 2 * kernel_size * height * width
+    fft_cost = FFT_COST_FACTOR * padded * math.log2(padded)
+    return "fft" if fft_cost < separable_cost else "separable"
+
+
+def separable_filter(image: np.ndarray, kernel_x: np.ndarray, kernel_y: np.ndarray) -> np.ndarray:
+    """
+    Correlate the image with the outer product of kernel_y and kernel_x as two 1-D passes.
+    :return: float32 response with reflected borders.
+    """
+    return cv2.sepFilter2D(image, cv2.CV_32F, kernel_x, kernel_y, borderType=cv2.BORDER_REFLECT_101)
+
+
+def fft_filter(image: np.ndarray, kernel_x: np.ndarray, kernel_y: np.ndarray) -> np.ndarray:
+    """
+    Same result as separable_filter, computed with real DFTs on an optimally sized padded image.
+    :return: float32 response with reflected borders.
+    """
+    return fft_filter_bank(image, [(kernel_x, kernel_y)])[0]
+
+
+def fft_filter_bank(image: np.ndarray, kernel_pairs: list) -> list:
+    """
+    Apply several separable kernels of the same size with DFTs, transforming the image only once.
+    :param image: Single-channel image.
+    :param kernel_pairs: List of (kernel_x, kernel_y) pairs; all kernel_x and all kernel_y must have equal lengths.
+    :return: List of float32 responses with reflected borders, one per pair.
+    """
+    radius_x = len(kernel_pairs[0][0]) // 2
+    radius_y = len(kernel_pairs[0][1]) // 2
+    rows, cols = image.shape
+    fft_rows = cv2.getOptimalDFTSize(rows + 2 * radius_y)
+    fft_cols = cv2.getOptimalDFTSize(cols + 2 * radius_x)
+
+    # reflect the borders, then zero-fill up to the DFT size
+    padded = cv2.copyMakeBorder(image.astype(np.float32), radius_y, radius_y, radius_x, radius_x,
+                                cv2.BORDER_REFLECT_101)
+    padded = cv2.copyMakeBorder(padded, 0, fft_rows - padded.shape[0], 0, fft_cols - padded.shape[1],
+                                cv2.BORDER_CONSTANT, value=0)
+    # packed real spectra (CCS) are half the size of complex ones
+    image_spectrum = cv2.dft(padded)
+
+    responses = []
+    kernel = np.zeros((fft_rows, fft_cols), dtype=np.float32)
+    for kernel_x, kernel_y in kernel_pairs:
+        # flip the kernel so that DFT convolution gives the same correlation as cv2.sepFilter2D
+        kernel[:len(kernel_y), :len(kernel_x)] = np.outer(kernel_y[::-1], kernel_x[::-1])
+        spectrum = cv2.mulSpectrums(image_spectrum, cv2.dft(kernel), 0)
+        full = cv2.idft(spectrum, flags=cv2.DFT_SCALE | cv2.DFT_REAL_OUTPUT)
+        # the valid part of the full convolution lines up with the unpadded image
+        responses.append(full[2 * radius_y:2 * radius_y + rows, 2 * radius_x:2 * radius_x + cols])
+    return responses
+
+
+def gaussian_derivatives(image: np.ndarray, sigma: float, method: str = "auto") -> tuple:
+    """
+    Signed first derivatives of the Gaussian-smoothed image.
+    :param image: Single-channel image.
+    :param sigma: Standard deviation of the Gaussian.
+    :param method: "separable", "fft" or "auto" to let choose_method decide.
+    :return: (derivative along x, derivative along y) as float32 images.
+    """
+    smooth = gaussian_derivative_kernel(sigma, order=0)
+    derivative = gaussian_derivative_kernel(sigma, order=1)
+    if method == "auto":
+        method = choose_method(image.shape, len(derivative))
+    if method == "separable":
+        return separable_filter(image, derivative, smooth), separable_filter(image, smooth, derivative)
+    if method == "fft":
+        derivative_x, derivative_y = fft_filter_bank(image, [(derivative, smooth), (smooth, derivative)])
+        return derivative_x, derivative_y
+    raise ValueError(f"Unknown convolution method: {method}")
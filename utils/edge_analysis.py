@@ -0,0 +1,172 @@
+import cv2
+import numpy as np
+
+from utils.convolution import gaussian_derivative_kernel
+
+# 3x3 Sobel kernels (the cv2.Sobel ones), used when no kernels are given
+DEFAULT_KERNEL_X = np.array([[-1, 0, 1],
+                             [-2, 0, 2],
+                             [-1, 0, 1]], dtype=np.float32)
+DEFAULT_KERNEL_Y = DEFAULT_KERNEL_X.T.copy()
+
+INT16_MAX = np.iinfo(np.int16).max
+
+
+def derivative_depth(kernel_x: np.ndarray, kernel_y: np.ndarray) -> int:
+    """
+    :return: cv2.CV_16S if both kernels are integer and no response to a uint8 image can overflow int16, otherwise
+    cv2.CV_32F.
+    """
+    for kernel in (kernel_x, kernel_y):
+        if not np.array_equal(kernel, np.round(kernel)) or np.abs(kernel).sum() * 255 > INT16_MAX:
+            return cv2.CV_32F
+    return cv2.CV_16S
+
+
+class EdgeAnalyzer:
+    """
+    Signed image derivatives, gradient magnitude and orientation, and a non-maximum-suppressed edge map.
+    Derivatives are kept signed (int16 for small integer kernels, float32 otherwise), so falling edges are not clipped
+    away as they are by cv2.filter2D with ddepth=-1. Every result is written into scratch buffers owned by the
+    analyzer, which are only reallocated when the image size changes, so analysing a batch of same-sized images keeps
+    memory flat. The returned arrays are those buffers: copy them to keep them past the next call.
+    """
+
+    def __init__(self, kernel_x: np.ndarray = None, kernel_y: np.ndarray = None, sigma: float = None):
+        """
+        :param kernel_x: Derivative kernel along x, applied with cv2.filter2D (default: 3x3 Sobel).
+        :param kernel_y: Derivative kernel along y.
+        :param sigma: Use first derivatives of a Gaussian with this standard deviation instead of the kernels
+        (separable, float32).
+        """
+        self.sigma = sigma
+        if sigma is not None:
+            self.smooth = gaussian_derivative_kernel(sigma, order=0)
+            self.derivative = gaussian_derivative_kernel(sigma, order=1)
+            self.depth = cv2.CV_32F
+        else:
+            self.kernel_x = DEFAULT_KERNEL_X if kernel_x is None else np.asarray(kernel_x, dtype=np.float32)
+            self.kernel_y = DEFAULT_KERNEL_Y if kernel_y is None else np.asarray(kernel_y, dtype=np.float32)
+            self.depth = derivative_depth(self.kernel_x, self.kernel_y)
+        self._shape = None
+
+    def _allocate(self, shape: tuple) -> None:
+        if shape == self._shape:
+            return
+        height, width = shape
+        dtype = np.int16 if self.depth == cv2.CV_16S else np.float32
+        self.dx = np.empty(shape, dtype=dtype)
+        self.dy = np.empty(shape, dtype=dtype)
+        # cartToPolar only takes floats, so int16 derivatives are converted into these first
+        self._dx_float = self.dx if dtype == np.float32 else np.empty(shape, dtype=np.float32)
+        self._dy_float = self.dy if dtype == np.float32 else np.empty(shape, dtype=np.float32)
+        self.magnitude = np.empty(shape, dtype=np.float32)
+        self.orientation = np.empty(shape, dtype=np.float32)
+        self.edges = np.empty(shape, dtype=np.uint8)
+        self._padded = np.empty((height + 2, width + 2), dtype=np.float32)
+        self._sector = np.empty(shape, dtype=np.float32)
+        self._keep = np.empty(shape, dtype=bool)
+        self._in_sector = np.empty(shape, dtype=bool)
+        self._compare = np.empty(shape, dtype=bool)
+        self._shape = shape
+
+    def derivatives(self, gray: np.ndarray) -> tuple:
+        """
+        :param gray: Single-channel image.
+        :return: (dx, dy) signed derivatives, int16 or float32.
+        """
+        self._allocate(gray.shape[:2])
+        if self.sigma is not None:
+            cv2.sepFilter2D(gray, cv2.CV_32F, self.derivative, self.smooth, dst=self.dx,
+                            borderType=cv2.BORDER_REFLECT_101)
+            cv2.sepFilter2D(gray, cv2.CV_32F, self.smooth, self.derivative, dst=self.dy,
+                            borderType=cv2.BORDER_REFLECT_101)
+        else:
+            cv2.filter2D(gray, self.depth, self.kernel_x, dst=self.dx)
+            cv2.filter2D(gray, self.depth, self.kernel_y, dst=self.dy)
+        return self.dx, self.dy
+
+    def gradient(self, gray: np.ndarray) -> tuple:
+        """
+        :param gray: Single-channel image.
+        :return: (magnitude, orientation) as float32; the orientation is in degrees in [0, 360), measured from the x
+        axis towards the y axis (downwards in the image).
+        """
+        dx, dy = self.derivatives(gray)
+        if dx is not self._dx_float:
+            np.copyto(self._dx_float, dx)
+            np.copyto(self._dy_float, dy)
+        # magnitude and angle in one pass over the two derivative images
+        cv2.cartToPolar(self._dx_float, self._dy_float, self.magnitude, self.orientation, angleInDegrees=True)
+        return self.magnitude, self.orientation
+
+    def non_maximum_suppression(self, relative_threshold: float = 0.1) -> np.ndarray:
+        """
+        Thin the edges of the last gradient(): keep the pixels whose magnitude is a maximum along the gradient
+        direction (rounded to one of 4 directions) and at least relative_threshold times the largest magnitude.
+        :return: uint8 edge map, 255 on edges.
+        """
+        height, width = self._shape
+        magnitude = self.magnitude
+        cv2.copyMakeBorder(magnitude, 1, 1, 1, 1, cv2.BORDER_CONSTANT, dst=self._padded, value=0)
+
+        # sector 0: horizontal gradient, 1: towards bottom right, 2: vertical, 3: towards bottom left
+        sector = self._sector
+        np.add(self.orientation, 22.5, out=sector)
+        np.floor_divide(sector, 45, out=sector)
+        np.remainder(sector, 4, out=sector)
+
+        keep, in_sector, compare = self._keep, self._in_sector, self._compare
+        keep.fill(False)
+        for index, (offset_y, offset_x) in enumerate(((0, 1), (1, 1), (1, 0), (1, -1))):
+            ahead = self._padded[1 + offset_y:1 + offset_y + height, 1 + offset_x:1 + offset_x + width]
+            behind = self._padded[1 - offset_y:1 - offset_y + height, 1 - offset_x:1 - offset_x + width]
+            np.equal(sector, index, out=in_sector)
+            # >= on one side and > on the other, so a plateau two pixels wide keeps exactly one of them
+            np.greater_equal(magnitude, ahead, out=compare)
+            in_sector &= compare
+            np.greater(magnitude, behind, out=compare)
+            in_sector &= compare
+            keep |= in_sector
+
+        np.greater_equal(magnitude, relative_threshold * float(magnitude.max()), out=compare)
+        keep &= compare
+        np.multiply(keep, 255, out=self.edges, casting='unsafe')
+        return self.edges
+
+    def analyse(self, gray: np.ndarray, relative_threshold: float = 0.1) -> dict:
+        """
+        :param gray: Single-channel image.
+        :param relative_threshold: See non_maximum_suppression.
+        :return: Dict with dx, dy, magnitude, orientation and edges (the analyzer's buffers).
+        """
+        self.gradient(gray)
+        self.non_maximum_suppression(relative_threshold)
+        return {"dx": self.dx, "dy": self.dy, "magnitude": self.magnitude, "orientation": self.orientation,
+                "edges": self.edges}
+
+    def analyse_batch(self, images, relative_threshold: float = 0.1):
+        """
+        Analyse many single-channel images with the same buffers.
+        :param images: Iterable of images.
+        :return: Generator of result dicts (see analyse), each valid until the next one is produced.
+        """
+        for image in images:
+            yield self.analyse(image, relative_threshold)
+
+
+def magnitude_image(magnitude: np.ndarray) -> np.ndarray:
+    """
+    :return: Magnitude scaled to uint8 for display or saving.
+    """
+    return cv2.normalize(magnitude, None, 0, 255, cv2.NORM_MINMAX, cv2.CV_8U)
+
+
+def orientation_image(magnitude: np.ndarray, orientation: np.ndarray) -> np.ndarray:
+    """
+    :return: BGR image showing the orientation as hue and the magnitude as brightness.
+    """
+    hue = np.empty(orientation.shape, dtype=np.uint8)
+    np.multiply(orientation, 0.5, out=hue, casting='unsafe')  # OpenCV hue is 0-179 for 0-360 degrees
+    saturation = np.full(orientation.shape, 255, dtype=np.uint8)
+    return cv2.cvtColor(cv2.merge((hue, saturation, magnitude_image(magnitude))), cv2.COLOR_HSV2BGR)
@@ -5,6 +5,9 @@ curr_dir = os.path.join(curr_dir, "../")
 output_dir = os.path.abspath(os.path.join(curr_dir, 'output'))
 IMAGE_DIR = os.path.join(output_dir, 'images')
 VIDEO_DIR = os.path.join(output_dir, 'videos')
+LAB3_MASK_DIR = os.path.join(IMAGE_DIR, 'lab3')
+CATALOG_PATH = os.path.join(output_dir, 'catalog.json')
+RESULT_CACHE_DIR = os.path.join(output_dir, 'cache')
 
 # lab2 directory in assets/lab2/cat.png
 LAB2_DIR = os.path.abspath(os.path.join(curr_dir, 'assets/lab2'))
@@ -0,0 +1,234 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+SOURCE = "image"
+
+
+class FilterNode:
+    """
+    One operation of a FilterGraph.
+    """
+
+    def __init__(self, name: str, function, inputs: tuple, reuse_buffer: bool):
+        """
+        :param name: Name other nodes refer to it by.
+        :param function: Called with the arrays of the inputs, in order. With reuse_buffer it also receives
+        dst=<array or None> and must write its result into dst when one is given (like the dst argument of cv2).
+        :param inputs: Names of the nodes or sources the function is applied to.
+        :param reuse_buffer: Whether the function accepts dst.
+        """
+        self.name = name
+        self.function = function
+        self.inputs = tuple(inputs)
+        self.reuse_buffer = reuse_buffer
+
+
+class BufferPool:
+    """
+    Free arrays grouped by (shape, dtype), so a node can write into the buffer of an intermediate result that is no
+    longer needed instead of allocating a new one.
+    """
+
+    def __init__(self):
+        self._free = {}
+
+    def take(self, shape: tuple, dtype):
+        """
+        :return: A free array of that shape and dtype, or None.
+        """
+        free = self._free.get((tuple(shape), np.dtype(dtype)))
+        return free.pop() if free else None
+
+    def give(self, array: np.ndarray) -> None:
+        self._free.setdefault((array.shape, array.dtype), []).append(array)
+
+    def clear(self) -> None:
+        self._free.clear()
+
+
+class FilterGraph:
+    """
+    Declarative graph of image operations. Each node names the nodes (or sources) it reads, so an intermediate shared
+    by several branches, e.g. the grayscale image, is computed once per run. Only the nodes needed for the requested
+    outputs run. Nodes are grouped into levels whose members do not depend on each other. The members of a level
+    (e.g. the x and y Sobel responses) run in parallel on a thread pool; OpenCV releases the GIL while it filters.
+
+    Buffers are reused in two ways. During a run, an intermediate that no later node reads goes back to a pool that
+    the next nodes write into. In stream mode the outputs of one frame are also recycled for the next frame, so a
+    video is processed without allocating per frame. The same graph runs on a single image (run), a batch
+    (run_batch) or a video stream (run_stream).
+    """
+
+    def __init__(self, workers: int = 4):
+        """
+        :param workers: Threads used to run independent nodes in parallel (1 runs everything in order).
+        """
+        self.nodes = {}
+        self.workers = workers
+        self._pool = BufferPool()
+        self._layouts = {}  # node name -> (shape, dtype) of its last result, to pick a buffer before it runs
+        self._recycled = []  # outputs of the last run_stream frame, pooled once the next frame starts
+        self._executor = None
+
+    def add(self, name: str, function, inputs=(SOURCE,), reuse_buffer: bool = False) -> 'FilterGraph':
+        """
+        Add a node. Its inputs must already be nodes of the graph, or are treated as sources given to run().
+        :return: The graph, so calls can be chained.
+        """
+        if name in self.nodes:
+            raise ValueError(f"Node {name} already exists")
+        self.nodes[name] = FilterNode(name, function, inputs, reuse_buffer)
+        return self
+
+    def levels(self, outputs) -> list:
+        """
+        :param outputs: Names of the nodes whose results are wanted.
+        :return: List of levels, each a list of nodes that only depend on sources and earlier levels.
+        """
+        unknown = [name for name in outputs if name not in self.nodes]
+        if unknown:
+            raise ValueError(f"Unknown nodes: {unknown}. Available: {list(self.nodes)}")
+
+        depth = {}
+
+        def visit(name, path):
+            if name not in self.nodes:
+                return -1  # source
+            if name in path:
+                raise ValueError(f"Cycle through node {name}")
+            if name not in depth:
+                depth[name] = 1 + max((visit(parent, path | {name}) for parent in self.nodes[name].inputs),
+                                      default=-1)
+            return depth[name]
+
+        for name in outputs:
+            visit(name, frozenset())
+        levels = [[] for _ in range(max(depth.values(), default=-1) + 1)]
+        for name, level in depth.items():
+            levels[level].append(self.nodes[name])
+        return levels
+
+    def _call(self, node: FilterNode, values: dict, dst):
+        arguments = [values[name] for name in node.inputs]
+        if node.reuse_buffer:
+            return node.function(*arguments, dst=dst)
+        return node.function(*arguments)
+
+    def _release(self, value, live) -> None:
+        # only pool arrays the graph allocated itself: not a view or a read-only (cached) array, and not sharing
+        # memory with a live value (a source, or a node that returned its input or a view of it)
+        if not isinstance(value, np.ndarray) or value.base is not None or not value.flags.writeable:
+            return
+        if any(isinstance(other, np.ndarray) and np.may_share_memory(value, other) for other in live):
+            return
+        self._pool.give(value)
+
+    def run(self, sources, outputs=None, recycle: bool = False) -> dict:
+        """
+        Run the graph once.
+        :param sources: The input image, or a dict of source name to array for graphs with several sources.
+        :param outputs: Names of the nodes to return (default: every node no other node reads).
+        :param recycle: Return the buffers of the outputs to the pool after this run is read, i.e. at the start of the
+        next run. Used by run_stream; the results are then only valid until the next run.
+        :return: Dict of output name to result.
+        """
+        if not isinstance(sources, dict):
+            sources = {SOURCE: sources}
+        if outputs is None:
+            consumed = {name for node in self.nodes.values() for name in node.inputs}
+            outputs = [name for name in self.nodes if name not in consumed]
+        outputs = list(outputs)
+        levels = self.levels(outputs)
+
+        # last level reading each node, so its buffer can be released right after
+        last_use = {}
+        for index, level in enumerate(levels):
+            for node in level:
+                for name in node.inputs:
+                    last_use[name] = index
+
+        values = {}
+        for index, level in enumerate(levels):
+            buffers = [self._pool.take(*self._layouts[node.name]) if node.reuse_buffer and node.name in self._layouts
+                       else None for node in level]
+            lookup = {**sources, **values}
+            if len(level) > 1 and self.workers > 1:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers)
+                futures = [self._executor.submit(self._call, node, lookup, dst) for node, dst in zip(level, buffers)]
+                results = [future.result() for future in futures]
+            else:
+                results = [self._call(node, lookup, dst) for node, dst in zip(level, buffers)]
+
+            for node, dst, result in zip(level, buffers, results):
+                values[node.name] = result
+                if isinstance(result, np.ndarray):
+                    self._layouts[node.name] = (result.shape, result.dtype)
+                if dst is not None and not (isinstance(result, np.ndarray) and np.may_share_memory(result, dst)):
+                    self._pool.give(dst)  # the node did not use the buffer it was given
+            for name in [name for name, use in last_use.items() if use == index and name in values]:
+                if name not in outputs:
+                    value = values.pop(name)
+                    self._release(value, list(sources.values()) + list(values.values()))
+
+        results = {name: values[name] for name in outputs}
+        if recycle:
+            self._recycled = list(results.values())
+        return results
+
+    def _recycle_previous(self, sources: list) -> None:
+        previous, self._recycled = self._recycled, []
+        for index, value in enumerate(previous):
+            self._release(value, sources + previous[index + 1:])
+
+    def run_batch(self, images, outputs=None, constants: dict = None):
+        """
+        Run the graph on every image of an iterable. Intermediates are still reused between images, but the outputs
+        are fresh arrays the caller may keep.
+        :param constants: Other sources shared by every image, e.g. {"target": background}.
+        :return: Generator of result dicts, one per image.
+        """
+        for image in images:
+            yield self.run({**(constants or {}), SOURCE: image}, outputs)
+
+    def run_stream(self, frames, outputs=None, constants: dict = None):
+        """
+        Run the graph on every frame of a stream (e.g. read_frames of a cv2.VideoCapture). The output buffers of
+        each frame are reused for the next one, so after warm-up nothing is allocated per frame. Copy a result to
+        keep it past the next frame.
+        :param constants: Other sources shared by every frame, e.g. {"target": background}.
+        :return: Generator of result dicts, one per frame.
+        """
+        constants = constants or {}
+        for frame in frames:
+            self._recycle_previous([frame, *constants.values()])
+            yield self.run({**constants, SOURCE: frame}, outputs, recycle=True)
+        self._recycle_previous(list(constants.values()))
+
+    def close(self) -> None:
+        """
+        Stop the worker threads and drop the pooled buffers.
+        :return: None
+        """
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        self._pool.clear()
+
+
+def read_frames(capture, max_frames: int = None):
+    """
+    :param capture: Opened cv2.VideoCapture.
+    :param max_frames: Stop after this many frames.
+    :return: Generator of the frames of the capture, for FilterGraph.run_stream. Every frame is read into the same
+    buffer, so a frame is only valid until the next one is read.
+    """
+    count = 0
+    frame = None
+    while max_frames is None or count < max_frames:
+        ret, frame = capture.read(frame)
+        if not ret:
+            break
+        yield frame
+        count += 1
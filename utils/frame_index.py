@@ -0,0 +1,151 @@
+import bisect
+import json
+import os
+import struct
+
+import cv2
+
+INDEX_SUFFIX = '.frameindex.json'
+AVIIF_KEYFRAME = 0x10
+
+
+def _read_avi_index(video_path: str):
+    """
+    Read the legacy idx1 index of an AVI file without decoding anything.
+    :param video_path: Path to the AVI file.
+    :return: (frame_count, keyframes) where keyframes are frame numbers, or None if the file has no usable idx1 index.
+    """
+    with open(video_path, 'rb') as video_file:
+        header = video_file.read(12)
+        if len(header) < 12 or header[:4] != b'RIFF' or header[8:12] != b'AVI ':
+            return None
+
+        # walk the top-level chunks of the RIFF list until idx1
+        riff_end = 8 + struct.unpack('<I', header[4:8])[0]
+        position = 12
+        while position + 8 <= riff_end:
+            video_file.seek(position)
+            chunk_header = video_file.read(8)
+            if len(chunk_header) < 8:
+                return None
+            chunk_id, chunk_size = chunk_header[:4], struct.unpack('<I', chunk_header[4:])[0]
+            if chunk_id == b'idx1':
+                index_data = video_file.read(chunk_size)
+                break
+            position += 8 + chunk_size + (chunk_size & 1)  # chunks are word aligned
+        else:
+            return None
+
+    frame_count = 0
+    keyframes = []
+    for chunk_id, flags, _, _ in struct.iter_unpack('<4sIII', index_data[:len(index_data) // 16 * 16]):
+        # video chunks of the first stream are 00dc (compressed) or 00db (uncompressed)
+        if chunk_id[:2] != b'00' or chunk_id[2:] not in (b'dc', b'db'):
+            continue
+        if flags & AVIIF_KEYFRAME:
+            keyframes.append(frame_count)
+        frame_count += 1
+    if not keyframes:
+        return None
+    return frame_count, keyframes
+
+
+class FrameIndex:
+    """
+    Maps frame numbers to the nearest preceding keyframe of a video. Built once per video and persisted next to it
+    as <video>.frameindex.json; the saved index is discarded when the video's size or mtime changes.
+    """
+
+    def __init__(self, frame_count: int, keyframes: list):
+        self.frame_count = frame_count
+        self.keyframes = keyframes
+
+    @classmethod
+    def build(cls, video_path: str) -> 'FrameIndex':
+        """
+        Read the keyframes from the AVI index. Containers without one get an index whose only keyframe is frame 0,
+        with the frame count taken from a sequential grab() pass.
+        """
+        avi_index = _read_avi_index(video_path)
+        if avi_index is not None:
+            return cls(*avi_index)
+
+        camera = cv2.VideoCapture(video_path)
+        frame_count = 0
+        while camera.grab():
+            frame_count += 1
+        camera.release()
+        return cls(frame_count, [0])
+
+    @classmethod
+    def load_or_build(cls, video_path: str) -> 'FrameIndex':
+        """
+        :param video_path: Path to the video file.
+        :return: Index read from next to the video, or built and saved there if it is missing or stale.
+        """
+        index_path = video_path + INDEX_SUFFIX
+        stat = os.stat(video_path)
+        try:
+            with open(index_path) as index_file:
+                data = json.load(index_file)
+            if data['size'] == stat.st_size and data['mtime_ns'] == stat.st_mtime_ns:
+                return cls(data['frame_count'], data['keyframes'])
+        except (OSError, ValueError, KeyError):
+            pass
+
+        index = cls.build(video_path)
+        try:
+            with open(index_path, 'w') as index_file:
+                json.dump({'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'frame_count': index.frame_count,
+                           'keyframes': index.keyframes}, index_file)
+        except OSError as e:
+            print(f"Could not save frame index to {index_path}: {e}")
+        return index
+
+    def nearest_keyframe(self, frame_number: int) -> int:
+        """
+        :return: The last keyframe at or before frame_number.
+        """
+        return self.keyframes[bisect.bisect_right(self.keyframes, frame_number) - 1]
+
+
+def read_frames(video_path: str, frame_numbers, index: FrameIndex = None):
+    """
+    Decode the requested frames, seeking only to keyframes and grabbing forward from there. Moving forward past
+    another keyframe seeks straight to it instead of decoding everything in between.
+    :param video_path: Path to the video file.
+    :param frame_numbers: Increasing frame numbers (0-indexed).
+    :param index: FrameIndex of the video (loaded or built if omitted).
+    :return: Generator of (frame_number, image) pairs; frames past the end of the video are skipped.
+    """
+    index = index or FrameIndex.load_or_build(video_path)
+    camera = cv2.VideoCapture(video_path)
+    position = 0  # number of the frame the next grab() returns
+    try:
+        for frame_number in frame_numbers:
+            if frame_number < 0 or frame_number >= index.frame_count:
+                continue
+            keyframe = index.nearest_keyframe(frame_number)
+            if frame_number < position or keyframe > position:
+                camera.set(cv2.CAP_PROP_POS_FRAMES, keyframe)
+                position = keyframe
+            while position < frame_number:
+                if not camera.grab():
+                    return
+                position += 1
+            ret, img = camera.read()
+            if not ret:
+                return
+            position += 1
+            yield frame_number, img
+    finally:
+        camera.release()
+
+
+def read_frame(video_path: str, frame_number: int, index: FrameIndex = None):
+    """
+    :return: The requested frame, or None if it could not be decoded.
+    """
+    for _, img in read_frames(video_path, [frame_number], index):
+        return img
+    return None
@@ -0,0 +1,95 @@
+import math
+from functools import lru_cache
+
+import cv2
+import numpy as np
+
+
+def fast_fft_shape(shape: tuple) -> tuple:
+    """
+    :param shape: (rows, cols) the transform has to cover.
+    :return: Smallest shape at least as large whose sides factor into 2, 3 and 5, which the FFT handles fastest.
+    """
+    return cv2.getOptimalDFTSize(shape[0]), cv2.getOptimalDFTSize(shape[1])
+
+
+@lru_cache(maxsize=32)
+def gaussian_lowpass_spectrum(fft_shape: tuple, sigma: float, dtype=np.float64) -> np.ndarray:
+    """
+    Half-plane (rfft2 layout) spectrum of a unit-sum Gaussian of the given sigma. The Gaussian's transform is
+    evaluated analytically as the outer product of two 1-D Gaussians, so no spatial kernel or meshgrid is built.
+    Results are cached per (shape, sigma, dtype), so filtering a stream of same-sized frames skips this entirely.
+    :param fft_shape: (rows, cols) of the transform.
+    :param sigma: Standard deviation of the Gaussian in pixels.
+    :param dtype: float64, or float32 for half the memory.
+    :return: Read-only real array of shape (rows, cols // 2 + 1).
+    """
+    rows, cols = fft_shape
+    frequencies_y = np.fft.fftfreq(rows)
+    frequencies_x = np.fft.rfftfreq(cols)
+    spectrum_y = np.exp(-2 * (math.pi * sigma * frequencies_y) ** 2).astype(dtype)
+    spectrum_x = np.exp(-2 * (math.pi * sigma * frequencies_x) ** 2).astype(dtype)
+    spectrum = np.outer(spectrum_y, spectrum_x)
+    spectrum.flags.writeable = False
+    return spectrum
+
+
+def image_spectrum(image: np.ndarray, margin: int = 0, dtype=np.float64) -> tuple:
+    """
+    Real FFT of a single-channel image, reflected by margin pixels on each side and padded to a fast FFT size.
+    :param image: Single-channel image.
+    :param margin: Number of reflected pixels around the image, so filtering does not wrap around the edges.
+    :param dtype: float64, or float32 for complex64 spectra (half the memory).
+    :return: (spectrum, fft_shape).
+    """
+    rows, cols = image.shape
+    fft_shape = fast_fft_shape((rows + 2 * margin, cols + 2 * margin))
+    # reflect the margin, then fill the rest of the fast size with the continued reflection as well
+    padded = cv2.copyMakeBorder(image.astype(dtype, copy=False), margin, fft_shape[0] - rows - margin,
+                                margin, fft_shape[1] - cols - margin, cv2.BORDER_REFLECT_101)
+    return np.fft.rfft2(padded), fft_shape
+
+
+def gaussian_lowpass(image: np.ndarray, sigma: float, dtype=np.float64, spectrum: tuple = None) -> np.ndarray:
+    """
+    Blur the image with a Gaussian in the frequency domain.
+    :param image: Single-channel image.
+    :param sigma: Standard deviation of the Gaussian.
+    :param dtype: float64, or float32 to halve memory use on large images.
+    :param spectrum: (spectrum, fft_shape) from image_spectrum with margin=lowpass_margin(sigma, image.shape), to
+    reuse an image transform that was already computed.
+    :return: Filtered image of the same size, in the given dtype.
+    """
+    margin = lowpass_margin(sigma, image.shape)
+    if spectrum is None:
+        spectrum = image_spectrum(image, margin, dtype)
+    image_fft, fft_shape = spectrum
+    filtered = np.fft.irfft2(image_fft * gaussian_lowpass_spectrum(fft_shape, float(sigma), dtype), fft_shape)
+    rows, cols = image.shape
+    return filtered[margin:margin + rows, margin:margin + cols].astype(dtype, copy=False)
+
+
+def lowpass_margin(sigma: float, shape: tuple) -> int:
+    """
+    :return: Reflection margin that covers 3 sigma, but never more than the image itself can reflect.
+    """
+    return min(int(math.ceil(3 * sigma)), shape[0] - 1, shape[1] - 1)
+
+
+def magnitude_spectrum(spectrum: np.ndarray, width: int) -> np.ndarray:
+    """
+    Log-magnitude of a half-plane rfft2 spectrum, expanded to the full plane and shifted so the zero frequency is
+    in the centre.
+    :param spectrum: rfft2 output.
+    :param width: Width of the transformed image.
+    :return: float32 array 20 * log(1 + |F|).
+    """
+    half = 20 * np.log1p(np.abs(spectrum)).astype(np.float32)
+    rows = half.shape[0]
+    full = np.empty((rows, width), dtype=np.float32)
+    full[:, :half.shape[1]] = half
+    # the missing columns are the conjugate mirror of the stored ones: |F(-u, -v)| = |F(u, v)|
+    mirrored = width - half.shape[1]
+    if mirrored > 0:
+        full[:, half.shape[1]:] = np.roll(half[::-1, 1:mirrored + 1][:, ::-1], 1, axis=0)
+    return np.fft.fftshift(full)
@@ -0,0 +1,70 @@
+from functools import lru_cache
+
+import cv2
+import numpy as np
+
+
+@lru_cache(maxsize=64)
+def build_hue_lut(lower_thresholds: tuple, upper_thresholds: tuple) -> np.ndarray:
+    """
+    Compile any number of inclusive hue ranges into one 256-entry lookup table, so that a single cv2.LUT pass
+    replaces one cv2.inRange and one cv2.bitwise_or per range.
+    :param lower_thresholds: Lower bounds of the ranges.
+    :param upper_thresholds: Upper bounds of the ranges.
+    :return: Read-only uint8 table of shape (1, 256), 255 for values inside any range and 0 elsewhere.
+    """
+    lut = np.zeros((1, 256), dtype=np.uint8)
+    for low, high in zip(lower_thresholds, upper_thresholds):
+        lut[0, max(int(low), 0):min(int(high), 255) + 1] = 255
+    lut.flags.writeable = False
+    return lut
+
+
+def apply_hue_lut(hue_channel: np.ndarray, lut: np.ndarray, dst: np.ndarray = None) -> np.ndarray:
+    """
+    :param hue_channel: uint8 single-channel image.
+    :param lut: Table from build_hue_lut.
+    :param dst: Optional uint8 array of the same shape to write the mask into.
+    :return: Binary mask.
+    """
+    return cv2.LUT(hue_channel, lut, dst=dst)
+
+
+@lru_cache(maxsize=64)
+def build_hsv_lut(ranges: tuple) -> np.ndarray:
+    """
+    Compile HSV boxes into a 3-channel lookup table. Every box gets one bit, set in a channel's entry when that
+    channel value is inside the box's range for that channel; a pixel is inside a box when its bit survives in all
+    three channels.
+    :param ranges: Tuple of ((h_low, h_high), (s_low, s_high), (v_low, v_high)) inclusive boxes, at most 32.
+    :return: Read-only table of shape (1, 256, 3), uint8 for up to 8 boxes, uint16 up to 16, int32 up to 32.
+    """
+    if len(ranges) > 32:
+        raise ValueError(f"At most 32 HSV ranges fit in one lookup table, got {len(ranges)}")
+    dtype = np.uint8 if len(ranges) <= 8 else np.uint16 if len(ranges) <= 16 else np.int32
+    lut = np.zeros((1, 256, 3), dtype=np.int64)
+    for bit, box in enumerate(ranges):
+        for channel, (low, high) in enumerate(box):
+            lut[0, max(int(low), 0):min(int(high), 255) + 1, channel] |= 1 << bit
+    # bit 31 does not fit a signed int32 as a positive number, so wrap it into the sign bit explicitly
+    lut = lut.astype(np.uint32).view(np.int32) if dtype == np.int32 else lut.astype(dtype)
+    lut.flags.writeable = False
+    return lut
+
+
+def apply_hsv_lut(hsv_image: np.ndarray, lut: np.ndarray, dst: np.ndarray = None,
+                  scratch: np.ndarray = None) -> np.ndarray:
+    """
+    :param hsv_image: uint8 HSV image.
+    :param lut: Table from build_hsv_lut.
+    :param dst: Optional uint8 single-channel array to write the mask into.
+    :param scratch: Optional array of the image's shape and the table's dtype for the per-channel bits.
+    :return: Binary mask, 255 for pixels inside any of the boxes.
+    """
+    bits = cv2.LUT(hsv_image, lut, dst=scratch)
+    hue_bits, saturation_bits, value_bits = bits[:, :, 0], bits[:, :, 1], bits[:, :, 2]
+    combined = np.bitwise_and(hue_bits, saturation_bits)
+    np.bitwise_and(combined, value_bits, out=combined)
+    if dst is None:
+        dst = np.empty(combined.shape, dtype=np.uint8)
+    return cv2.compare(combined, 0, cv2.CMP_NE, dst=dst)
@@ -0,0 +1,131 @@
+import os
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+class ImageCache:
+    """
+    In-process cache of decoded images and of representations derived from them (grayscale, HSV, masks, ...).
+    Entries are keyed by path and validated against the file's mtime and size, so an edited file is decoded again.
+    The total size of all cached arrays is capped; least recently used images are evicted together with everything
+    derived from them.
+    Cached arrays are read-only because they are shared: copy one before modifying it in place.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        # (path, flags) -> {'key', 'stamp': (mtime_ns, size), 'arrays': {name: array}, 'bytes'}
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _entry(self, path: str, flags: int):
+        """
+        :return: Valid cache entry for the file, decoding it if needed, or None if it cannot be loaded.
+        """
+        key = (os.path.abspath(path), flags)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        stamp = (stat.st_mtime_ns, stat.st_size)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry['stamp'] == stamp:
+                self._entries.move_to_end(key)
+                return entry
+
+        image = cv2.imread(path, flags)
+        if image is None:
+            return None
+        image.flags.writeable = False
+        with self._lock:
+            old_entry = self._entries.pop(key, None)
+            if old_entry is not None:
+                self.current_bytes -= old_entry['bytes']
+            entry = {'key': key, 'stamp': stamp, 'arrays': {'image': image}, 'bytes': image.nbytes}
+            self._entries[key] = entry
+            self.current_bytes += image.nbytes
+            self._evict()
+        return entry
+
+    def _evict(self) -> None:
+        # always keep the most recently used entry, even if it alone exceeds the cap
+        while self.current_bytes > self.max_bytes and len(self._entries) > 1:
+            _, entry = self._entries.popitem(last=False)
+            self.current_bytes -= entry['bytes']
+
+    def load(self, path: str, flags: int = cv2.IMREAD_COLOR):
+        """
+        Cached replacement for cv2.imread.
+        :param path: Path to the image.
+        :param flags: cv2.imread flags.
+        :return: Read-only image, or None if it cannot be loaded.
+        """
+        entry = self._entry(path, flags)
+        return entry['arrays']['image'] if entry is not None else None
+
+    def derived(self, path: str, name, compute, flags: int = cv2.IMREAD_COLOR):
+        """
+        Memoize a representation derived from an image.
+        :param path: Path to the image.
+        :param name: Hashable name of the representation; include every parameter the result depends on.
+        :param compute: Function of the (read-only) decoded image returning the representation.
+        :param flags: cv2.imread flags of the source image.
+        :return: Read-only representation, or None if the image cannot be loaded.
+        """
+        entry = self._entry(path, flags)
+        if entry is None:
+            return None
+        arrays = entry['arrays']
+        with self._lock:
+            if name in arrays:
+                self.hits += 1
+                return arrays[name]
+            self.misses += 1
+
+        result = compute(arrays['image'])
+        if isinstance(result, np.ndarray):
+            result.flags.writeable = False
+        with self._lock:
+            if name not in arrays:
+                arrays[name] = result
+                size = result.nbytes if isinstance(result, np.ndarray) else 0
+                entry['bytes'] += size
+                # the entry may already have been evicted by another thread; only count it while it is cached
+                if self._entries.get(entry['key']) is entry:
+                    self.current_bytes += size
+                    self._evict()
+            return arrays[name]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+
+image_cache = ImageCache()
+
+
+def load_image(path: str, flags: int = cv2.IMREAD_COLOR):
+    """
+    Load an image through the shared cache.
+    :return: Read-only image, or None if it cannot be loaded.
+    """
+    return image_cache.load(path, flags)
+
+
+def get_derived(path: str, name, compute, flags: int = cv2.IMREAD_COLOR):
+    """
+    Get a representation derived from an image through the shared cache.
+    :return: Read-only representation, or None if the image cannot be loaded.
+    """
+    return image_cache.derived(path, name, compute, flags)
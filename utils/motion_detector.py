@@ -0,0 +1,81 @@
+import cv2
+import numpy as np
+
+
+class MotionDetector:
+    """
+    Cheap motion detection for unattended recording. Each frame is downscaled and converted to grayscale, compared
+    with a running-average background, and the fraction of changed pixels drives a hysteresis switch: motion starts
+    after start_frames consecutive frames above start_ratio and ends after stop_frames consecutive frames below
+    stop_ratio, so the writer is not toggled by single noisy frames or short pauses.
+    Every intermediate image is held in a buffer allocated once, so a long run allocates nothing per frame.
+    """
+
+    def __init__(self, frame_shape: tuple, width: int = 160, alpha: float = 0.05, pixel_threshold: int = 25,
+                 start_ratio: float = 0.01, stop_ratio: float = 0.003, start_frames: int = 3, stop_frames: int = 60):
+        """
+        :param frame_shape: Shape of the full-size BGR frames.
+        :param width: Width the frames are downscaled to before comparing (the aspect ratio is kept).
+        :param alpha: Weight of the newest frame in the running-average background.
+        :param pixel_threshold: Gray-level difference from the background above which a pixel counts as changed.
+        :param start_ratio: Fraction of changed pixels that counts as motion.
+        :param stop_ratio: Fraction of changed pixels below which the scene counts as still.
+        :param start_frames: Consecutive moving frames needed to start.
+        :param stop_frames: Consecutive still frames needed to stop.
+        """
+        height = max(1, round(frame_shape[0] * width / frame_shape[1]))
+        self.size = (width, height)
+        self.alpha = alpha
+        self.pixel_threshold = pixel_threshold
+        self.start_ratio = start_ratio
+        self.stop_ratio = stop_ratio
+        self.start_frames = start_frames
+        self.stop_frames = stop_frames
+
+        self._small = np.empty((height, width, 3), dtype=np.uint8)
+        self._gray = np.empty((height, width), dtype=np.uint8)
+        self._background = np.empty((height, width), dtype=np.float32)
+        self._background_u8 = np.empty((height, width), dtype=np.uint8)
+        self._difference = np.empty((height, width), dtype=np.uint8)
+        self.mask = np.empty((height, width), dtype=np.uint8)
+
+        self.active = False
+        self.ratio = 0.0
+        self._initialised = False
+        self._streak = 0  # consecutive frames arguing for a state change
+
+    def changed_ratio(self, frame: np.ndarray) -> float:
+        """
+        Compare the frame with the background, then blend the frame into the background.
+        :param frame: Full-size BGR frame.
+        :return: Fraction of the downscaled pixels that differ from the background.
+        """
+        cv2.resize(frame, self.size, dst=self._small, interpolation=cv2.INTER_AREA)
+        cv2.cvtColor(self._small, cv2.COLOR_BGR2GRAY, dst=self._gray)
+        if not self._initialised:
+            self._background[:] = self._gray
+            self._initialised = True
+
+        cv2.convertScaleAbs(self._background, dst=self._background_u8)
+        cv2.absdiff(self._gray, self._background_u8, dst=self._difference)
+        cv2.threshold(self._difference, self.pixel_threshold, 255, cv2.THRESH_BINARY, dst=self.mask)
+        cv2.accumulateWeighted(self._gray, self._background, self.alpha)
+        return cv2.countNonZero(self.mask) / self.mask.size
+
+    def update(self, frame: np.ndarray) -> bool:
+        """
+        :param frame: Full-size BGR frame.
+        :return: Whether motion is currently active.
+        """
+        self.ratio = self.changed_ratio(frame)
+        if self.active:
+            self._streak = self._streak + 1 if self.ratio < self.stop_ratio else 0
+            if self._streak >= self.stop_frames:
+                self.active = False
+                self._streak = 0
+        else:
+            self._streak = self._streak + 1 if self.ratio >= self.start_ratio else 0
+            if self._streak >= self.start_frames:
+                self.active = True
+                self._streak = 0
+        return self.active
@@ -0,0 +1,140 @@
+import json
+import time
+
+import cv2
+
+from utils.capture_pipeline import CapturePipeline
+
+TIMESTAMPS_SUFFIX = '.timestamps.json'
+
+
+class MultiSourceRecorder:
+    """
+    Records several cameras or streams at once. Every source gets its own CapturePipeline (grabber and encoder
+    threads, ring buffer and output file); the calling thread only shows the previews and handles the keyboard, since
+    HighGUI calls must stay on one thread.
+    The grab times of all sources come from the same clock and are saved as <video>.timestamps.json next to each
+    video, so the streams can be aligned afterwards.
+    """
+
+    def __init__(self, display: bool = True):
+        """
+        :param display: Show one preview window per source (SPACE toggles recording on all sources, ESC stops).
+        Without display, every source records from the start until it ends or reaches its frame limit.
+        """
+        self.display = display
+        self.sources = []  # dicts with 'name', 'source', 'video_path' and 'pipeline'
+        self.elapsed = 0.0
+        self._start_time = None
+        # converts perf_counter times to seconds since the epoch, identically for every source
+        self._epoch_offset = time.time() - time.perf_counter()
+
+    def add_source(self, source, camera, writer, video_path: str, buffer_size: int = 64, max_frames: int = None):
+        """
+        :param source: Camera index or path of the video file the camera was opened from.
+        :param camera: Opened cv2.VideoCapture.
+        :param writer: Opened cv2.VideoWriter for this source.
+        :param video_path: Path the writer records to.
+        :param buffer_size: Number of frames the source's ring buffer can hold.
+        :param max_frames: Stop this source after this many frames (None for no limit).
+        :return: The source's CapturePipeline.
+        """
+        name = f"Source {len(self.sources)}: {source}"
+        # a file never loses frames, so let its grabber wait for the encoder instead of dropping
+        pipeline = CapturePipeline(camera, writer, buffer_size=buffer_size, drop_when_full=not isinstance(source, str),
+                                   display=False, recording=not self.display, max_frames=max_frames, name=name,
+                                   record_timestamps=True)
+        self.sources.append({'name': name, 'source': source, 'video_path': video_path, 'pipeline': pipeline})
+        return pipeline
+
+    def _pipelines(self) -> list:
+        return [entry['pipeline'] for entry in self.sources]
+
+    def start(self) -> None:
+        self._start_time = time.perf_counter()
+        for pipeline in self._pipelines():
+            pipeline.start()
+
+    def stop(self) -> None:
+        for pipeline in self._pipelines():
+            pipeline.stop()
+
+    def wait(self) -> None:
+        """
+        Show the previews (with display) until every source has stopped, then wait for the encoders to drain.
+        """
+        if self.display:
+            self._display_loop()
+        for pipeline in self._pipelines():
+            pipeline.wait()
+        self.elapsed = time.perf_counter() - self._start_time
+
+    def _display_loop(self) -> None:
+        pipelines = self._pipelines()
+        while not all(pipeline.is_stopped() for pipeline in pipelines):
+            for pipeline in pipelines:
+                frame = pipeline.take_latest_frame()
+                if frame is not None:
+                    cv2.imshow(pipeline.name, frame)
+
+            key = cv2.waitKey(10)
+            if key % 256 == 32:  # SPACE pressed
+                recording = not pipelines[0].recording
+                for pipeline in pipelines:
+                    pipeline.recording = recording
+                print("Started recording..." if recording else "Stopped recording.")
+            elif key % 256 == 27:  # ESC pressed
+                print("Exiting...")
+                self.stop()
+        cv2.destroyAllWindows()
+        cv2.waitKey(1)  # Force OpenCV to process window events and close
+
+    def save_timestamps(self) -> list:
+        """
+        Write the grab time of every recorded frame, in seconds since the epoch, next to each video.
+        :return: Paths of the written timestamp files.
+        """
+        paths = []
+        for entry in self.sources:
+            timestamps = [timestamp + self._epoch_offset for timestamp in entry['pipeline'].frame_timestamps]
+            path = entry['video_path'] + TIMESTAMPS_SUFFIX
+            try:
+                with open(path, 'w') as timestamps_file:
+                    json.dump({'source': str(entry['source']), 'video': entry['video_path'],
+                               'frames': len(timestamps), 'timestamps': timestamps}, timestamps_file)
+                paths.append(path)
+            except OSError as e:
+                print(f"Could not save frame timestamps to {path}: {e}")
+        return paths
+
+    def report(self) -> dict:
+        """
+        Print per-source frame counters and the aggregate throughput.
+        :return: Dict with the per-source and aggregate statistics.
+        """
+        first_frames = [entry['pipeline'].frame_timestamps[0] for entry in self.sources
+                        if entry['pipeline'].frame_timestamps]
+        earliest = min(first_frames) if first_frames else 0.0
+        elapsed = self.elapsed or 1e-9
+
+        sources = []
+        for entry in self.sources:
+            pipeline = entry['pipeline']
+            attempted = pipeline.frames_written + pipeline.frames_dropped
+            drop_rate = pipeline.frames_dropped / attempted if attempted else 0.0
+            start_offset = pipeline.frame_timestamps[0] - earliest if pipeline.frame_timestamps else None
+            sources.append({'source': str(entry['source']), 'video': entry['video_path'],
+                            'grabbed': pipeline.frames_grabbed, 'written': pipeline.frames_written,
+                            'dropped': pipeline.frames_dropped, 'drop_rate': drop_rate,
+                            'fps': pipeline.frames_written / elapsed, 'start_offset': start_offset})
+            offset = f"{start_offset * 1000:7.1f} ms" if start_offset is not None else "      n/a"
+            print(f"{entry['name']}: grabbed {pipeline.frames_grabbed}, written {pipeline.frames_written}, "
+                  f"dropped {pipeline.frames_dropped} ({drop_rate * 100:.1f}%), "
+                  f"{pipeline.frames_written / elapsed:.1f} FPS, first frame at +{offset}")
+
+        written = sum(source['written'] for source in sources)
+        dropped = sum(source['dropped'] for source in sources)
+        print(f"All sources: {written} frames written, {dropped} dropped in {self.elapsed:.2f}s: "
+              f"{written / elapsed:.1f} frames/s")
+        return {'sources': sources, 'written': written, 'dropped': dropped, 'seconds': self.elapsed,
+                'frames_per_second': written / elapsed}
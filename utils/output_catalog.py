@@ -0,0 +1,178 @@
+import bisect
+import json
+import os
+import time
+
+from utils.file_utils import CATALOG_PATH, output_dir
+
+# directory mtimes this close to the scan time may still change within the same timestamp tick, so such a directory
+# is scanned again on the next refresh
+RACY_WINDOW_NS = 2_000_000_000
+
+
+class OutputCatalog:
+    """
+    Persistent catalog of the files in the output directories, with indexed "latest" and time-range queries.
+    A directory is only listed again when its mtime changes, and only the names that are new since the last listing
+    are stat'ed, so a query costs no stat calls per file once the catalog is warm.
+    Files that are overwritten in place do not change the directory mtime; call register() after writing them.
+    Only directories under root are stored; others (e.g. a temporary --out-dir) are listed on every query instead.
+    """
+
+    def __init__(self, catalog_path: str = CATALOG_PATH, root: str = output_dir):
+        """
+        :param catalog_path: JSON file the catalog is kept in.
+        :param root: Directory whose subdirectories are catalogued.
+        """
+        self.catalog_path = catalog_path
+        self.root = os.path.abspath(root)
+        self._directories = {}
+        self._sorted = {}
+        self._dirty = False
+        try:
+            with open(catalog_path) as catalog_file:
+                loaded = json.load(catalog_file)
+        except (OSError, ValueError):
+            loaded = {}
+        # drop directories that were deleted, or were catalogued by older versions outside the root
+        self._directories = {directory: entry for directory, entry in loaded.items()
+                             if self._is_catalogued(directory) and os.path.isdir(directory)}
+        self._dirty = len(self._directories) != len(loaded)
+
+    def _is_catalogued(self, directory: str) -> bool:
+        return os.path.commonpath([directory, self.root]) == self.root
+
+    @staticmethod
+    def _scan(directory: str, known_files: dict) -> dict:
+        """
+        :return: Dict of file name to mtime_ns, taking the mtimes of known_files instead of stat'ing them again.
+        """
+        files = {}
+        with os.scandir(directory) as scanned:
+            for file_entry in scanned:
+                if file_entry.name in known_files:
+                    files[file_entry.name] = known_files[file_entry.name]
+                elif file_entry.is_file():
+                    files[file_entry.name] = file_entry.stat().st_mtime_ns
+        return files
+
+    def refresh(self, directory: str) -> None:
+        """
+        Bring the entries of one directory up to date (in memory; save() writes them).
+        :param directory: Directory to refresh.
+        """
+        directory = os.path.abspath(directory)
+        if not self._is_catalogued(directory):
+            return
+        try:
+            directory_mtime = os.stat(directory).st_mtime_ns
+        except FileNotFoundError:
+            if self._directories.pop(directory, None) is not None:
+                self._sorted.pop(directory, None)
+                self._dirty = True
+            return
+
+        entry = self._directories.get(directory)
+        if entry is not None and entry['mtime_ns'] == directory_mtime and not entry.get('racy'):
+            return
+
+        files = self._scan(directory, entry['files'] if entry is not None else {})
+        racy = time.time_ns() - directory_mtime < RACY_WINDOW_NS
+        self._directories[directory] = {'mtime_ns': directory_mtime, 'racy': racy, 'files': files}
+        self._sorted.pop(directory, None)
+        self._dirty = True
+
+    def register(self, paths) -> None:
+        """
+        Record files that were just written, e.g. ones that overwrote existing files of the same name. Every
+        directory is refreshed once and the catalog is saved once per call, so register a batch of files together.
+        :param paths: Path to a file, or list of paths.
+        """
+        if isinstance(paths, str):
+            paths = [paths]
+        names_by_directory = {}
+        for path in paths:
+            directory, name = os.path.split(os.path.abspath(path))
+            names_by_directory.setdefault(directory, []).append(name)
+
+        for directory, names in names_by_directory.items():
+            self.refresh(directory)
+            entry = self._directories.get(directory)
+            if entry is None:
+                continue
+            for name in names:
+                entry['files'][name] = os.stat(os.path.join(directory, name)).st_mtime_ns
+            self._sorted.pop(directory, None)
+            self._dirty = True
+        self.save()
+
+    def _sorted_files(self, directory: str) -> list:
+        """
+        :return: List of (mtime_ns, name) of the directory, oldest first.
+        """
+        directory = os.path.abspath(directory)
+        if not self._is_catalogued(directory):
+            try:
+                files = self._scan(directory, {})
+            except FileNotFoundError:
+                files = {}
+            return sorted((mtime, name) for name, mtime in files.items())
+        self.refresh(directory)
+        self.save()
+        if directory not in self._sorted:
+            files = self._directories.get(directory, {}).get('files', {})
+            self._sorted[directory] = sorted((mtime, name) for name, mtime in files.items())
+        return self._sorted[directory]
+
+    def latest(self, directory: str, suffix=''):
+        """
+        :param directory: Directory to query.
+        :param suffix: Only consider files ending with this suffix (e.g. '.avi') or tuple of suffixes.
+        :return: Path of the most recently modified matching file, or None.
+        """
+        for _, name in reversed(self._sorted_files(directory)):
+            if name.endswith(suffix):
+                return os.path.join(directory, name)
+        return None
+
+    def between(self, directory: str, start: float, end: float, suffix: str = '') -> list:
+        """
+        :param directory: Directory to query.
+        :param start: Earliest modification time (seconds since the epoch, inclusive).
+        :param end: Latest modification time (seconds since the epoch, exclusive).
+        :param suffix: Only consider files ending with this suffix.
+        :return: Paths of the matching files modified in [start, end), oldest first.
+        """
+        files = self._sorted_files(directory)
+        low = bisect.bisect_left(files, (int(start * 1e9), ''))
+        high = bisect.bisect_left(files, (int(end * 1e9), ''))
+        return [os.path.join(directory, name) for _, name in files[low:high] if name.endswith(suffix)]
+
+    def save(self) -> None:
+        """
+        Write the catalog atomically if anything changed.
+        """
+        if not self._dirty:
+            return
+        temporary_path = f"{self.catalog_path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.catalog_path), exist_ok=True)
+            with open(temporary_path, 'w') as catalog_file:
+                json.dump(self._directories, catalog_file)
+            os.replace(temporary_path, self.catalog_path)
+            self._dirty = False
+        except OSError as e:
+            print(f"Could not save output catalog to {self.catalog_path}: {e}")
+
+
+_catalog = None
+
+
+def get_output_catalog() -> OutputCatalog:
+    """
+    :return: The catalog shared by the whole process, loaded on first use.
+    """
+    global _catalog
+    if _catalog is None:
+        _catalog = OutputCatalog()
+    return _catalog
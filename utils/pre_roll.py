@@ -0,0 +1,69 @@
+import math
+
+import numpy as np
+
+# upper bound on the preallocated frames, so a long pre-roll at a high resolution cannot take gigabytes up front
+MAX_PRE_ROLL_BYTES = 256 * 2 ** 20
+
+
+class PreRollBuffer:
+    """
+    Fixed-size circular buffer of the most recent frames, so a recording can start a few seconds before the moment
+    it was triggered. All frames are preallocated up front and the camera reads straight into them, so memory stays
+    flat however long the buffer idles; once full, each new frame overwrites the oldest one.
+    """
+
+    def __init__(self, capacity: int, frame_shape: tuple, dtype=np.uint8):
+        """
+        :param capacity: Number of frames kept (0 disables the pre-roll).
+        :param frame_shape: Shape of one frame, e.g. (height, width, 3).
+        """
+        self.capacity = capacity
+        self.frames = np.empty((capacity,) + tuple(frame_shape), dtype=dtype)
+        self._head = 0  # slot the next frame is read into
+        self._count = 0
+
+    @classmethod
+    def for_duration(cls, seconds: float, fps: float, frame_shape: tuple) -> 'PreRollBuffer':
+        """
+        :param seconds: Length of the pre-roll.
+        :param fps: Frame rate of the source.
+        :param frame_shape: Shape of one frame.
+        :return: Buffer holding the last `seconds` of frames, or as many as fit in MAX_PRE_ROLL_BYTES.
+        """
+        capacity = max(0, math.ceil(seconds * fps))
+        max_capacity = MAX_PRE_ROLL_BYTES // int(np.prod(frame_shape))
+        if capacity > max_capacity:
+            print(f"Pre-roll limited to {max_capacity / fps:.1f}s ({max_capacity} frames) to stay within "
+                  f"{MAX_PRE_ROLL_BYTES // 2 ** 20} MB")
+            capacity = max_capacity
+        return cls(capacity, frame_shape)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def next_slot(self) -> np.ndarray:
+        """
+        :return: The array the next frame should be read into (the oldest frame once the buffer is full).
+        Call commit() after filling it.
+        """
+        return self.frames[self._head]
+
+    def commit(self) -> None:
+        """
+        Keep the frame written into next_slot().
+        """
+        self._head = (self._head + 1) % self.capacity
+        self._count = min(self._count + 1, self.capacity)
+
+    def flush(self, writer) -> int:
+        """
+        Write the buffered frames to the writer, oldest first, and empty the buffer.
+        :param writer: Opened cv2.VideoWriter.
+        :return: Number of frames written.
+        """
+        count = self._count
+        for offset in range(count):
+            writer.write(self.frames[(self._head - count + offset) % self.capacity])
+        self._count = 0
+        return count
@@ -0,0 +1,291 @@
+import atexit
+import bisect
+import contextlib
+import datetime
+import json
+import os
+import threading
+import time
+
+from utils.file_utils import output_dir
+
+# MV_PROFILE=1 turns the stage timers on at startup, MV_PROFILE=overlay also draws them on live video
+PROFILE_ENV_VAR = "MV_PROFILE"
+PROFILE_DIR = os.path.join(output_dir, 'profiles')
+
+# upper bounds of the histogram buckets in milliseconds: 0.01 ms growing by sqrt(2) up to ~30 s, plus an overflow
+# bucket, so percentiles read from the histogram are within ~41% of the true value
+BUCKET_BOUNDS_MS = [0.01 * 2 ** (i / 2) for i in range(44)]
+MAX_TRACE_EVENTS = 200_000
+# weight of the newest sample in the smoothed values shown on the overlay
+OVERLAY_SMOOTHING = 0.1
+
+_DISABLED = contextlib.nullcontext()
+
+
+class StageHistogram:
+    """
+    Latency histogram of one named stage, with log-spaced buckets so it stays small however many samples it gets.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.count = 0
+        self.total_ms = 0.0
+        self.min_ms = float('inf')
+        self.max_ms = 0.0
+        self.buckets = [0] * (len(BUCKET_BOUNDS_MS) + 1)
+        self.smoothed_ms = None
+
+    def add(self, milliseconds: float) -> None:
+        self.count += 1
+        self.total_ms += milliseconds
+        self.min_ms = min(self.min_ms, milliseconds)
+        self.max_ms = max(self.max_ms, milliseconds)
+        self.buckets[bisect.bisect_left(BUCKET_BOUNDS_MS, milliseconds)] += 1
+        if self.smoothed_ms is None:
+            self.smoothed_ms = milliseconds
+        else:
+            self.smoothed_ms += OVERLAY_SMOOTHING * (milliseconds - self.smoothed_ms)
+
+    def percentile(self, fraction: float) -> float:
+        """
+        :param fraction: Percentile as a fraction, e.g. 0.99.
+        :return: Upper bound of the bucket holding the percentile, in milliseconds (capped at the maximum sample).
+        """
+        if not self.count:
+            return 0.0
+        target = fraction * self.count
+        cumulative = 0
+        for bucket, bucket_count in enumerate(self.buckets):
+            cumulative += bucket_count
+            if cumulative >= target:
+                bound = BUCKET_BOUNDS_MS[bucket] if bucket < len(BUCKET_BOUNDS_MS) else self.max_ms
+                return min(bound, self.max_ms)
+        return self.max_ms
+
+    def to_dict(self) -> dict:
+        return {"count": self.count, "total_ms": self.total_ms, "mean_ms": self.total_ms / self.count,
+                "min_ms": self.min_ms, "max_ms": self.max_ms, "p50_ms": self.percentile(0.5),
+                "p90_ms": self.percentile(0.9), "p99_ms": self.percentile(0.99),
+                "bucket_bounds_ms": BUCKET_BOUNDS_MS, "buckets": self.buckets}
+
+    def summary(self) -> str:
+        """
+        :return: One line with the count, mean, p50/p99 and max latency of this stage in milliseconds.
+        """
+        return (f"{self.name:<24} n={self.count:<7} mean={self.total_ms / self.count:8.2f} ms  "
+                f"p50={self.percentile(0.5):8.2f} ms  p99={self.percentile(0.99):8.2f} ms  max={self.max_ms:8.2f} ms")
+
+
+class StageProfiler:
+    """
+    Named stage timers for finding where the time goes inside a task or a video loop. Timings are aggregated into one
+    histogram per stage and, while there is room, kept as individual events for a Chrome trace (chrome://tracing or
+    https://ui.perfetto.dev). When disabled, stage() returns a shared no-op context manager, so the instrumentation
+    can stay in the hot loops.
+    """
+
+    def __init__(self, enabled: bool = False, overlay: bool = False, max_events: int = MAX_TRACE_EVENTS):
+        """
+        :param enabled: Whether the timers record anything.
+        :param overlay: Whether draw_overlay draws on the frames (only while enabled).
+        :param max_events: Maximum number of trace events kept; histograms keep counting after that.
+        """
+        self.enabled = enabled
+        self.overlay = overlay
+        self.max_events = max_events
+        self.stages = {}
+        self.events = []
+        self.events_dropped = 0
+        self._origin = time.perf_counter()
+        self._last_tick = None
+        self._frame_ms = None
+        self._lock = threading.Lock()
+
+    def stage(self, name: str):
+        """
+        Time the enclosed block as the named stage:
+            with profiler.stage("hsv"):
+                ...
+        """
+        if not self.enabled:
+            return _DISABLED
+        return self._timed(name)
+
+    @contextlib.contextmanager
+    def _timed(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, start, time.perf_counter())
+
+    def record(self, name: str, start: float, end: float) -> None:
+        """
+        Add a stage that was timed elsewhere.
+        :param name: Stage name.
+        :param start: perf_counter time at which the stage started.
+        :param end: perf_counter time at which the stage ended.
+        """
+        if not self.enabled:
+            return
+        milliseconds = (end - start) * 1000
+        with self._lock:
+            stage = self.stages.get(name)
+            if stage is None:
+                stage = self.stages[name] = StageHistogram(name)
+            stage.add(milliseconds)
+            if len(self.events) < self.max_events:
+                self.events.append((name, start, end - start, threading.get_ident()))
+            else:
+                self.events_dropped += 1
+
+    def tick(self) -> None:
+        """
+        Mark the end of a frame of a live loop; the interval between ticks gives the FPS shown on the overlay.
+        """
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        if self._last_tick is not None:
+            milliseconds = (now - self._last_tick) * 1000
+            if self._frame_ms is None:
+                self._frame_ms = milliseconds
+            else:
+                self._frame_ms += OVERLAY_SMOOTHING * (milliseconds - self._frame_ms)
+        self._last_tick = now
+
+    def draw_overlay(self, frame, stage_names=None):
+        """
+        Draw the FPS and the smoothed per-stage milliseconds in the top-left corner of the frame, in place.
+        :param frame: BGR frame.
+        :param stage_names: Stages to show, in order (all stages if omitted).
+        :return: The frame.
+        """
+        if not (self.enabled and self.overlay):
+            return frame
+        import cv2  # only the live video paths draw, and they have loaded cv2 already
+
+        lines = []
+        if self._frame_ms:
+            lines.append(f"FPS {1000 / self._frame_ms:5.1f}")
+        with self._lock:
+            names = stage_names if stage_names is not None else list(self.stages)
+            for name in names:
+                stage = self.stages.get(name)
+                if stage is not None:
+                    lines.append(f"{name} {stage.smoothed_ms:6.2f} ms")
+        for row, line in enumerate(lines):
+            position = (10, 25 + 22 * row)
+            # dark outline first so the text stays readable on any background
+            cv2.putText(frame, line, position, cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 0), 3, cv2.LINE_AA)
+            cv2.putText(frame, line, position, cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 1, cv2.LINE_AA)
+        return frame
+
+    def reset(self) -> None:
+        with self._lock:
+            self.stages = {}
+            self.events = []
+            self.events_dropped = 0
+            self._last_tick = None
+            self._frame_ms = None
+
+    def report(self) -> None:
+        """
+        Print one summary line per stage.
+        """
+        with self._lock:
+            stages = list(self.stages.values())
+        if not stages:
+            print("No profiling samples recorded.")
+            return
+        for stage in stages:
+            print(stage.summary())
+
+    def to_json(self, path: str) -> None:
+        """
+        Save the per-stage histograms as JSON.
+        """
+        with self._lock:
+            data = {"stages": {name: stage.to_dict() for name, stage in self.stages.items()},
+                    "events_dropped": self.events_dropped}
+        with open(path, 'w') as json_file:
+            json.dump(data, json_file, indent=2)
+
+    def to_chrome_trace(self, path: str) -> None:
+        """
+        Save the recorded stages in the Chrome trace event format (complete events, timestamps in microseconds).
+        """
+        pid = os.getpid()
+        with self._lock:
+            trace_events = [{"name": name, "ph": "X", "ts": (start - self._origin) * 1e6, "dur": duration * 1e6,
+                             "pid": pid, "tid": tid} for name, start, duration, tid in self.events]
+        with open(path, 'w') as trace_file:
+            json.dump({"traceEvents": trace_events, "displayTimeUnit": "ms"}, trace_file)
+
+    def save(self, directory: str = PROFILE_DIR) -> tuple:
+        """
+        Save both the histograms and the Chrome trace as timestamped files.
+        :return: (json path, trace path).
+        """
+        os.makedirs(directory, exist_ok=True)
+        curr_datetime = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+        json_path = os.path.join(directory, f'profile_{curr_datetime}.json')
+        trace_path = os.path.join(directory, f'profile_{curr_datetime}.trace.json')
+        self.to_json(json_path)
+        self.to_chrome_trace(trace_path)
+        print(f"Saved profile to: {json_path}")
+        print(f"Saved Chrome trace to: {trace_path}")
+        return json_path, trace_path
+
+
+def _profiler_from_environment() -> StageProfiler:
+    setting = os.environ.get(PROFILE_ENV_VAR, "").strip().lower()
+    enabled = setting not in ("", "0", "false", "no", "off")
+    return StageProfiler(enabled=enabled, overlay=setting == "overlay")
+
+
+profiler = _profiler_from_environment()
+
+
+def toggle_profiling() -> bool:
+    """
+    Turn the stage timers on or off; results recorded so far are kept.
+    :return: Whether profiling is now on.
+    """
+    profiler.enabled = not profiler.enabled
+    print(f"Profiling {'enabled' if profiler.enabled else 'disabled'}.")
+    return profiler.enabled
+
+
+def toggle_overlay() -> bool:
+    """
+    Turn the FPS and stage timing overlay of the live video paths on or off (turns profiling on with it).
+    :return: Whether the overlay is now on.
+    """
+    profiler.overlay = not profiler.overlay
+    if profiler.overlay and not profiler.enabled:
+        toggle_profiling()
+    print(f"Profiling overlay {'enabled' if profiler.overlay else 'disabled'}.")
+    return profiler.overlay
+
+
+def save_profile() -> None:
+    """
+    Print the stage summary, save it as JSON and Chrome trace, and start a fresh profile.
+    """
+    if not profiler.stages:
+        print("No profiling samples recorded. Enable profiling and run a task first.")
+        return
+    profiler.report()
+    profiler.save()
+    profiler.reset()
+
+
+@atexit.register
+def _save_at_exit() -> None:
+    # results of a profiled run are kept even if they were never saved from the menu
+    if profiler.enabled and profiler.stages:
+        profiler.report()
+        profiler.save()
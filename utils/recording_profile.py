@@ -0,0 +1,177 @@
+import time
+
+import cv2
+import numpy as np
+
+# frame rates outside this range are treated as "not reported" (many webcams return 0, some return garbage)
+PLAUSIBLE_FPS = (1.0, 240.0)
+FALLBACK_FPS = 30.0
+
+
+class RecordingProfile:
+    """
+    How a recording is encoded: codec, container, output resolution and frame rate. Profiles describe the output
+    only, so the same profile gives comparable files whatever camera or video the frames come from.
+    """
+
+    def __init__(self, name: str, fourcc: str = 'XVID', container: str = '.avi', width: int = None,
+                 height: int = None, fps: float = None, decimation: int = 1, description: str = ''):
+        """
+        :param name: Short name used in menus and on the command line.
+        :param fourcc: Four-character codec code passed to cv2.VideoWriter_fourcc.
+        :param container: File extension of the container, e.g. '.avi'.
+        :param width: Maximum output width (None keeps the source size; the height follows the aspect ratio if omitted).
+        :param height: Maximum output height (None keeps the source size; the width follows the aspect ratio if
+        omitted).
+        :param fps: Target frame rate; the source is decimated to the nearest whole fraction of its frame rate.
+        :param decimation: Keep every n-th frame (ignored when fps is set).
+        :param description: One line shown in menus.
+        """
+        self.name = name
+        self.fourcc = fourcc
+        self.container = container
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.decimation = decimation
+        self.description = description
+
+    def output_size(self, source_width: int, source_height: int) -> tuple:
+        """
+        :return: (width, height) of the recorded frames for a source of the given size. Profiles only ever shrink
+        the frames, so a source smaller than the profile's size is recorded at its own size.
+        """
+        if self.width is None and self.height is None:
+            return source_width, source_height
+        width = min(self.width or source_width, source_width)
+        height = min(self.height or source_height, source_height)
+        if self.width is None:
+            width = round(source_width * height / source_height)
+        elif self.height is None:
+            height = round(source_height * width / source_width)
+        return width, height
+
+    def frame_decimation(self, source_fps: float) -> int:
+        """
+        :return: Keep every n-th frame of a source with the given frame rate.
+        """
+        if self.fps:
+            return max(1, round(source_fps / self.fps))
+        return max(1, self.decimation)
+
+    def open_writer(self, path_stem: str, source_fps: float, source_size: tuple) -> 'RecordingWriter':
+        """
+        :param path_stem: Output path without extension; the profile's container is appended.
+        :param source_fps: Frame rate of the source.
+        :param source_size: (width, height) of the source frames.
+        :return: RecordingWriter, or one using the default profile if this codec is not available in this OpenCV build,
+        or None (after printing the error) if no writer could be opened, e.g. because the directory does not exist.
+        """
+        writer = RecordingWriter(self, path_stem + self.container, source_fps, source_size)
+        if writer.isOpened():
+            return writer
+        writer.release()
+        if self.name != DEFAULT_PROFILE:
+            print(f"Could not open a {self.fourcc} writer, falling back to the {DEFAULT_PROFILE} profile")
+            return RECORDING_PROFILES[DEFAULT_PROFILE].open_writer(path_stem, source_fps, source_size)
+        print(f"Error: Unable to open video writer for {writer.path}")
+        return None
+
+
+class RecordingWriter:
+    """
+    cv2.VideoWriter that applies a RecordingProfile: frames are decimated and resized (into a buffer allocated once)
+    before they are encoded. It has the same write/release/isOpened interface as cv2.VideoWriter, so it can be used
+    wherever a plain writer is expected.
+    """
+
+    def __init__(self, profile: RecordingProfile, path: str, source_fps: float, source_size: tuple):
+        self.profile = profile
+        self.path = path
+        self.decimation = profile.frame_decimation(source_fps)
+        self.fps = source_fps / self.decimation
+        self.size = profile.output_size(*source_size)
+        self.frames_received = 0
+        self.frames_written = 0
+        self._resized = None
+        if self.size != tuple(source_size):
+            self._resized = np.empty((self.size[1], self.size[0], 3), dtype=np.uint8)
+        self._writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*profile.fourcc), self.fps, self.size)
+
+    def isOpened(self) -> bool:
+        return self._writer.isOpened()
+
+    def write(self, frame: np.ndarray) -> None:
+        self.frames_received += 1
+        if (self.frames_received - 1) % self.decimation:
+            return
+        if self._resized is not None:
+            frame = cv2.resize(frame, self.size, dst=self._resized, interpolation=cv2.INTER_AREA)
+        self._writer.write(frame)
+        self.frames_written += 1
+
+    def release(self) -> None:
+        self._writer.release()
+
+
+RECORDING_PROFILES = {
+    "xvid": RecordingProfile("xvid", 'XVID', '.avi', description="MPEG-4 Part 2 in AVI (default, widely supported)"),
+    "mjpg": RecordingProfile("mjpg", 'MJPG', '.avi', description="Motion JPEG in AVI (cheap to encode, large files)"),
+    "mp4v": RecordingProfile("mp4v", 'mp4v', '.mp4', description="MPEG-4 Part 2 in MP4"),
+    "h264": RecordingProfile("h264", 'avc1', '.mp4', description="H.264 in MP4 (small files, needs an H.264 encoder)"),
+    "ffv1": RecordingProfile("ffv1", 'FFV1', '.mkv', description="Lossless FFV1 in Matroska (for datasets)"),
+    "preview": RecordingProfile("preview", 'XVID', '.avi', width=640, fps=15,
+                                description="XVID at up to 640 px wide and 15 FPS (long, small recordings)"),
+}
+DEFAULT_PROFILE = "xvid"
+VIDEO_EXTENSIONS = tuple(sorted({profile.container for profile in RECORDING_PROFILES.values()}))
+
+
+def get_recording_profile(profile) -> RecordingProfile:
+    """
+    :param profile: Profile name or RecordingProfile.
+    :return: The RecordingProfile.
+    """
+    if isinstance(profile, RecordingProfile):
+        return profile
+    if profile not in RECORDING_PROFILES:
+        raise ValueError(f"Unknown recording profile: {profile}. Available: {list(RECORDING_PROFILES)}")
+    return RECORDING_PROFILES[profile]
+
+
+def measure_fps(camera, sample_frames: int = 30, max_seconds: float = 3.0) -> float:
+    """
+    Measure the frame rate of a camera by timing reads. The frames read are lost, which for a live camera only
+    delays the start of the recording slightly.
+    :param camera: Opened cv2.VideoCapture.
+    :param sample_frames: Number of frames to time.
+    :param max_seconds: Give up after this long.
+    :return: Measured frames per second, or FALLBACK_FPS if no frame could be read.
+    """
+    camera.read()  # the first frame often takes much longer while the device starts up
+    start = time.perf_counter()
+    frames = 0
+    while frames < sample_frames and time.perf_counter() - start < max_seconds:
+        if not camera.grab():
+            break
+        frames += 1
+    elapsed = time.perf_counter() - start
+    if frames < 2 or elapsed <= 0:
+        return FALLBACK_FPS
+    return frames / elapsed
+
+
+def source_fps(camera, is_file: bool) -> float:
+    """
+    :param camera: Opened cv2.VideoCapture.
+    :param is_file: Whether the capture reads a video file (which is never measured, as reads are not paced).
+    :return: The frame rate reported by the device, or a measured one if the reported value is implausible.
+    """
+    reported = camera.get(cv2.CAP_PROP_FPS)
+    if PLAUSIBLE_FPS[0] <= reported <= PLAUSIBLE_FPS[1]:
+        return reported
+    if is_file:
+        return FALLBACK_FPS
+    measured = measure_fps(camera)
+    print(f"Camera reported {reported} FPS, measured {measured:.1f} FPS")
+    return measured
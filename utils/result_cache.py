@@ -0,0 +1,205 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from utils.file_utils import RESULT_CACHE_DIR
+
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+# Bump when an operation changes its results, so entries computed by older code are not served
+CACHE_VERSION = 3
+# MV_RESULT_CACHE=0 turns the cache off (every call computes its result), a number sets the size limit in MB
+RESULT_CACHE_ENV_VAR = "MV_RESULT_CACHE"
+HASH_CHUNK_BYTES = 1024 * 1024
+# temporary entry directories older than this were left behind by a crashed writer
+STALE_TEMPORARY_SECONDS = 3600
+# file of each entry listing its result names, written last
+MANIFEST_NAME = "manifest.json"
+# eviction goes down to this fraction of max_bytes, so the next few puts do not rescan the cache again
+EVICT_TARGET_FRACTION = 0.9
+
+
+class ResultCache:
+    """
+    Persistent on-disk cache of operation results, keyed by (content hash of the inputs, operation name, parameters).
+    Each entry is a directory of .npy files, one per named result array, and a manifest listing their names. Entries
+    are read back memory-mapped, so a hit costs only the pages actually used. Entries are written to a temporary
+    directory and renamed into place, so a crash or a concurrent writer never leaves a partial entry behind. When the
+    cache grows beyond max_bytes, the least recently used entries are deleted; a reader racing with the deletion
+    finds a name of the manifest (or the manifest itself) missing and treats the entry as a miss. The size of the
+    cache is scanned once and then kept as a running total of the bytes this process stored, so a put only rescans
+    the directory when the total goes over max_bytes (entries stored by other processes are counted at that rescan).
+    """
+
+    def __init__(self, directory: str = RESULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES, enabled: bool = True):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._file_hashes = {}  # (path, mtime_ns, size) -> hash, so an unchanged file is only read once
+        self._total_bytes = None  # running size of the cache, seeded by the first scan
+        self._lock = threading.Lock()
+
+    def content_hash(self, source) -> str:
+        """
+        :param source: Path of a file (hashed by its bytes) or a numpy array (hashed by shape, dtype and data).
+        :return: Hex digest.
+        """
+        digest = hashlib.blake2b(digest_size=20)
+        if isinstance(source, np.ndarray):
+            digest.update(f"{source.shape}{source.dtype}".encode())
+            digest.update(np.ascontiguousarray(source).data)
+            return digest.hexdigest()
+
+        stat = os.stat(source)
+        stamp = (os.path.abspath(source), stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            if stamp in self._file_hashes:
+                return self._file_hashes[stamp]
+        with open(source, 'rb') as source_file:
+            for chunk in iter(lambda: source_file.read(HASH_CHUNK_BYTES), b''):
+                digest.update(chunk)
+        with self._lock:
+            self._file_hashes[stamp] = digest.hexdigest()
+        return digest.hexdigest()
+
+    def key(self, sources, operation: str, params: dict) -> str:
+        """
+        :param sources: One input (path or array) or a tuple of inputs.
+        :param operation: Name of the operation.
+        :param params: Every parameter the result depends on (JSON-serialisable, or represented by repr()).
+        :return: Key of the cache entry.
+        """
+        if not isinstance(sources, (tuple, list)):
+            sources = (sources,)
+        description = json.dumps([CACHE_VERSION, [self.content_hash(source) for source in sources], operation,
+                                  params], sort_keys=True, default=repr)
+        return hashlib.blake2b(description.encode(), digest_size=20).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key)
+
+    def get(self, key: str):
+        """
+        :return: Dict of result name to read-only memory-mapped array, or None if the entry or any of its results is
+        missing.
+        """
+        path = self._path(key)
+        try:
+            with open(os.path.join(path, MANIFEST_NAME)) as manifest_file:
+                names = json.load(manifest_file)
+            arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r') for name in names}
+            os.utime(path)  # mark as recently used for eviction
+        except (OSError, ValueError):
+            return None
+        return arrays
+
+    def put(self, key: str, arrays: dict) -> None:
+        """
+        Store the results atomically, then evict old entries if the cache is over its size limit.
+        :param arrays: Dict of result name to array.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        temporary = tempfile.mkdtemp(prefix=f".{key}-", dir=self.directory)
+        try:
+            for name, array in arrays.items():
+                np.save(os.path.join(temporary, f"{name}.npy"), np.asarray(array))
+            with open(os.path.join(temporary, MANIFEST_NAME), 'w') as manifest_file:
+                json.dump(list(arrays), manifest_file)
+            size = sum(file_entry.stat().st_size for file_entry in os.scandir(temporary))
+            os.replace(temporary, self._path(key))
+        except OSError:
+            # another process stored the same entry first (or the disk is full): keep theirs
+            shutil.rmtree(temporary, ignore_errors=True)
+            return
+        with self._lock:
+            if self._total_bytes is not None:
+                self._total_bytes += size
+            over_limit = self._total_bytes is None or self._total_bytes > self.max_bytes
+        if over_limit:
+            self.evict()
+
+    def evict(self) -> None:
+        """
+        Scan the cache and, if it is over max_bytes, delete the least recently used entries until it fits in
+        EVICT_TARGET_FRACTION of it. Also resets the running total to the scanned size.
+        """
+        entries = []
+        total = 0
+        try:
+            scanned = list(os.scandir(self.directory))
+        except OSError:
+            return
+        for entry in scanned:
+            if not entry.is_dir():
+                continue
+            try:
+                if entry.name.startswith('.'):
+                    if time.time() - entry.stat().st_mtime > STALE_TEMPORARY_SECONDS:
+                        shutil.rmtree(entry.path, ignore_errors=True)
+                    continue
+                size = sum(file_entry.stat().st_size for file_entry in os.scandir(entry.path))
+                entries.append((entry.stat().st_mtime_ns, size, entry.path))
+            except OSError:
+                continue
+            total += size
+        if total > self.max_bytes:
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes * EVICT_TARGET_FRACTION:
+                    break
+                # open memory maps of a deleted entry stay valid on POSIX; on Windows the deletion fails and is retried
+                shutil.rmtree(path, ignore_errors=True)
+                total -= size
+        with self._lock:
+            self._total_bytes = total
+
+    def cached(self, sources, operation: str, params: dict, compute) -> dict:
+        """
+        Return the cached results of an operation, computing and storing them on a miss.
+        :param sources: Inputs the results are computed from (see key).
+        :param operation: Name of the operation.
+        :param params: Parameters the results depend on.
+        :param compute: Function without arguments returning a dict of result name to array.
+        :return: Dict of result name to array (memory-mapped and read-only on a hit).
+        """
+        if not self.enabled:
+            return compute()
+        key = self.key(sources, operation, params)
+        arrays = self.get(key)
+        if arrays is not None:
+            self.hits += 1
+            return arrays
+        self.misses += 1
+        arrays = compute()
+        self.put(key, arrays)
+        return arrays
+
+    def clear(self) -> None:
+        shutil.rmtree(self.directory, ignore_errors=True)
+        with self._lock:
+            self._total_bytes = 0
+
+
+def _cache_from_environment() -> ResultCache:
+    setting = os.environ.get(RESULT_CACHE_ENV_VAR, "").strip().lower()
+    if setting in ("0", "false", "no", "off"):
+        return ResultCache(enabled=False)
+    if setting.isdigit():
+        return ResultCache(max_bytes=int(setting) * 1024 * 1024)
+    return ResultCache()
+
+
+result_cache = _cache_from_environment()
+
+
+def cached_result(sources, operation: str, params: dict, compute) -> dict:
+    """
+    Look up or compute results through the shared cache (see ResultCache.cached).
+    """
+    return result_cache.cached(sources, operation, params, compute)
@@ -0,0 +1,141 @@
+import cv2
+import numpy as np
+
+HUE_BINS = 180
+
+
+def _smooth_circular(hist: np.ndarray, radius: int = 2) -> np.ndarray:
+    """
+    Box-smooth a hue histogram, wrapping around since hue 179 is next to hue 0.
+    """
+    padded = np.concatenate((hist[-radius:], hist, hist[:radius]))
+    kernel = np.ones(2 * radius + 1) / (2 * radius + 1)
+    return np.convolve(padded, kernel, mode="valid")
+
+
+def _split_circular_range(low: int, high: int) -> tuple:
+    """
+    Turn a possibly wrapping range (low may be negative, high may exceed 179) into lists of plain inclusive ranges.
+    :return: (lower_thresholds, upper_thresholds).
+    """
+    if low < 0:
+        return [0, HUE_BINS + low], [high, HUE_BINS - 1]
+    if high >= HUE_BINS:
+        return [low, 0], [HUE_BINS - 1, high - HUE_BINS]
+    return [low], [high]
+
+
+def _valley_bounds(smoothed: np.ndarray, peak: int, floor_ratio: float, valley_ratio: float = 0.25) -> tuple:
+    """
+    Walk away from the peak on both sides until the histogram drops below floor_ratio of the peak height, or reaches
+    a valley deeper than valley_ratio of the peak height. Shallow dips, e.g. between two lighting modes of the same
+    green screen, are walked through.
+    """
+    floor = smoothed[peak] * floor_ratio
+    valley = smoothed[peak] * valley_ratio
+    bounds = []
+    for step in (-1, 1):
+        offset = 0
+        while abs(offset) < HUE_BINS // 2:
+            current = smoothed[(peak + offset) % HUE_BINS]
+            following = smoothed[(peak + offset + step) % HUE_BINS]
+            if following <= floor or (current <= valley and following > current):
+                break
+            offset += step
+        bounds.append(peak + offset)
+    return bounds[0], bounds[1]
+
+
+def _otsu_bounds(hist: np.ndarray, peak: int) -> tuple:
+    """
+    Otsu's threshold on the circular distance from the peak: the class of hues closest to the peak is the key colour.
+    """
+    distances = np.abs((np.arange(HUE_BINS) - peak + HUE_BINS // 2) % HUE_BINS - HUE_BINS // 2)
+    distance_hist = np.bincount(distances, weights=hist, minlength=HUE_BINS // 2 + 1)
+
+    total = distance_hist.sum()
+    levels = np.arange(len(distance_hist))
+    weight_near = np.cumsum(distance_hist)
+    mean_near = np.cumsum(distance_hist * levels)
+    weight_far = total - weight_near
+    with np.errstate(divide="ignore", invalid="ignore"):
+        between = (mean_near[-1] * weight_near - mean_near * total) ** 2 / (weight_near * weight_far)
+    between[~np.isfinite(between)] = 0
+    radius = int(np.argmax(between))
+    return peak - radius, peak + radius
+
+
+def estimate_key_range(hist: np.ndarray, method: str = "valley", floor_ratio: float = 0.05) -> tuple:
+    """
+    Estimate the hue range of the key colour (the dominant background) from a hue histogram.
+    :param hist: Hue histogram with 180 bins, as returned by cv2.calcHist.
+    :param method: "valley" to stop at the valleys around the dominant peak, or "otsu" to split hues by their
+    distance from the peak with Otsu's method.
+    :param floor_ratio: For "valley", stop once the histogram drops below this fraction of the peak height.
+    :return: (lower_thresholds, upper_thresholds) lists; two ranges when the key colour wraps around hue 0.
+    """
+    hist = np.asarray(hist, dtype=np.float64).ravel()
+    if hist.size != HUE_BINS:
+        raise ValueError(f"Expected a hue histogram with {HUE_BINS} bins, got {hist.size}")
+    smoothed = _smooth_circular(hist)
+    peak = int(np.argmax(smoothed))
+
+    if method == "valley":
+        low, high = _valley_bounds(smoothed, peak, floor_ratio)
+    elif method == "otsu":
+        low, high = _otsu_bounds(smoothed, peak)
+    else:
+        raise ValueError(f"Unknown threshold estimation method: {method}")
+    return _split_circular_range(low, high)
+
+
+def hue_histogram(hue_channel: np.ndarray, mask: np.ndarray = None) -> np.ndarray:
+    """
+    :param hue_channel: uint8 Hue channel.
+    :param mask: Optional mask of the pixels to count (e.g. only well saturated ones).
+    :return: 180-bin float32 histogram.
+    """
+    return cv2.calcHist([hue_channel], [0], mask, [HUE_BINS], [0, HUE_BINS]).ravel()
+
+
+class RunningHueEstimator:
+    """
+    Keeps an exponentially decaying hue histogram over a video stream and re-estimates the key range from it every
+    few frames, instead of estimating every frame from scratch.
+    """
+
+    def __init__(self, decay: float = 0.9, interval: int = 15, method: str = "valley", subsample: int = 2):
+        """
+        :param decay: Weight of the history when a new frame is added (0 keeps only the latest frame).
+        :param interval: Number of frames between two estimates.
+        :param method: Estimation method, see estimate_key_range.
+        :param subsample: Only count every n-th pixel in each direction.
+        """
+        self.decay = decay
+        self.interval = interval
+        self.method = method
+        self.subsample = subsample
+        self.hist = np.zeros(HUE_BINS, dtype=np.float64)
+        self.frames = 0
+        self.thresholds = None
+
+    def update(self, hue_channel: np.ndarray, mask: np.ndarray = None) -> tuple:
+        """
+        Add a frame to the running histogram.
+        :param hue_channel: uint8 Hue channel of the frame.
+        :param mask: Optional mask of the pixels to count.
+        :return: Current (lower_thresholds, upper_thresholds) estimate.
+        """
+        step = self.subsample
+        if step > 1:
+            hue_channel = hue_channel[::step, ::step]
+            mask = mask[::step, ::step] if mask is not None else None
+        frame_hist = hue_histogram(np.ascontiguousarray(hue_channel),
+                                   np.ascontiguousarray(mask) if mask is not None else None)
+
+        self.hist *= self.decay
+        self.hist += (1 - self.decay) * frame_hist
+        if self.thresholds is None or self.frames % self.interval == 0:
+            self.thresholds = estimate_key_range(self.hist, self.method)
+        self.frames += 1
+        return self.thresholds
@@ -0,0 +1,146 @@
+import math
+import os
+
+import cv2
+import numpy as np
+
+DEFAULT_TILE_SIZE = 1024
+MIN_TILE_SIZE = 64
+
+
+def open_npy(path: str, mode: str = 'r') -> np.ndarray:
+    """
+    Memory-map an image stored as .npy, so tiles are read from disk on demand instead of loading the whole image.
+    :param path: Path to the .npy file.
+    :param mode: 'r' for read-only, 'r+' to modify in place.
+    :return: np.memmap of the image.
+    """
+    return np.load(path, mmap_mode=mode)
+
+
+def create_npy(path: str, shape: tuple, dtype) -> np.ndarray:
+    """
+    Create a .npy file of the given shape and memory-map it for writing; nothing is allocated in memory.
+    :return: Writable np.memmap.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    return np.lib.format.open_memmap(path, mode='w+', dtype=dtype, shape=tuple(shape))
+
+
+def load_source(path: str) -> np.ndarray:
+    """
+    :param path: .npy file (memory-mapped) or any image format cv2 can read (decoded in full, since cv2 cannot
+    decode part of a PNG or JPEG; convert very large images once with image_to_npy).
+    :return: Image array, or None if it cannot be loaded.
+    """
+    if path.endswith('.npy'):
+        return open_npy(path)
+    return cv2.imread(path)
+
+
+def image_to_npy(image_path: str, npy_path: str, rows_per_chunk: int = 1024) -> bool:
+    """
+    Convert an image to .npy once, so later runs can read it tile by tile. The image is decoded in full once.
+    :return: Whether the conversion succeeded.
+    """
+    image = cv2.imread(image_path, cv2.IMREAD_UNCHANGED)
+    if image is None:
+        print(f"Error: Unable to load image at {image_path}")
+        return False
+    destination = create_npy(npy_path, image.shape, image.dtype)
+    for start in range(0, image.shape[0], rows_per_chunk):
+        destination[start:start + rows_per_chunk] = image[start:start + rows_per_chunk]
+    destination.flush()
+    return True
+
+
+def tile_size_for_budget(max_bytes: int, halo: int, bytes_per_pixel: int) -> int:
+    """
+    :param max_bytes: Memory ceiling for one tile and everything computed from it.
+    :param halo: Overlap added on each side of a tile.
+    :param bytes_per_pixel: Working memory per pixel of the padded tile (input, temporaries and outputs).
+    :return: Largest square tile size whose padded tile fits the budget (at least MIN_TILE_SIZE).
+    """
+    padded = int(math.sqrt(max_bytes / bytes_per_pixel))
+    return max(MIN_TILE_SIZE, padded - 2 * halo)
+
+
+def iter_tiles(shape: tuple, tile_size: int, halo: int = 0):
+    """
+    Split an image into tiles with an overlap (halo) on every side, clamped to the image.
+    :param shape: Shape of the image (height, width, ...).
+    :param tile_size: Side length of the tiles, without the halo.
+    :param halo: Number of extra pixels read around each tile, e.g. the radius of a convolution kernel.
+    :return: Generator of (tile, padded) slice tuples (y0, y1, x0, x1): tile is the area the results are kept for,
+    padded the area read from the image.
+    """
+    height, width = shape[:2]
+    for y0 in range(0, height, tile_size):
+        y1 = min(y0 + tile_size, height)
+        for x0 in range(0, width, tile_size):
+            x1 = min(x0 + tile_size, width)
+            padded = (max(0, y0 - halo), min(height, y1 + halo), max(0, x0 - halo), min(width, x1 + halo))
+            yield (y0, y1, x0, x1), padded
+
+
+def read_padded_tile(source: np.ndarray, tile: tuple, padded: tuple, halo: int) -> np.ndarray:
+    """
+    Read a tile with its halo. Where the halo sticks out of the image it is filled by reflection (BORDER_REFLECT_101,
+    the default border of cv2 filters), so filtering tiles gives the same result as filtering the whole image.
+    :return: Array of (tile height + 2 * halo, tile width + 2 * halo) pixels.
+    """
+    y0, y1, x0, x1 = tile
+    py0, py1, px0, px1 = padded
+    region = np.ascontiguousarray(source[py0:py1, px0:px1])
+    top, bottom, left, right = halo - (y0 - py0), halo - (py1 - y1), halo - (x0 - px0), halo - (px1 - x1)
+    if top or bottom or left or right:
+        region = cv2.copyMakeBorder(region, top, bottom, left, right, cv2.BORDER_REFLECT_101)
+    return region
+
+
+def tiled_apply(source: np.ndarray, operation, output_path, tile_size: int = DEFAULT_TILE_SIZE,
+                halo: int = 0) -> dict:
+    """
+    Run an operation tile by tile and write each of its outputs to its own .npy file. Only one padded tile and its
+    results are in memory at a time.
+    :param source: Image array, typically memory-mapped with open_npy.
+    :param operation: Function mapping an image to a dict of named output images of the same height and width, whose
+    output pixels only depend on input pixels within `halo` of them (e.g. a convolution with a kernel radius <= halo).
+    :param output_path: Function mapping an output name to the path of its .npy file.
+    :param tile_size: Side length of the tiles, without the halo.
+    :param halo: Overlap read around each tile.
+    :return: Dict of output name to path.
+    """
+    destinations = {}
+    paths = {}
+    for tile, padded in iter_tiles(source.shape, tile_size, halo):
+        y0, y1, x0, x1 = tile
+        outputs = operation(read_padded_tile(source, tile, padded, halo))
+        for name, result in outputs.items():
+            if name not in destinations:
+                # the first tile tells the number of channels and the dtype of each output
+                paths[name] = output_path(name)
+                destinations[name] = create_npy(paths[name], source.shape[:2] + result.shape[2:], result.dtype)
+            destinations[name][y0:y1, x0:x1] = result[halo:halo + y1 - y0, halo:halo + x1 - x0]
+    for destination in destinations.values():
+        destination.flush()
+    return paths
+
+
+def chunked_map(source: np.ndarray, destination: np.ndarray, function, rows_per_chunk: int = 256) -> np.ndarray:
+    """
+    Apply a per-pixel operation in bands of whole rows, which are contiguous in a memory-mapped file.
+    :param source: Image array, typically memory-mapped with open_npy.
+    :param destination: Array of the result's shape and dtype, e.g. from create_npy.
+    :param function: Function mapping a band of source rows to the same rows of the result.
+    :param rows_per_chunk: Number of rows processed at once.
+    :return: destination.
+    """
+    for start in range(0, source.shape[0], rows_per_chunk):
+        stop = min(start + rows_per_chunk, source.shape[0])
+        destination[start:stop] = function(np.ascontiguousarray(source[start:stop]))
+    if isinstance(destination, np.memmap):
+        destination.flush()
+    return destination
@@ -0,0 +1,342 @@
+"""
+Non-interactive entry point: runs a single lab operation headless, without menus, prompts or windows.
+
+Examples:
+    python main.py lab1 capture --source input.avi --out-dir output/videos
+    python main.py lab1 record --sources 0 1 --max-frames 600
+    python main.py lab1 motion --source 0 --max-frames 1080000
+    python main.py lab1 extract --video output/videos/clip.avi --start 0 --stop 100 --step 10
+    python main.py lab2 gray sobel --input "images/*.png" --out-dir output/images/lab2
+    python main.py lab2 edges --edge-sigma 5 --input "images/*.png" --out-dir output/images/lab2
+    python main.py lab2 gaussian --tiled --input scan.npy --out-dir output/images/lab2 --max-memory-mb 128
+    python main.py lab3 hue --input girl.jpg --out hue.png
+    python main.py lab3 mask --input girl.jpg --out mask.png --auto-threshold
+    python main.py lab3 composite --input girl.jpg --target eiffel.jpg --out result.png
+    python main.py lab3 chroma-key --source 0 --background eiffel.jpg --max-frames 300
+
+Controllers are imported by the command that needs them, so e.g. a lab2 command never imports matplotlib.
+Every command returns exit code 0 on success and 1 on failure.
+"""
+import argparse
+import os
+
+
+def _source(value: str):
+    """
+    :return: Camera index for a number, otherwise the value as a video path.
+    """
+    return int(value) if value.isdigit() else value
+
+
+def _is_unbounded_camera(args) -> bool:
+    """
+    A camera never runs out of frames and there is no window to stop it, so headless camera runs need a limit.
+    """
+    if args.source.isdigit() and args.max_frames is None:
+        print("Error: --max-frames is required when recording from a camera without a display")
+        return True
+    return False
+
+
+def _recording_profile(args):
+    """
+    :return: The RecordingProfile chosen with --format, or None (after printing the error) if there is no such profile.
+    """
+    from utils.recording_profile import get_recording_profile
+
+    try:
+        return get_recording_profile(args.format)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return None
+
+
+def _write_image(path: str, image) -> bool:
+    import cv2
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    if not cv2.imwrite(path, image):
+        print(f"Error: Unable to write image to {path}")
+        return False
+    print(f"Saved image to: {path}")
+    return True
+
+
+def lab1_capture(args) -> int:
+    from controller.lab1_controller import capture_video_threaded
+    from utils.file_utils import VIDEO_DIR
+
+    profile = _recording_profile(args)
+    if profile is None or _is_unbounded_camera(args):
+        return 1
+    output_dir = args.out_dir or VIDEO_DIR
+    os.makedirs(output_dir, exist_ok=True)
+    pipeline = capture_video_threaded(_source(args.source), display=False, buffer_size=args.buffer_size,
+                                      max_frames=args.max_frames, output_dir=output_dir, profile=profile)
+    return 0 if pipeline is not None and pipeline.frames_written else 1
+
+
+def lab1_record(args) -> int:
+    from controller.lab1_controller import record_multiple_sources
+    from utils.file_utils import VIDEO_DIR
+
+    profile = _recording_profile(args)
+    if profile is None:
+        return 1
+    if any(source.isdigit() for source in args.sources) and args.max_frames is None:
+        print("Error: --max-frames is required when recording from a camera without a display")
+        return 1
+    output_dir = args.out_dir or VIDEO_DIR
+    os.makedirs(output_dir, exist_ok=True)
+    stats = record_multiple_sources([_source(source) for source in args.sources], display=False,
+                                    buffer_size=args.buffer_size, max_frames=args.max_frames, output_dir=output_dir,
+                                    profile=profile)
+    return 0 if stats["sources"] and all(source["written"] for source in stats["sources"]) else 1
+
+
+def lab1_motion(args) -> int:
+    from controller.lab1_controller import capture_motion
+    from utils.file_utils import VIDEO_DIR
+
+    profile = _recording_profile(args)
+    if profile is None or _is_unbounded_camera(args):
+        return 1
+    output_dir = args.out_dir or VIDEO_DIR
+    os.makedirs(output_dir, exist_ok=True)
+    stats = capture_motion(_source(args.source), display=False, pre_roll_seconds=args.pre_roll,
+                           max_frames=args.max_frames, output_dir=output_dir, profile=profile)
+    return 0 if stats["frames"] else 1
+
+
+def lab1_extract(args) -> int:
+    from controller.lab1_controller import extract_frames
+    from utils.file_utils import IMAGE_DIR
+
+    if not os.path.isfile(args.video):
+        print(f"Error: Video file not found: {args.video}")
+        return 1
+    image_paths = extract_frames(args.video, args.start, args.stop, args.step, args.out_dir or IMAGE_DIR)
+    return 0 if image_paths else 1
+
+
+def lab1_frame(args) -> int:
+    from utils.frame_index import read_frame
+
+    if not os.path.isfile(args.video):
+        print(f"Error: Video file not found: {args.video}")
+        return 1
+    img = read_frame(args.video, args.frame)
+    if img is None:
+        print(f"Error: Unable to read frame {args.frame} of {args.video}")
+        return 1
+    return 0 if _write_image(args.out, img) else 1
+
+
+def lab2_filters(args) -> int:
+    from controller.lab2_controller import BATCH_OPERATIONS, TILE_HALOS, batch_process, process_large_image
+
+    if args.tiled:
+        if len(args.operations) != 1 or args.operations[0] not in TILE_HALOS:
+            print(f"Error: --tiled runs a single operation out of {list(TILE_HALOS)}")
+            return 1
+        paths = process_large_image(args.input, args.out_dir, args.operations[0], args.tile_size, args.max_memory_mb)
+        return 0 if paths else 1
+
+    unknown = [name for name in args.operations if name not in BATCH_OPERATIONS]
+    if unknown:
+        print(f"Error: Unknown operations: {unknown}. Available: {list(BATCH_OPERATIONS)}")
+        return 1
+    summary = batch_process(args.input, args.out_dir, args.operations, args.workers, args.edge_sigma,
+                            args.edge_threshold)
+    return 0 if summary["images"] else 1
+
+
+def _lab3_thresholds(args, input_image):
+    """
+    :return: The thresholds estimated from the image with --auto-threshold, otherwise None (the hand-tuned ones).
+    """
+    from controller.lab3_controller import estimate_thresholds
+
+    if args.auto_threshold:
+        return estimate_thresholds(input_image, args.method)
+    return None
+
+
+def lab3_hue(args) -> int:
+    from controller.lab3_controller import load_hue_channel
+
+    hue_channel = load_hue_channel(args.input)
+    if hue_channel is None:
+        print(f"Error: Unable to load input image at {args.input}")
+        return 1
+    return 0 if _write_image(args.out, hue_channel) else 1
+
+
+def lab3_mask(args) -> int:
+    from controller.lab3_controller import compute_large_foreground_mask, get_foreground_mask
+    from utils.image_cache import load_image
+
+    if args.out.endswith('.npy'):
+        # large images: processed in bands of rows, without loading a .npy input or the mask as a whole
+        if args.auto_threshold:
+            print("Error: --auto-threshold needs the whole image and cannot be used with a .npy output")
+            return 1
+        return 0 if compute_large_foreground_mask(args.input, args.out) else 1
+    input_image = load_image(args.input)
+    if input_image is None:
+        print(f"Error: Unable to load input image at {args.input}")
+        return 1
+    thresholds = _lab3_thresholds(args, input_image)
+    return 0 if _write_image(args.out, get_foreground_mask(args.input, thresholds=thresholds)) else 1
+
+
+def lab3_composite(args) -> int:
+    from controller.lab3_controller import composite_foreground, composite_into_large_target, get_foreground_mask
+    from utils.image_cache import load_image
+
+    if args.target.endswith('.npy'):
+        # large targets are memory-mapped and modified in place
+        if args.out != args.target:
+            print("Error: a .npy target is modified in place; pass the same path to --out")
+            return 1
+        thresholds = _lab3_thresholds(args, load_image(args.input)) if args.auto_threshold else None
+        return 0 if composite_into_large_target(args.input, args.target, args.width, args.height, thresholds) else 1
+    input_image = load_image(args.input)
+    target_image = load_image(args.target)
+    if input_image is None:
+        print(f"Error: Unable to load input image at {args.input}")
+        return 1
+    if target_image is None:
+        print(f"Error: Unable to load target image at {args.target}")
+        return 1
+    foreground_mask = get_foreground_mask(args.input, thresholds=_lab3_thresholds(args, input_image))
+    result = composite_foreground(input_image, target_image, foreground_mask, args.width, args.height)
+    return 0 if _write_image(args.out, result) else 1
+
+
+def lab3_chroma_key(args) -> int:
+    from controller.lab3_controller import chroma_key_video
+
+    profile = _recording_profile(args)
+    if profile is None or _is_unbounded_camera(args):
+        return 1
+    stats = chroma_key_video(_source(args.source), args.background, args.out, display=False,
+                             max_frames=args.max_frames, auto_threshold=args.auto_threshold, profile=profile)
+    return 0 if stats["frames"] else 1
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="main.py", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profile", action="store_true",
+                        help="Time every stage and save the profile to output/profiles on exit")
+    labs = parser.add_subparsers(dest="lab", required=True)
+
+    lab1 = labs.add_parser("lab1", help="Image capture").add_subparsers(dest="command", required=True)
+    capture = lab1.add_parser("capture", help="Record a camera or video file to a new video")
+    capture.add_argument("--source", default="0", help="Camera index or video path (default: 0)")
+    capture.add_argument("--out-dir", help="Output directory (default: output/videos)")
+    capture.add_argument("--max-frames", type=int, help="Stop after this many frames (required for cameras)")
+    capture.add_argument("--buffer-size", type=int, default=64, help="Frames in the capture ring buffer")
+    capture.set_defaults(handler=lab1_capture)
+
+    record = lab1.add_parser("record", help="Record several cameras or video files at the same time")
+    record.add_argument("--sources", nargs="+", required=True, help="Camera indices and/or video paths")
+    record.add_argument("--out-dir", help="Output directory (default: output/videos)")
+    record.add_argument("--max-frames", type=int, help="Stop each source after this many frames (required for cameras)")
+    record.add_argument("--buffer-size", type=int, default=64, help="Frames in each source's ring buffer")
+    record.set_defaults(handler=lab1_record)
+
+    motion = lab1.add_parser("motion", help="Record only while something moves, one video per motion event")
+    motion.add_argument("--source", default="0", help="Camera index or video path (default: 0)")
+    motion.add_argument("--out-dir", help="Output directory (default: output/videos)")
+    motion.add_argument("--max-frames", type=int, help="Stop after this many frames (required for cameras)")
+    motion.add_argument("--pre-roll", type=float, default=2.0, help="Seconds kept from before each motion event")
+    motion.set_defaults(handler=lab1_motion)
+
+    for command in (capture, record, motion):
+        command.add_argument("--format", default="xvid",
+                             help="Recording profile: xvid, mjpg, mp4v, h264, ffv1 or preview (default: xvid)")
+
+    extract = lab1.add_parser("extract", help="Save a range of frames of a video as images")
+    extract.add_argument("--video", required=True, help="Path to the video")
+    extract.add_argument("--start", type=int, default=0, help="First frame (0-indexed)")
+    extract.add_argument("--stop", type=int, required=True, help="Frame to stop before")
+    extract.add_argument("--step", type=int, default=1, help="Extract every n-th frame")
+    extract.add_argument("--out-dir", help="Output directory (default: output/images)")
+    extract.set_defaults(handler=lab1_extract)
+
+    frame = lab1.add_parser("frame", help="Save a single frame of a video as an image")
+    frame.add_argument("--video", required=True, help="Path to the video")
+    frame.add_argument("--frame", type=int, default=9, help="Frame number (0-indexed, default: the 10th frame)")
+    frame.add_argument("--out", required=True, help="Output image path")
+    frame.set_defaults(handler=lab1_frame)
+
+    lab2 = labs.add_parser("lab2", help="Linear filters: run a chain of filters over one or more images")
+    lab2.add_argument("operations", nargs="+",
+                      help="Filters applied in order: gray, sobel, gaussian, fourier, blur, edges")
+    lab2.add_argument("--input", required=True, help="Image, directory or glob pattern")
+    lab2.add_argument("--out-dir", required=True, help="Output directory")
+    lab2.add_argument("--workers", type=int, help="Worker processes (default: CPU count)")
+    lab2.add_argument("--edge-sigma", type=float,
+                      help="Gaussian derivatives of this sigma for edges (default: the Sobel masks)")
+    lab2.add_argument("--edge-threshold", type=float, default=0.1,
+                      help="Drop edges weaker than this fraction of the strongest one (default: 0.1)")
+    lab2.add_argument("--tiled", action="store_true",
+                      help="Filter one very large image (.npy is memory-mapped) tile by tile into .npy outputs")
+    lab2.add_argument("--tile-size", type=int, help="Tile side length with --tiled (default: fit --max-memory-mb)")
+    lab2.add_argument("--max-memory-mb", type=int, default=256, help="Memory ceiling per tile with --tiled")
+    lab2.set_defaults(handler=lab2_filters)
+
+    lab3 = labs.add_parser("lab3", help="Chroma keying").add_subparsers(dest="command", required=True)
+    hue = lab3.add_parser("hue", help="Extract the Hue channel of an image")
+    hue.add_argument("--input", required=True, help="Input image")
+    hue.add_argument("--out", required=True, help="Output image path")
+    hue.set_defaults(handler=lab3_hue)
+
+    mask = lab3.add_parser("mask", help="Compute the foreground mask of an image")
+    mask.add_argument("--input", required=True, help="Input image in front of a green background")
+    mask.add_argument("--out", required=True, help="Output mask path (.npy to process a large image in bands)")
+
+    composite = lab3.add_parser("composite", help="Paste the foreground of an image onto a target image")
+    composite.add_argument("--input", required=True, help="Input image in front of a green background")
+    composite.add_argument("--target", required=True, help="Target image (.npy targets are modified in place)")
+    composite.add_argument("--out", required=True, help="Output image path")
+    composite.add_argument("--width", type=int, default=300, help="Width of the pasted foreground")
+    composite.add_argument("--height", type=int, default=400, help="Height of the pasted foreground")
+
+    chroma_key = lab3.add_parser("chroma-key", help="Replace the green background of a camera or video")
+    chroma_key.add_argument("--source", default="0", help="Camera index or video path (default: 0)")
+    chroma_key.add_argument("--background", required=True, help="Background image")
+    chroma_key.add_argument("--out", help="Output video path; the extension follows --format "
+                                          "(default: output/videos/chroma_key_<time>.avi)")
+    chroma_key.add_argument("--max-frames", type=int, help="Stop after this many frames (required for cameras)")
+    chroma_key.add_argument("--format", default="xvid",
+                            help="Recording profile: xvid, mjpg, mp4v, h264, ffv1 or preview (default: xvid)")
+
+    for command, handler in ((mask, lab3_mask), (composite, lab3_composite), (chroma_key, lab3_chroma_key)):
+        command.add_argument("--auto-threshold", action="store_true",
+                             help="Estimate the key-colour thresholds instead of using the fixed ones")
+        command.set_defaults(handler=handler)
+    for command in (mask, composite):
+        command.add_argument("--method", choices=("valley", "otsu"), default="valley",
+                             help="Threshold estimation method used with --auto-threshold")
+    return parser
+
+
+def main(argv=None) -> int:
+    """
+    Parse the command line and run the chosen operation.
+    :param argv: Arguments without the program name (defaults to sys.argv[1:]).
+    :return: Exit code.
+    """
+    args = build_parser().parse_args(argv)
+
+    # never open a plotting window when run from cron or a worker process
+    os.environ.setdefault("MPLBACKEND", "Agg")
+    if args.profile:
+        from utils.profiler import profiler
+        profiler.enabled = True
+    return args.handler(args)
@@ -0,0 +1,100 @@
+import cv2
+
+# how long each waitKey call blocks: long enough that an idle viewer barely wakes up, short enough that closing the
+# window with its close button is noticed quickly
+WAIT_TIMEOUT_MS = 200
+
+NEXT_KEYS = {ord('n'), ord('d'), ord(' ')}
+PREVIOUS_KEYS = {ord('p'), ord('a'), 8}  # 8: backspace
+CLOSE_KEYS = {ord('q'), 27}  # 27: ESC
+# full waitKeyEx codes of the arrow keys (GTK/Qt on Linux, Windows)
+RIGHT_ARROW_KEYS = {65363, 2555904}
+LEFT_ARROW_KEYS = {65361, 2424832}
+
+
+class ImageViewer:
+    """
+    Shows a list of result images in a single window and lets the user page through them. The viewer sleeps in
+    waitKey between key presses instead of polling, and drops its references to the images once the window is
+    closed, so their buffers can be freed.
+    """
+
+    def __init__(self, window_name: str = "Results"):
+        """
+        :param window_name: Name of the window the pages are shown in.
+        """
+        self.window_name = window_name
+        self.pages = []
+        self.index = 0
+
+    def add(self, title: str, image) -> 'ImageViewer':
+        """
+        :param title: Shown in the window title while the page is displayed.
+        :param image: Image to display (anything cv2.imshow accepts).
+        :return: The viewer, so calls can be chained.
+        """
+        self.pages.append((title, image))
+        return self
+
+    def _show_page(self) -> None:
+        title, image = self.pages[self.index]
+        cv2.imshow(self.window_name, image)
+        cv2.setWindowTitle(self.window_name, f"{title} ({self.index + 1}/{len(self.pages)})")
+
+    def _is_open(self) -> bool:
+        return cv2.getWindowProperty(self.window_name, cv2.WND_PROP_VISIBLE) >= 1
+
+    def run(self) -> None:
+        """
+        Display the pages until the user presses 'q'/ESC or closes the window, then release them.
+        :return: None
+        """
+        if not self.pages:
+            return
+        cv2.namedWindow(self.window_name, cv2.WINDOW_AUTOSIZE)
+        self.index = 0
+        self._show_page()
+        if len(self.pages) > 1:
+            print(f"Showing {len(self.pages)} images: 'n'/'p' or the arrow keys to page, 'q' to close.")
+        else:
+            print("Press 'q' to close the image window.")
+
+        while True:
+            key = cv2.waitKeyEx(WAIT_TIMEOUT_MS)
+            if key == -1:
+                # timeout: nothing to do unless the window was closed with the mouse
+                if not self._is_open():
+                    break
+                continue
+            if (key & 0xFF) in CLOSE_KEYS:
+                break
+            if key in RIGHT_ARROW_KEYS or (key & 0xFF) in NEXT_KEYS:
+                self.index = (self.index + 1) % len(self.pages)
+                self._show_page()
+            elif key in LEFT_ARROW_KEYS or (key & 0xFF) in PREVIOUS_KEYS:
+                self.index = (self.index - 1) % len(self.pages)
+                self._show_page()
+
+        self.close()
+
+    def close(self) -> None:
+        """
+        Destroy the window and drop the references to the images.
+        :return: None
+        """
+        self.pages.clear()
+        cv2.destroyWindow(self.window_name)
+        cv2.waitKey(1)  # Force OpenCV to process window events and close
+
+
+def show_images(pages: list, window_name: str = "Results") -> None:
+    """
+    Display images in one window, paged, until the user closes it.
+    :param pages: List of (title, image) tuples.
+    :param window_name: Name of the window.
+    :return: None
+    """
+    viewer = ImageViewer(window_name)
+    for title, image in pages:
+        viewer.add(title, image)
+    viewer.run()
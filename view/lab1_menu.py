@@ -1,6 +1,4 @@
-from controller.lab1_controller import display_latest_image
-from controller.lab1_controller import generate_image
-from controller.lab1_controller import capture_video
+from utils.user_input_handler import get_user_input, InputType
 from view.abstract_menu import AbstractMenu
 
 
@@ -10,17 +8,63 @@ class Lab1Menu(AbstractMenu):
             {1: "Capture Video",
              2: "Generate Image from Video",
              3: "View Latest Image",
+             4: "Capture Video (Threaded Pipeline)",
+             5: "Extract Frame Range from Latest Video",
+             6: "Record From Multiple Sources",
+             7: "Motion-Triggered Recording",
              9: "Back to Main Menu",
              99: "Exit"}
         super().__init__("Lab 1 Menu", main_menu_options)
 
+    @staticmethod
+    def choose_recording_profile():
+        """
+        Ask which recording profile (codec, container, resolution, frame rate) to record with.
+        :return: Profile name, or False if cancelled.
+        """
+        from utils.recording_profile import DEFAULT_PROFILE, RECORDING_PROFILES
+
+        for number, profile in enumerate(RECORDING_PROFILES.values(), start=1):
+            print(f"{number}. {profile.name}: {profile.description}")
+        return get_user_input("Recording profile", default_value=DEFAULT_PROFILE,
+                              available_options=list(RECORDING_PROFILES))
+
     def execute_choice(self, choice):
+        # the controller (and with it cv2) is only imported once an action runs
+        from controller.lab1_controller import capture_video, capture_video_threaded, display_latest_image, \
+            extract_frames_from_latest_video, generate_image, record_multiple_sources, capture_motion
+
         if choice == 1:
-            capture_video()
+            pre_roll_seconds = get_user_input("Seconds of video to keep from before recording starts", InputType.INT,
+                                              default_value=0, min_int_value=0)
+            profile = self.choose_recording_profile() if pre_roll_seconds is not False else False
+            if profile is not False:
+                capture_video(pre_roll_seconds, profile)
         elif choice == 2:
             generate_image()
         elif choice == 3:
             display_latest_image()
+        elif choice == 4:
+            profile = self.choose_recording_profile()
+            if profile is not False:
+                capture_video_threaded(profile=profile)
+        elif choice == 5:
+            start = get_user_input("First frame", InputType.INT, default_value=0, min_int_value=0)
+            stop = get_user_input("Stop before frame", InputType.INT, min_int_value=1)
+            step = get_user_input("Extract every n-th frame", InputType.INT, default_value=1, min_int_value=1)
+            if start is not False and stop is not False and step is not False:
+                extract_frames_from_latest_video(start, stop, step)
+        elif choice == 6:
+            sources = get_user_input("Camera indices or video paths, separated by commas", default_value="0,1")
+            profile = self.choose_recording_profile() if sources is not False else False
+            if profile is not False:
+                record_multiple_sources([int(source) if source.isdigit() else source
+                                         for source in (source.strip() for source in sources.split(","))
+                                         if source], profile=profile)
+        elif choice == 7:
+            profile = self.choose_recording_profile()
+            if profile is not False:
+                capture_motion(profile=profile)
         elif choice == 9:
             return False
         elif choice == 99 or choice == 0:
@@ -1,5 +1,3 @@
-from controller.lab2_controller import gray_scale, apply_filter_2d, filter_image_with_mask, create_filter_mask, \
-    calculate_fourier_transform
 from utils.file_utils import LAB2_CAT_IMAGE_PATH
 from view.abstract_menu import AbstractMenu
 
@@ -17,6 +15,10 @@ class Lab2Menu(AbstractMenu):
         super().__init__("Lab 2 Menu", main_menu_options)
 
     def execute_choice(self, choice):
+        # the controller (and with it cv2) is only imported once an action runs
+        from controller.lab2_controller import gray_scale, apply_filter_2d, filter_image_with_mask, \
+            create_filter_mask, calculate_fourier_transform
+
         if choice == 1:
             gray_scale(LAB2_CAT_IMAGE_PATH)
         elif choice == 2:
@@ -1,3 +1,4 @@
+from utils.profiler import save_profile, toggle_overlay, toggle_profiling
 from view.abstract_menu import AbstractMenu
 
 from view.lab1_menu import Lab1Menu
@@ -11,6 +12,9 @@ class MainMenu(AbstractMenu):
             {1: "Lab 1",
              2: "Lab 2",
              3: "Lab 3",
+             4: "Toggle Profiling",
+             5: "Toggle Profiling Overlay",
+             6: "Save Profiling Results",
              99: "Exit"}
         super().__init__("Main Menu", main_menu_options)
 
@@ -21,6 +25,12 @@ class MainMenu(AbstractMenu):
             Lab2Menu().run()
         elif choice == 3:
             Lab3Menu().run()
+        elif choice == 4:
+            toggle_profiling()
+        elif choice == 5:
+            toggle_overlay()
+        elif choice == 6:
+            save_profile()
         elif choice == 99 or choice == 0:
             self.exit_application()
         else: